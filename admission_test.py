@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Unit tests for admission control: queue order, shedding and Retry-After
+Runs without the backend services: python -m pytest admission_test.py
+"""
+
+import os
+import sys
+import json
+import asyncio
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import admission
+from admission import AdmissionControlMiddleware, EndpointLimiter, Rejected, load_limits
+
+class FakeClock:
+    """Stands in for the time module inside admission, so drain rates are exact"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+async def settle():
+    """Let woken waiters run; a handoff takes a few loop iterations through wait_for"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+class LimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(admission, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def queue(self, limiter: EndpointLimiter, name: str, admitted: list) -> asyncio.Task:
+        async def wait():
+            await limiter.acquire()
+            admitted.append(name)
+
+        task = asyncio.create_task(wait())
+        await settle()
+        return task
+
+    async def test_admits_up_to_concurrency_without_queueing(self):
+        limiter = EndpointLimiter("test", concurrency=2, queue_size=1, max_wait_seconds=1)
+        await limiter.acquire()
+        await limiter.acquire()
+        self.assertEqual((limiter.active, len(limiter._waiters)), (2, 0))
+        limiter.release()
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+    async def test_waiters_are_admitted_in_order(self):
+        limiter = EndpointLimiter("test", concurrency=1, queue_size=5, max_wait_seconds=5)
+        await limiter.acquire()
+        admitted = []
+        tasks = [await self.queue(limiter, name, admitted) for name in ("first", "second", "third")]
+
+        limiter.release()
+        await settle()
+        self.assertEqual(admitted, ["first"])
+        # The slot went to the waiter, so a newcomer can't take it
+        self.assertEqual(limiter.active, 1)
+        tasks.append(await self.queue(limiter, "newcomer", admitted))
+
+        for _ in range(3):
+            limiter.release()
+            await settle()
+        self.assertEqual(admitted, ["first", "second", "third", "newcomer"])
+        await asyncio.gather(*tasks)
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+    async def test_full_queue_is_rejected(self):
+        limiter = EndpointLimiter("test", concurrency=1, queue_size=1, max_wait_seconds=7)
+        await limiter.acquire()
+        waiting = await self.queue(limiter, "waiting", [])
+        with self.assertRaises(Rejected) as raised:
+            await limiter.acquire()
+        self.assertEqual(raised.exception.reason, "queue_full")
+        # Nothing has completed yet, so clients are told to wait out the max wait
+        self.assertEqual(raised.exception.retry_after, 7)
+        limiter.release()
+        await waiting
+
+    async def test_max_wait_sheds_and_leaves_the_queue(self):
+        limiter = EndpointLimiter("test", concurrency=1, queue_size=2, max_wait_seconds=0.01)
+        await limiter.acquire()
+        with self.assertRaises(Rejected) as raised:
+            await limiter.acquire()
+        self.assertEqual(raised.exception.reason, "queue_timeout")
+        self.assertEqual(len(limiter._waiters), 0)
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        limiter = EndpointLimiter("test", concurrency=1, queue_size=2, max_wait_seconds=5)
+        await limiter.acquire()
+        waiting = await self.queue(limiter, "waiting", [])
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(len(limiter._waiters), 0)
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+    async def test_retry_after_follows_the_drain_rate(self):
+        limiter = EndpointLimiter("test", concurrency=1, queue_size=10, max_wait_seconds=5)
+        # Ten completions over ten seconds: one per second
+        for _ in range(10):
+            await limiter.acquire()
+            limiter.release()
+            self.clock.now += 1
+        self.assertAlmostEqual(limiter.drain_rate(), 1.0)
+
+        await limiter.acquire()
+        admitted = []
+        tasks = [await self.queue(limiter, str(i), admitted) for i in range(3)]
+        # Three ahead plus this one, at one per second
+        self.assertEqual(limiter.retry_after(), 4)
+
+        # Completions older than the window no longer count
+        self.clock.now += admission.DRAIN_WINDOW_SECONDS + 1
+        self.assertEqual(limiter.drain_rate(), 0.0)
+        self.assertEqual(limiter.retry_after(), 5)
+
+        for _ in tasks:
+            limiter.release()
+        await asyncio.gather(*tasks)
+
+    async def test_retry_after_is_clamped(self):
+        limiter = EndpointLimiter("test", concurrency=1, queue_size=1, max_wait_seconds=600)
+        self.assertEqual(limiter.retry_after(), admission.RETRY_AFTER_MAX_SECONDS)
+        # A fast drain still asks for at least the minimum
+        for _ in range(100):
+            await limiter.acquire()
+            limiter.release()
+        self.assertEqual(limiter.retry_after(), admission.RETRY_AFTER_MIN_SECONDS)
+
+class MiddlewareTest(unittest.IsolatedAsyncioTestCase):
+    async def call(self, middleware, method: str, path: str, query: bytes = b""):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware({"type": "http", "method": method, "path": path, "query_string": query, "headers": []}, receive, send)
+        return messages
+
+    async def test_busy_endpoint_gets_429_with_retry_after(self):
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        limits = {"upload": {"method": "POST", "path": r"/api/upload", "concurrency": 1, "queue_size": 0, "max_wait_seconds": 3}}
+        middleware = AdmissionControlMiddleware(app, limits)
+        running = asyncio.create_task(self.call(middleware, "POST", "/api/upload"))
+        await asyncio.sleep(0)
+
+        start, body = await self.call(middleware, "POST", "/api/upload")
+        self.assertEqual(start["status"], 429)
+        self.assertEqual(dict(start["headers"])[b"retry-after"], b"3")
+        self.assertEqual(json.loads(body["body"])["retry_after"], 3)
+
+        # Other endpoints aren't queued behind it
+        other = asyncio.create_task(self.call(middleware, "POST", "/api/other"))
+        release.set()
+        self.assertEqual((await other)[0]["status"], 200)
+        self.assertEqual((await running)[0]["status"], 200)
+
+    def test_only_narrative_requests_of_match_details_are_limited(self):
+        middleware = AdmissionControlMiddleware(None, load_limits())
+
+        def limited(method: str, path: str, query: bytes = b""):
+            limiter = middleware._limiter({"type": "http", "method": method, "path": path, "query_string": query})
+            return limiter.name if limiter else None
+
+        self.assertIsNone(limited("POST", "/api/match"))
+        self.assertIsNone(limited("GET", "/api/match/abc"))
+        self.assertIsNone(limited("GET", "/api/match/abc", b"narrative=false"))
+        self.assertEqual(limited("GET", "/api/match/abc", b"narrative=true"), "match_narrative")
+        self.assertEqual(limited("GET", "/api/match/abc", b"x=1&narrative=1"), "match_narrative")
+        self.assertEqual(limited("POST", "/api/upload-resume"), "upload_resume")
+        self.assertIsNone(limited("GET", "/api/resumes"))
+
+    def test_unknown_override_is_an_error(self):
+        with mock.patch.dict(os.environ, {"ADMISSION_LIMITS": '{"nope": {"concurrency": 1}}'}):
+            with self.assertRaises(ValueError):
+                load_limits()
+        with mock.patch.dict(os.environ, {"ADMISSION_LIMITS": '{"analyze_job": {"concurrency": 2}}'}):
+            self.assertEqual(load_limits()["analyze_job"]["concurrency"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
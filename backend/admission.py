@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from metrics import counter, gauge, histogram
+from profiling import stage
+
+# Admission control for the LLM-bound endpoints; everything else is never queued
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+
+# Per-endpoint limits: requests running at once, requests allowed to wait,
+# and how long one may wait before it is shed. An optional "query" pattern
+# limits only the requests whose query string matches it
+DEFAULT_LIMITS: Dict[str, Dict[str, Any]] = {
+    "upload_resume": {"method": "POST", "path": r"/api/upload-resume", "concurrency": 8, "queue_size": 32, "max_wait_seconds": 10},
+    "upload_resume_archive": {"method": "POST", "path": r"/api/upload-resume-archive", "concurrency": 1, "queue_size": 2, "max_wait_seconds": 5},
+    "update_resume": {"method": "PUT", "path": r"/api/resumes/[^/]+", "concurrency": 4, "queue_size": 16, "max_wait_seconds": 10},
+    "analyze_job": {"method": "POST", "path": r"/api/analyze-job", "concurrency": 8, "queue_size": 32, "max_wait_seconds": 10},
+    # /api/match scores locally and isn't limited; its narrative is the LLM call
+    "match_narrative": {
+        "method": "GET", "path": r"/api/match/[^/]+", "query": r"(?i)(^|&)narrative=(1|true|t|yes|y|on)(&|$)",
+        "concurrency": 8, "queue_size": 32, "max_wait_seconds": 10
+    },
+}
+
+# Completions within this window set the drain rate behind Retry-After
+DRAIN_WINDOW_SECONDS = 30
+RETRY_AFTER_MIN_SECONDS = 1
+RETRY_AFTER_MAX_SECONDS = 120
+
+admission_rejected = counter("admission_rejected_total", "Requests shed by admission control, by endpoint and reason")
+admission_queue_depth = gauge("admission_queue_depth", "Requests waiting for admission")
+admission_in_flight = gauge("admission_in_flight", "Admitted requests currently running")
+admission_wait = histogram("admission_queue_wait_seconds", "Time admitted requests spent queued", [0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30])
+
+def load_limits() -> Dict[str, Dict[str, Any]]:
+    """DEFAULT_LIMITS with per-endpoint overrides from ADMISSION_LIMITS (JSON), e.g.
+    {"upload_resume": {"concurrency": 16}}
+    """
+    limits = {name: dict(limit) for name, limit in DEFAULT_LIMITS.items()}
+    for name, override in json.loads(os.getenv("ADMISSION_LIMITS", "{}")).items():
+        if name not in limits:
+            raise ValueError(f"Unknown admission endpoint {name!r}; expected one of {sorted(limits)}")
+        limits[name].update(override)
+    return limits
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class EndpointLimiter:
+    """Bounded concurrency with a bounded FIFO queue and a maximum wait"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, max_wait_seconds: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait_seconds
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._completed: Deque[float] = deque()
+
+    def drain_rate(self) -> float:
+        """Completed requests per second over the recent window"""
+        cutoff = time.monotonic() - DRAIN_WINDOW_SECONDS
+        while self._completed and self._completed[0] < cutoff:
+            self._completed.popleft()
+        if not self._completed:
+            return 0.0
+        # Over the span actually observed, so a fresh burst isn't underestimated
+        span = max(1.0, time.monotonic() - self._completed[0])
+        return len(self._completed) / span
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained"""
+        rate = self.drain_rate()
+        if rate <= 0:
+            return int(min(RETRY_AFTER_MAX_SECONDS, max(RETRY_AFTER_MIN_SECONDS, self.max_wait)))
+        seconds = math.ceil((len(self._waiters) + 1) / rate)
+        return int(min(RETRY_AFTER_MAX_SECONDS, max(RETRY_AFTER_MIN_SECONDS, seconds)))
+
+    def _update_gauges(self):
+        admission_queue_depth.set(len(self._waiters), endpoint=self.name)
+        admission_in_flight.set(self.active, endpoint=self.name)
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self._update_gauges()
+            admission_wait.observe(0.0, endpoint=self.name)
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            admission_rejected.inc(endpoint=self.name, reason="queue_full")
+            raise Rejected("queue_full", self.retry_after())
+
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted just as the wait ended; hand the slot on
+                self.release(completed=False)
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            self._update_gauges()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            admission_rejected.inc(endpoint=self.name, reason="queue_timeout")
+            raise Rejected("queue_timeout", self.retry_after())
+        admission_wait.observe(time.monotonic() - started, endpoint=self.name)
+
+    def release(self, completed: bool = True):
+        if completed:
+            self._completed.append(time.monotonic())
+        # Hand the slot straight to the next waiter so newcomers can't jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+
+class AdmissionControlMiddleware:
+    """ASGI middleware that admits, queues or sheds requests to the limited
+    endpoints before their body is read, so a shed upload costs nothing.
+    """
+
+    def __init__(self, app, limits: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.app = app
+        limits = load_limits() if limits is None else limits
+        self.routes: List[Tuple[str, re.Pattern, Optional[re.Pattern], EndpointLimiter]] = [
+            (
+                limit["method"],
+                re.compile(limit["path"] + "$"),
+                re.compile(limit["query"]) if limit.get("query") else None,
+                EndpointLimiter(name, limit["concurrency"], limit["queue_size"], limit["max_wait_seconds"])
+            )
+            for name, limit in limits.items()
+        ]
+
+    def _limiter(self, scope) -> Optional[EndpointLimiter]:
+        for method, pattern, query, limiter in self.routes:
+            if scope["method"] != method or not pattern.match(scope["path"]):
+                continue
+            if query is None or query.search(scope.get("query_string", b"").decode("latin-1")):
+                return limiter
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limiter = self._limiter(scope) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            with stage("admission_queue"):
+                await limiter.acquire()
+        except Rejected as e:
+            await _send_rejection(send, limiter.name, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+async def _send_rejection(send, endpoint: str, rejected: Rejected):
+    body = json.dumps({
+        "detail": f"Server busy ({endpoint}: {rejected.reason.replace('_', ' ')}); retry later",
+        "retry_after": rejected.retry_after
+    }).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"retry-after", str(rejected.retry_after).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,160 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne, DESCENDING
+
+from database import database, matches_collection
+
+# One summary document per job: match count, score sum and score histogram
+job_analytics_collection = database.job_analytics
+
+# One document per (job, kind, skill) with a running count
+job_skill_stats_collection = database.job_skill_stats
+
+MISSING_SKILL = "missing_skill"
+MATCHED_KEYWORD = "matched_keyword"
+
+HISTOGRAM_BUCKETS = [str(bucket) for bucket in range(0, 100, 10)]
+
+def score_bucket(score: float) -> str:
+    """Histogram bucket (lower bound of a 10-point band) for an overall score"""
+    return str(min(int(max(score or 0.0, 0.0) // 10) * 10, 90))
+
+def _skill_updates(match_doc: Dict[str, Any], delta: int) -> List[UpdateOne]:
+    updates = []
+    for kind, field in ((MISSING_SKILL, "missing_skills"), (MATCHED_KEYWORD, "matched_keywords")):
+        for skill in match_doc.get(field, []):
+            updates.append(UpdateOne(
+                {"job_id": match_doc["job_id"], "kind": kind, "skill": skill},
+                {"$inc": {"count": delta}},
+                upsert=True
+            ))
+    return updates
+
+async def record_match(match_doc: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+    """Fold a newly stored match into its job's summary.
+
+    Pass the match's previous version as `previous` when a match is rescored,
+    so its old contribution is removed first.
+    """
+    increments: Dict[str, float] = {
+        "match_count": 0 if previous else 1,
+        "score_sum": match_doc.get("overall_score", 0.0) - (previous or {}).get("overall_score", 0.0),
+    }
+    new_bucket = f"score_histogram.{score_bucket(match_doc.get('overall_score', 0.0))}"
+    increments[new_bucket] = 1
+    if previous:
+        old_bucket = f"score_histogram.{score_bucket(previous.get('overall_score', 0.0))}"
+        increments[old_bucket] = increments.get(old_bucket, 0) - 1
+
+    await job_analytics_collection.update_one(
+        {"_id": match_doc["job_id"]},
+        {"$inc": increments, "$set": {"job_id": match_doc["job_id"], "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+    updates = _skill_updates(match_doc, 1)
+    if previous:
+        updates += _skill_updates(previous, -1)
+    if updates:
+        await job_skill_stats_collection.bulk_write(updates, ordered=False)
+
+async def remove_matches(match_docs: List[Dict[str, Any]]):
+    """Take deleted matches out of their jobs' summaries"""
+    increments: Dict[str, Dict[str, float]] = {}
+    skill_updates: List[UpdateOne] = []
+    for match_doc in match_docs:
+        job = increments.setdefault(match_doc["job_id"], {"match_count": 0, "score_sum": 0.0})
+        job["match_count"] -= 1
+        job["score_sum"] -= match_doc.get("overall_score", 0.0)
+        bucket = f"score_histogram.{score_bucket(match_doc.get('overall_score', 0.0))}"
+        job[bucket] = job.get(bucket, 0) - 1
+        skill_updates += _skill_updates(match_doc, -1)
+
+    if increments:
+        now = datetime.now(timezone.utc)
+        await job_analytics_collection.bulk_write([
+            UpdateOne({"_id": job_id}, {"$inc": job, "$set": {"updated_at": now}})
+            for job_id, job in increments.items()
+        ], ordered=False)
+    if skill_updates:
+        await job_skill_stats_collection.bulk_write(skill_updates, ordered=False)
+
+async def rebuild_job_analytics(job_id: Optional[str] = None):
+    """Recompute summaries from the matches collection with aggregation pipelines.
+
+    Used to backfill or repair the materialized views; incremental updates
+    arriving while it runs may be counted twice, so run it while idle.
+    """
+    match_filter = {"job_id": job_id} if job_id else {}
+    await job_analytics_collection.delete_many({"_id": job_id} if job_id else {})
+    await job_skill_stats_collection.delete_many(match_filter)
+
+    bucket = {"$toString": {"$toInt": {"$min": [90, {"$multiply": [
+        {"$floor": {"$divide": [{"$max": [0, {"$ifNull": ["$overall_score", 0]}]}, 10]}}, 10
+    ]}]}}}
+    summary_pipeline = [
+        {"$match": match_filter},
+        {"$group": {
+            "_id": {"job_id": "$job_id", "bucket": bucket},
+            "count": {"$sum": 1},
+            "score_sum": {"$sum": "$overall_score"}
+        }},
+        {"$group": {
+            "_id": "$_id.job_id",
+            "match_count": {"$sum": "$count"},
+            "score_sum": {"$sum": "$score_sum"},
+            "buckets": {"$push": {"k": "$_id.bucket", "v": "$count"}}
+        }},
+        {"$project": {
+            "job_id": "$_id",
+            "match_count": 1,
+            "score_sum": 1,
+            "score_histogram": {"$arrayToObject": "$buckets"},
+            "updated_at": "$$NOW"
+        }},
+        {"$merge": {"into": job_analytics_collection.name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+    def tagged(field: str, kind: str) -> Dict[str, Any]:
+        return {"$map": {"input": {"$ifNull": [f"${field}", []]}, "as": "skill", "in": {"kind": kind, "skill": "$$skill"}}}
+
+    skills_pipeline = [
+        {"$match": match_filter},
+        {"$project": {"job_id": 1, "skills": {"$concatArrays": [
+            tagged("missing_skills", MISSING_SKILL),
+            tagged("matched_keywords", MATCHED_KEYWORD)
+        ]}}},
+        {"$unwind": "$skills"},
+        {"$group": {"_id": {"job_id": "$job_id", "kind": "$skills.kind", "skill": "$skills.skill"}, "count": {"$sum": 1}}},
+        {"$project": {"_id": 0, "job_id": "$_id.job_id", "kind": "$_id.kind", "skill": "$_id.skill", "count": 1}},
+        {"$merge": {"into": job_skill_stats_collection.name, "on": ["job_id", "kind", "skill"], "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+    for pipeline in (summary_pipeline, skills_pipeline):
+        async for _ in matches_collection.aggregate(pipeline):
+            pass
+
+async def _top_skills(job_id: str, kind: str, limit: int) -> List[Dict[str, Any]]:
+    cursor = job_skill_stats_collection.find(
+        {"job_id": job_id, "kind": kind, "count": {"$gt": 0}},
+        {"_id": 0, "skill": 1, "count": 1}
+    ).sort("count", DESCENDING).limit(limit)
+    return [doc async for doc in cursor]
+
+async def get_job_analytics(job_id: str, top: int = 10) -> Optional[Dict[str, Any]]:
+    """Read a job's materialized summary; None if no match has been recorded"""
+    summary = await job_analytics_collection.find_one({"_id": job_id})
+    if not summary:
+        return None
+
+    match_count = summary.get("match_count", 0)
+    histogram = summary.get("score_histogram", {})
+    return {
+        "job_id": job_id,
+        "match_count": match_count,
+        "average_score": round(summary.get("score_sum", 0.0) / match_count, 1) if match_count else 0.0,
+        "score_histogram": {bucket: histogram.get(bucket, 0) for bucket in HISTOGRAM_BUCKETS},
+        "top_missing_skills": await _top_skills(job_id, MISSING_SKILL, top),
+        "top_matched_keywords": await _top_skills(job_id, MATCHED_KEYWORD, top),
+        "updated_at": summary.get("updated_at")
+    }
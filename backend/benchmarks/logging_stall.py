@@ -0,0 +1,99 @@
+"""Event-loop stall caused by synchronous log writes, before and after the queue-backed pipeline.
+
+Simulates request handlers that log an error with a large payload (like the
+old full-LLM-response prints) while stdout drains slowly, as it does behind
+a busy pipe or container log driver. A probe task measures how late the
+event loop wakes it up.
+
+    python benchmarks/logging_stall.py [--requests 200] [--sink-delay-ms 2]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_setup import setup_logging, stop_logging
+
+PAYLOAD = "x" * 4000
+
+class SlowStream:
+    """A stdout whose writes block, like a full pipe"""
+
+    def __init__(self, delay_seconds: float):
+        self.delay = delay_seconds
+        self.lines = 0
+
+    def write(self, text: str):
+        time.sleep(self.delay)
+        self.lines += text.count("\n")
+
+    def flush(self):
+        pass
+
+async def probe(lags: list, stop: asyncio.Event, interval: float = 0.001):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - started - interval) * 1000)
+
+async def run(log, requests: int, concurrency: int) -> dict:
+    lags: list = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    slots = asyncio.Semaphore(concurrency)
+
+    async def handler(i: int):
+        async with slots:
+            await asyncio.sleep(0.001)
+            log(i)
+            await asyncio.sleep(0.001)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    ordered = sorted(lags)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "lag_p50_ms": round(statistics.median(ordered), 2),
+        "lag_p99_ms": round(ordered[int(len(ordered) * 0.99) - 1], 2),
+        "lag_max_ms": round(ordered[-1], 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sink-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    sink = SlowStream(args.sink_delay_ms / 1000)
+    results = {}
+
+    def print_error(i: int):
+        print("JSON decode error: Expecting ',' delimiter", file=sink)
+        print(f"Response: {PAYLOAD}", file=sink)
+    results["print"] = asyncio.run(run(print_error, args.requests, args.concurrency))
+
+    setup_logging(sink)
+    logger = logging.getLogger("benchmark")
+
+    def log_error(i: int):
+        logger.warning("Unusable response: Expecting ',' delimiter", extra={"event": "llm.bad_output", "response": PAYLOAD})
+    results["queue"] = asyncio.run(run(log_error, args.requests, args.concurrency))
+    drain_started = time.perf_counter()
+    stop_logging()
+    results["queue"]["drain_after_s"] = round(time.perf_counter() - drain_started, 3)
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, sink write delay {args.sink_delay_ms} ms", file=sys.stderr)
+    for mode, result in results.items():
+        print(f"{mode:>6}: " + ", ".join(f"{name}={value}" for name, value in result.items()), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,29 @@
 import os
+import logging
+import sys
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from write_behind import WriteBehindBuffer, WRITE_BEHIND_ENABLED
+from profiling import stage
+
+logger = logging.getLogger(__name__)
+
 # MongoDB connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/resume_matcher")
 
+# Stored responses for Idempotency-Key retries expire after this long
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+
+# Run the query-plan check on startup and refuse to start if it fails
+VERIFY_QUERY_PLANS = os.getenv("DB_VERIFY_QUERY_PLANS", "false").lower() == "true"
+
 # Async MongoDB client for FastAPI
 client = AsyncIOMotorClient(MONGO_URL)
 database = client.get_default_database()
@@ -17,23 +33,240 @@ resumes_collection = database.resumes
 jobs_collection = database.jobs
 matches_collection = database.matches
 
+# Monotonic per-collection version counters, bumped on every write
+versions_collection = database.collection_versions
+
 # Sync client for initialization
 sync_client = MongoClient(MONGO_URL)
 sync_db = sync_client.get_default_database()
 
+# Declared indexes per collection. Every query shape in QUERY_SHAPES must be
+# served by one of these.
+INDEX_SPECS: Dict[str, List[Dict[str, Any]]] = {
+    "resumes": [
+        {"name": "resumes_id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        {"name": "resumes_processing_version", "keys": [("processing_version", ASCENDING), ("last_viewed_at", DESCENDING)]},
+    ],
+    "jobs": [
+        {"name": "jobs_id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        {"name": "jobs_processing_version", "keys": [("processing_version", ASCENDING), ("last_viewed_at", DESCENDING)]},
+    ],
+    "matches": [
+        {"name": "matches_id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        {"name": "matches_resume_created", "keys": [("resume_id", ASCENDING), ("created_at", DESCENDING)]},
+        {"name": "matches_job_created", "keys": [("job_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]},
+        {"name": "matches_resume_job", "keys": [("resume_id", ASCENDING), ("job_id", ASCENDING)]},
+        {"name": "matches_processing_version", "keys": [("processing_version", ASCENDING), ("last_viewed_at", DESCENDING)]},
+        # Also serves match expiry (see match_expiry.py), which needs a prefix range on created_at
+        {"name": "matches_created_id", "keys": [("created_at", ASCENDING), ("id", ASCENDING)]},
+    ],
+    "job_skill_stats": [
+        {"name": "job_skill_stats_unique", "keys": [("job_id", ASCENDING), ("kind", ASCENDING), ("skill", ASCENDING)], "unique": True},
+        {"name": "job_skill_stats_top", "keys": [("job_id", ASCENDING), ("kind", ASCENDING), ("count", DESCENDING)]},
+    ],
+    "idempotency_keys": [
+        {"name": "idempotency_keys_ttl", "keys": [("created_at", ASCENDING)], "expireAfterSeconds": IDEMPOTENCY_TTL_HOURS * 60 * 60},
+    ],
+    "skills_dictionary": [
+        {"name": "skills_dictionary_skill_unique", "keys": [("skill", ASCENDING)], "unique": True},
+    ],
+    "screening_runs": [
+        {"name": "screening_runs_id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        {"name": "screening_runs_created", "keys": [("created_at", DESCENDING)]},
+    ],
+    "screening_results": [
+        {"name": "screening_results_shortlist", "keys": [("run_id", ASCENDING), ("job_id", ASCENDING), ("rank", ASCENDING)]},
+        {"name": "screening_results_pending_narratives", "keys": [("run_id", ASCENDING), ("narrative_generated", ASCENDING), ("rank", ASCENDING)]},
+    ],
+}
+
+# Indexes created by earlier versions that are now covered by a compound index
+LEGACY_INDEXES: Dict[str, List[str]] = {
+    # matches_created_at was a TTL index; expiry now deletes through match_expiry.py
+    "matches": ["resume_id_1", "job_id_1", "created_at_1", "matches_created_at"],
+}
+
+# Index options that must match for an existing index to be reused as-is
+_COMPARED_OPTIONS = ("unique", "expireAfterSeconds")
+
+# Known query shapes: (collection, description, filter, sort)
+QUERY_SHAPES: List[Tuple[str, str, Dict[str, Any], Optional[List[Tuple[str, int]]]]] = [
+    ("resumes", "resume by id", {"id": "probe"}, None),
+    ("jobs", "job by id", {"id": "probe"}, None),
+    ("matches", "match by id", {"id": "probe"}, None),
+    ("matches", "matches for a resume by date", {"resume_id": "probe"}, [("created_at", DESCENDING)]),
+    ("matches", "matches for a job by date", {"job_id": "probe"}, [("created_at", DESCENDING)]),
+    ("matches", "match for a resume/job pair", {"resume_id": "probe", "job_id": "probe"}, None),
+    ("matches", "match export", {}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("matches", "match export for a job", {"job_id": "probe"}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("matches", "expired matches", {"created_at": {"$lt": "probe"}}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("resumes", "stale resumes", {"processing_version": {"$ne": "probe"}}, [("last_viewed_at", DESCENDING)]),
+    ("jobs", "stale jobs", {"processing_version": {"$ne": "probe"}}, [("last_viewed_at", DESCENDING)]),
+    ("matches", "stale matches", {"processing_version": {"$ne": "probe"}}, [("last_viewed_at", DESCENDING)]),
+    ("skills_dictionary", "skill ids by name", {"skill": {"$in": ["probe"]}}, None),
+    ("job_skill_stats", "top skills for a job", {"job_id": "probe", "kind": "probe", "count": {"$gt": 0}}, [("count", DESCENDING)]),
+    ("matches", "current matches for a job's shortlist", {"resume_id": {"$in": ["probe"]}, "job_id": "probe", "processing_version": "probe"}, None),
+    ("screening_runs", "screening run by id", {"id": "probe"}, None),
+    ("screening_runs", "recent screening runs", {}, [("created_at", DESCENDING)]),
+    ("screening_results", "shortlist for a job", {"run_id": "probe", "job_id": "probe"}, [("rank", ASCENDING)]),
+    ("screening_results", "pending screening narratives", {"run_id": "probe", "narrative_generated": False, "rank": {"$lte": 1}}, [("rank", ASCENDING)]),
+]
+
+def _index_matches_spec(existing: Dict[str, Any], spec: Dict[str, Any]) -> bool:
+    """Check whether an existing index (from index_information) equals a declared spec"""
+    if [tuple(key) for key in existing.get("key", [])] != [tuple(key) for key in spec["keys"]]:
+        return False
+    for option in _COMPARED_OPTIONS:
+        if existing.get(option) != spec.get(option):
+            # index_information omits unique=False
+            if option == "unique" and not existing.get(option) and not spec.get(option):
+                continue
+            return False
+    return True
+
+async def ensure_indexes(db=None) -> None:
+    """Apply INDEX_SPECS idempotently, replacing indexes whose definition changed"""
+    db = database if db is None else db
+
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+
+        for legacy_name in LEGACY_INDEXES.get(collection_name, []):
+            if legacy_name in existing:
+                await collection.drop_index(legacy_name)
+                existing.pop(legacy_name)
+
+        for spec in specs:
+            current = existing.get(spec["name"])
+            if current is not None and _index_matches_spec(current, spec):
+                continue
+
+            # Drop anything occupying the name or the key pattern with other options
+            for name, info in list(existing.items()):
+                if name == "_id_":
+                    continue
+                same_keys = [tuple(key) for key in info.get("key", [])] == [tuple(key) for key in spec["keys"]]
+                if name == spec["name"] or same_keys:
+                    await collection.drop_index(name)
+                    existing.pop(name)
+
+            options = {key: value for key, value in spec.items() if key != "keys"}
+            await collection.create_index(spec["keys"], **options)
+            existing[spec["name"]] = {"key": spec["keys"], **options}
+
+def _find_stages(plan: Any, stage: str) -> bool:
+    """Recursively look for a stage name anywhere in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+        return any(_find_stages(value, stage) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_find_stages(item, stage) for item in plan)
+    return False
+
+async def check_query_plans(db=None) -> List[str]:
+    """Run explain() on every known query shape and return those that do a COLLSCAN"""
+    db = database if db is None else db
+    failures = []
+
+    for collection_name, description, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        if _find_stages(winning_plan, "COLLSCAN"):
+            failures.append(f"{collection_name}: {description} ({query}) uses COLLSCAN")
+
+    return failures
+
 async def init_database():
     """Initialize database with indexes"""
-    try:
-        # Create indexes for better performance
-        await resumes_collection.create_index("id")
-        await jobs_collection.create_index("id")
-        await matches_collection.create_index("resume_id")
-        await matches_collection.create_index("job_id")
-        await matches_collection.create_index("created_at")
-        print("Database initialized successfully")
-    except Exception as e:
-        print(f"Error initializing database: {e}")
+    await ensure_indexes()
+
+    if VERIFY_QUERY_PLANS:
+        failures = await check_query_plans()
+        if failures:
+            raise RuntimeError("Query plan check failed: " + "; ".join(failures))
+
+    if write_behind is not None:
+        write_behind.start()
+
+    logger.info("Database initialized successfully")
+
+async def bump_version(collection_name: str) -> int:
+    """Increment the version counter of a collection after a write"""
+    doc = await versions_collection.find_one_and_update(
+        {"_id": collection_name},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+async def get_versions(collection_names: List[str]) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    """Read the current (version, updated_at) of several collections in one query"""
+    versions = {name: (0, None) for name in collection_names}
+    async for doc in versions_collection.find({"_id": {"$in": list(collection_names)}}):
+        versions[doc["_id"]] = (doc.get("version", 0), doc.get("updated_at"))
+    return versions
+
+async def _insert_batch(collection_name: str, documents: List[Dict[str, Any]]):
+    await database[collection_name].insert_many(documents, ordered=False)
+    # Bumped after the write, so a new ETag always reflects what a list query returns
+    await bump_version(collection_name)
+
+# Optional buffer that batches inserts; see write_behind.py
+write_behind = WriteBehindBuffer(_insert_batch) if WRITE_BEHIND_ENABLED else None
+
+async def insert_document(collection_name: str, document: Dict[str, Any]):
+    """Insert a document and bump its collection version.
+
+    With write-behind enabled the document is buffered and written in a
+    batch shortly after; use find_by_id to read it back before then.
+    """
+    with stage(f"mongo_insert_{collection_name}"):
+        if write_behind is not None:
+            await write_behind.add(collection_name, document)
+            return
+        await database[collection_name].insert_one(document)
+        await bump_version(collection_name)
+
+async def find_by_id(collection_name: str, doc_id: str, projection: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+    """Find a document by id, including one still in the write-behind buffer"""
+    if write_behind is not None:
+        doc = write_behind.get(collection_name, doc_id)
+        if doc is not None:
+            if projection:
+                return {field: doc[field] for field, include in projection.items() if include and field in doc}
+            return dict(doc)
+    with stage(f"mongo_find_{collection_name}"):
+        return await database[collection_name].find_one({"id": doc_id}, projection)
+
+async def flush_writes(collection_name: Optional[str] = None):
+    """Write out buffered inserts before a query that must see them"""
+    if write_behind is not None:
+        await write_behind.flush(collection_name)
 
 async def close_database():
-    """Close database connection"""
-    client.close()
\ No newline at end of file
+    """Flush buffered writes and close the database connection"""
+    if write_behind is not None:
+        await write_behind.close()
+    client.close()
+
+async def _run_check() -> int:
+    await ensure_indexes()
+    failures = await check_query_plans()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print(f"OK {len(QUERY_SHAPES)} query shapes use an index")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    # python database.py --check : apply indexes and verify query plans
+    if "--check" in sys.argv:
+        sys.exit(asyncio.run(_run_check()))
+    asyncio.run(ensure_indexes())
+    print("Indexes applied")
@@ -0,0 +1,118 @@
+import os
+import time
+import asyncio
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+import pymongo
+from fastapi import HTTPException, Request
+
+from metrics import counter
+
+# Default and maximum per-request deadline; clients may ask for less with X-Request-Timeout
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "60"))
+MAX_REQUEST_TIMEOUT_SECONDS = float(os.getenv("MAX_REQUEST_TIMEOUT_SECONDS", "300"))
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+# How often to check whether the client has gone away
+DISCONNECT_POLL_SECONDS = 0.25
+
+# Mongo operations get a little longer than the request, so the request is
+# cancelled (and reported as a 504) before the driver gives up on its own
+DB_TIMEOUT_GRACE_SECONDS = 1.0
+
+# Non-standard status for a client that closed the connection (nobody reads it)
+CLIENT_CLOSED_REQUEST = 499
+
+abandoned_requests = counter("requests_abandoned_total", "Requests whose work was cancelled, by endpoint and reason")
+
+T = TypeVar("T")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """The current request's deadline has passed"""
+
+def current_deadline() -> Optional[float]:
+    """The current request's deadline as a time.monotonic() value, if any.
+
+    Context variables don't follow work into executor threads, so pass this
+    explicitly to code that runs there.
+    """
+    return _deadline.get()
+
+def remaining(deadline: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the deadline (the current request's by default)"""
+    deadline = deadline if deadline is not None else _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def check(deadline: Optional[float] = None):
+    """Raise DeadlineExceeded if the deadline has passed; for loops that can stop between steps"""
+    left = remaining(deadline)
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+def request_timeout(request: Request) -> float:
+    """The deadline requested by the client, capped at the configured maximum"""
+    try:
+        requested = float(request.headers.get(TIMEOUT_HEADER, REQUEST_TIMEOUT_SECONDS))
+    except ValueError:
+        requested = REQUEST_TIMEOUT_SECONDS
+    return min(max(requested, 0.1), MAX_REQUEST_TIMEOUT_SECONDS)
+
+async def _wait_for_disconnect(request: Request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+async def _run(handler: Callable[[], Awaitable[T]], timeout: float) -> T:
+    # Set inside the task so every Mongo operation it starts inherits the limit
+    with pymongo.timeout(timeout + DB_TIMEOUT_GRACE_SECONDS):
+        return await handler()
+
+async def run_with_deadline(request: Request, endpoint: str, handler: Callable[[], Awaitable[T]],
+                            cancel_on_disconnect: bool = True) -> T:
+    """Run an endpoint's work under a deadline, cancelling it if the deadline
+    passes (504) or, unless disabled, the client disconnects first.
+
+    The deadline is visible to the work through current_deadline()/check().
+    """
+    timeout = request_timeout(request)
+    token = _deadline.set(time.monotonic() + timeout)
+    try:
+        work = asyncio.ensure_future(_run(handler, timeout))
+        # Without cancel_on_disconnect this never finishes and only the deadline applies
+        disconnected = asyncio.ensure_future(
+            _wait_for_disconnect(request) if cancel_on_disconnect else asyncio.Event().wait()
+        )
+        try:
+            done, _ = await asyncio.wait({work, disconnected}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            work.cancel()
+            raise
+        finally:
+            disconnected.cancel()
+
+        if work in done:
+            try:
+                return work.result()
+            except DeadlineExceeded:
+                abandoned_requests.inc(endpoint=endpoint, reason="deadline")
+                raise _deadline_exceeded(timeout)
+
+        work.cancel()
+        await asyncio.gather(work, return_exceptions=True)
+        if disconnected in done:
+            abandoned_requests.inc(endpoint=endpoint, reason="client_disconnected")
+            raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+        abandoned_requests.inc(endpoint=endpoint, reason="deadline")
+        raise _deadline_exceeded(timeout)
+    finally:
+        _deadline.reset(token)
+
+def _deadline_exceeded(timeout: float) -> HTTPException:
+    return HTTPException(
+        status_code=504,
+        detail=f"Request deadline of {timeout:g}s exceeded; the work was cancelled",
+        headers={"X-Deadline-Exceeded": "true"}
+    )
@@ -5,32 +5,51 @@ import PyPDF2
 from docx import Document
 import tempfile
 import os
+import logging
+
+from deadlines import DeadlineExceeded, check
+from profiling import stage
+
+logger = logging.getLogger(__name__)
 
 class FileProcessor:
     """Process various file types and extract text content"""
     
     @staticmethod
-    def extract_text_from_base64(file_content: str, file_type: str) -> Optional[str]:
-        """Extract text from base64 encoded file"""
+    def extract_text_from_base64(file_content: str, file_type: str, deadline: Optional[float] = None) -> Optional[str]:
+        """Extract text from base64 encoded file, stopping early if the deadline passes"""
         try:
             # Decode base64 content
-            file_data = base64.b64decode(file_content)
-            
-            if file_type.lower() == 'pdf':
-                return FileProcessor._extract_from_pdf(file_data)
-            elif file_type.lower() in ['docx', 'doc']:
-                return FileProcessor._extract_from_docx(file_data)
-            elif file_type.lower() == 'txt':
-                return file_data.decode('utf-8')
-            else:
-                raise ValueError(f"Unsupported file type: {file_type}")
+            with stage("base64_decode"):
+                file_data = base64.b64decode(file_content)
+        except Exception as e:
+            logger.warning("Error decoding %s content: %s", file_type, e)
+            return None
+        
+        return FileProcessor.extract_text_from_bytes(file_data, file_type, deadline)
+    
+    @staticmethod
+    def extract_text_from_bytes(file_data: bytes, file_type: str, deadline: Optional[float] = None) -> Optional[str]:
+        """Extract text from raw file bytes"""
+        try:
+            with stage(f"extract_text_{file_type.lower()}"):
+                if file_type.lower() == 'pdf':
+                    return FileProcessor._extract_from_pdf(file_data, deadline)
+                elif file_type.lower() in ['docx', 'doc']:
+                    return FileProcessor._extract_from_docx(file_data, deadline)
+                elif file_type.lower() == 'txt':
+                    return file_data.decode('utf-8')
+                else:
+                    raise ValueError(f"Unsupported file type: {file_type}")
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error extracting text from {file_type}: {e}")
+            logger.warning("Error extracting text from %s: %s", file_type, e)
             return None
     
     @staticmethod
-    def _extract_from_pdf(file_data: bytes) -> str:
+    def _extract_from_pdf(file_data: bytes, deadline: Optional[float] = None) -> str:
         """Extract text from PDF file data"""
         try:
             pdf_file = io.BytesIO(file_data)
@@ -38,33 +57,43 @@ class FileProcessor:
             
             text = ""
             for page in pdf_reader.pages:
+                # Runs on a worker thread, which cancelling the request can't interrupt
+                check(deadline)
                 text += page.extract_text() + "\n"
             
             return text.strip()
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error extracting PDF text: {e}")
+            logger.warning("Error extracting PDF text: %s", e)
             return ""
     
     @staticmethod
-    def _extract_from_docx(file_data: bytes) -> str:
+    def _extract_from_docx(file_data: bytes, deadline: Optional[float] = None) -> str:
         """Extract text from DOCX file data"""
+        temp_file_path = None
         try:
             # Create a temporary file
             with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as temp_file:
                 temp_file.write(file_data)
                 temp_file_path = temp_file.name
             
-            # Extract text from docx
+            # Parsing is the slow part and can't be interrupted, so check around it
+            check(deadline)
             doc = Document(temp_file_path)
+            check(deadline)
             text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
             
-            # Clean up temporary file
-            os.unlink(temp_file_path)
-            
             return text.strip()
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error extracting DOCX text: {e}")
+            logger.warning("Error extracting DOCX text: %s", e)
             return ""
+        finally:
+            # Clean up temporary file
+            if temp_file_path:
+                os.unlink(temp_file_path)
     
     @staticmethod
     def validate_file_size(file_content: str, max_size_mb: int = 100) -> bool:
@@ -78,6 +107,11 @@ class FileProcessor:
         except Exception:
             return False
     
+    @staticmethod
+    def get_file_type(filename: str) -> str:
+        """Get the file type from a filename's extension"""
+        return os.path.splitext(filename)[1].lstrip('.').lower()
+    
     @staticmethod
     def get_supported_formats():
         """Get list of supported file formats"""
@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+
+from database import get_versions
+
+# Upper bound on the serialized bytes kept by the in-process response cache
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+class ResponseCache:
+    """LRU cache of serialized response bodies, each valid for a single ETag"""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._size = 0
+
+    def get(self, key: str, etag: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != etag:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, etag: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous[1])
+        self._entries[key] = (etag, body)
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+response_cache = ResponseCache()
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [value.strip() for value in header.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+async def cached_json_response(
+    request: Request,
+    key: str,
+    collections: List[str],
+    build: Callable[[], Awaitable[Tuple[Dict[str, Any], bool]]]
+) -> Response:
+    """Serve a JSON payload with ETag/Last-Modified derived from collection versions.
+
+    Only the version counters are read before deciding: a matching
+    If-None-Match gets a 304 and a cached body is reused as-is. Otherwise
+    build() produces (payload, cacheable) and the serialized body is cached
+    under the current ETag when cacheable is true.
+    """
+    versions = await get_versions(collections)
+    fingerprint = key + "|" + "|".join(f"{name}:{versions[name][0]}" for name in sorted(collections))
+    etag = '"' + hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:20] + '"'
+
+    updated = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    last_modified = max(updated) if updated else datetime(1970, 1, 1, tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": "no-cache"
+    }
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(key, etag)
+    if body is None:
+        payload, cacheable = await build()
+        body = json.dumps(payload, default=str).encode("utf-8")
+        if cacheable:
+            response_cache.put(key, etag, body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
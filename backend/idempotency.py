@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
+
+from database import database
+from metrics import counter
+
+# How long a retry waits for the original request to finish before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))
+# An in-progress claim older than this is assumed to belong to a crashed process
+IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS = float(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS", "300"))
+IDEMPOTENCY_POLL_SECONDS = 0.25
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+idempotency_keys_collection = database.idempotency_keys
+
+idempotent_requests = counter("idempotent_requests_total", "Requests with an Idempotency-Key, by endpoint and outcome")
+
+# Requests with a claimed key running in this process; retries here wait on them directly
+_in_flight: Dict[str, asyncio.Future] = {}
+
+_CANONICAL_JSON = json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+
+def request_hash(payload: Any) -> str:
+    """Fingerprint of a request body, to reject a key reused for a different request.
+
+    Bodies carry base64 uploads of up to 100MB, so the JSON is hashed in
+    chunks rather than built as one string; run it off the event loop.
+    """
+    digest = hashlib.sha256()
+    for chunk in _CANONICAL_JSON.iterencode(jsonable_encoder(payload)):
+        digest.update(chunk.encode("utf-8"))
+    return digest.hexdigest()
+
+def _replay(record: Dict[str, Any]) -> JSONResponse:
+    return JSONResponse(
+        status_code=record.get("status_code", 200),
+        content=record["response"],
+        headers={REPLAYED_HEADER: "true"}
+    )
+
+async def _claim(record_id: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Claim a key; returns None if claimed, else the existing record"""
+    now = datetime.now(timezone.utc)
+    try:
+        await idempotency_keys_collection.insert_one({
+            "_id": record_id, "request_hash": fingerprint, "status": IN_PROGRESS, "created_at": now
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    record = await idempotency_keys_collection.find_one({"_id": record_id})
+    if record is None:
+        # Released between our insert and find; try again
+        return await _claim(record_id, fingerprint)
+    if record["status"] == IN_PROGRESS and record_id not in _in_flight:
+        started = record["created_at"].replace(tzinfo=timezone.utc)
+        if now - started > timedelta(seconds=IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS):
+            # The process that claimed it is gone; take it over
+            taken = await idempotency_keys_collection.find_one_and_update(
+                {"_id": record_id, "status": IN_PROGRESS, "created_at": record["created_at"]},
+                {"$set": {"request_hash": fingerprint, "created_at": now}}
+            )
+            if taken is not None:
+                return None
+    return record
+
+async def _wait_for(record_id: str) -> Optional[Dict[str, Any]]:
+    """Wait for an in-progress request; returns its completed record, or None if it failed"""
+    future = _in_flight.get(record_id)
+    if future is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(future), IDEMPOTENCY_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            raise _still_running()
+        return future.result()
+
+    # Running in another process: poll until it completes or releases the key
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+        record = await idempotency_keys_collection.find_one({"_id": record_id})
+        if record is None:
+            return None
+        if record["status"] == COMPLETED:
+            return record
+    raise _still_running()
+
+def _still_running() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is still in progress",
+        headers={"Retry-After": str(int(IDEMPOTENCY_POLL_SECONDS * 20))}
+    )
+
+async def run_idempotent(key: Optional[str], endpoint: str, payload: Any, handler: Callable[[], Awaitable[Any]]):
+    """Run handler at most once per (endpoint, Idempotency-Key).
+
+    A retry of a completed request gets the stored response; a retry while
+    it is still running waits for it. Reusing a key for a different request
+    is rejected with 422. A failed request releases its key so the client
+    can retry it.
+    """
+    if key is None:
+        return await handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters")
+
+    record_id = f"{endpoint}:{key}"
+    fingerprint = await asyncio.to_thread(request_hash, payload)
+    while True:
+        record = await _claim(record_id, fingerprint)
+        if record is None:
+            break
+        if record["request_hash"] != fingerprint:
+            idempotent_requests.inc(endpoint=endpoint, outcome="mismatch")
+            raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} was already used for a different request")
+        if record["status"] == IN_PROGRESS:
+            idempotent_requests.inc(endpoint=endpoint, outcome="waited")
+            record = await _wait_for(record_id)
+            if record is None:
+                # The original failed and released the key; run it ourselves
+                continue
+        idempotent_requests.inc(endpoint=endpoint, outcome="replayed")
+        return _replay(record)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[record_id] = future
+    try:
+        response = await handler()
+        completed = {
+            "_id": record_id,
+            "request_hash": fingerprint,
+            "status": COMPLETED,
+            "status_code": 200,
+            "response": jsonable_encoder(response),
+            "created_at": datetime.now(timezone.utc)
+        }
+        await idempotency_keys_collection.replace_one({"_id": record_id}, completed)
+        future.set_result(completed)
+        idempotent_requests.inc(endpoint=endpoint, outcome="executed")
+        return response
+    except BaseException:
+        # Let the client (or a waiting retry) run it again
+        await asyncio.shield(idempotency_keys_collection.delete_one({"_id": record_id, "status": IN_PROGRESS}))
+        future.set_result(None)
+        idempotent_requests.inc(endpoint=endpoint, outcome="failed")
+        raise
+    finally:
+        _in_flight.pop(record_id, None)
@@ -0,0 +1,409 @@
+import os
+import logging
+import re
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Type
+from pydantic import BaseModel, ValidationError, field_validator
+
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+# Follow-up calls allowed per response to complete a truncated reply or fix a malformed one
+LLM_JSON_MAX_FOLLOWUPS = int(os.getenv("LLM_JSON_MAX_FOLLOWUPS", "1"))
+
+llm_json_repairs = counter("llm_json_repairs_total", "Defects repaired locally in LLM JSON responses, by task and repair")
+llm_json_outcomes = counter("llm_json_outcomes_total", "LLM JSON responses by task and outcome (clean, repaired, continued, fixed, failed)")
+
+_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_BARE_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class LLMOutputError(Exception):
+    """The LLM response could not be parsed into the task's schema, even after a follow-up"""
+
+    def __init__(self, task: str, reason: str):
+        super().__init__(f"{task}: {reason}")
+        self.task = task
+        self.reason = reason
+
+class JSONRepairError(ValueError):
+    """The text is not JSON that can be repaired locally"""
+
+class _EndOfInput(Exception):
+    pass
+
+class PartialJSON:
+    """Result of a tolerant parse.
+
+    truncated is set when the text ended inside the object; cut_field is then
+    the top-level field that was being written, kept with its complete items.
+    """
+
+    def __init__(self, value: Dict[str, Any], repairs: Set[str], truncated: bool, cut_field: Optional[str]):
+        self.value = value
+        self.repairs = repairs
+        self.truncated = truncated
+        self.cut_field = cut_field
+
+class _Parser:
+    """Recursive-descent JSON parser that tolerates what LLMs commonly get wrong:
+    markdown fences, prose around the object, trailing or missing commas,
+    single quotes, unquoted keys, Python literals, raw newlines in strings and
+    truncation. Truncated values are dropped, keeping every complete item.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.depth = 0
+        self.repairs: Set[str] = set()
+        self.truncated = False
+        self.cut_field: Optional[str] = None
+
+    def _skip(self):
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def _peek(self) -> str:
+        self._skip()
+        if self.pos >= len(self.text):
+            raise _EndOfInput()
+        return self.text[self.pos]
+
+    def value(self) -> Any:
+        char = self._peek()
+        if char == "{":
+            return self.object()
+        if char == "[":
+            return self.array()
+        if char in "\"'":
+            return self.string()
+        match = _NUMBER.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            if self.pos >= len(self.text):
+                # A number at the very end may be cut short
+                raise _EndOfInput()
+            number = match.group()
+            return float(number) if any(c in number for c in ".eE") else int(number)
+        match = _BARE_WORD.match(self.text, self.pos)
+        if match and match.group() in _LITERALS:
+            if match.group() not in ("true", "false", "null"):
+                self.repairs.add("python_literal")
+            self.pos = match.end()
+            return _LITERALS[match.group()]
+        if match and match.end() >= len(self.text) and any(word.startswith(match.group()) for word in _LITERALS):
+            raise _EndOfInput()
+        raise JSONRepairError(f"Unexpected {char!r} at position {self.pos}")
+
+    def string(self) -> str:
+        quote = self.text[self.pos]
+        if quote == "'":
+            self.repairs.add("single_quotes")
+        self.pos += 1
+        chars: List[str] = []
+        while True:
+            if self.pos >= len(self.text):
+                raise _EndOfInput()
+            char = self.text[self.pos]
+            if char == quote:
+                self.pos += 1
+                return "".join(chars)
+            if char == "\\":
+                if self.pos + 1 >= len(self.text):
+                    raise _EndOfInput()
+                escaped = self.text[self.pos + 1]
+                if escaped == "u":
+                    digits = self.text[self.pos + 2:self.pos + 6]
+                    if len(digits) < 4:
+                        raise _EndOfInput()
+                    try:
+                        chars.append(chr(int(digits, 16)))
+                    except ValueError:
+                        raise JSONRepairError(f"Invalid unicode escape at position {self.pos}")
+                    self.pos += 6
+                    continue
+                if escaped not in _ESCAPES:
+                    # Invalid escapes such as "C\+\+" keep just the escaped character
+                    self.repairs.add("invalid_escape")
+                chars.append(_ESCAPES.get(escaped, escaped))
+                self.pos += 2
+                continue
+            if char < " ":
+                self.repairs.add("control_character")
+            chars.append(char)
+            self.pos += 1
+
+    def _key(self) -> str:
+        if self.text[self.pos] in "\"'":
+            return self.string()
+        match = _BARE_WORD.match(self.text, self.pos)
+        if not match:
+            raise JSONRepairError(f"Expected a key at position {self.pos}")
+        if match.end() >= len(self.text):
+            raise _EndOfInput()
+        self.repairs.add("unquoted_key")
+        self.pos = match.end()
+        return match.group()
+
+    def _separator(self, closing: str) -> bool:
+        """Consume a comma; returns True at the closing bracket"""
+        char = self._peek()
+        if char == closing:
+            self.pos += 1
+            return True
+        if char == ",":
+            self.pos += 1
+            if self._peek() == closing:
+                self.repairs.add("trailing_comma")
+            return False
+        if char in "\"'{[" or _BARE_WORD.match(char) or _NUMBER.match(char):
+            self.repairs.add("missing_comma")
+            return False
+        raise JSONRepairError(f"Expected ',' or {closing!r} at position {self.pos}")
+
+    def object(self) -> Dict[str, Any]:
+        self.pos += 1
+        self.depth += 1
+        result: Dict[str, Any] = {}
+        key = None
+        try:
+            if self._peek() == "}":
+                self.pos += 1
+                return result
+            while True:
+                key = None
+                if self._peek() == ",":
+                    self.repairs.add("extra_comma")
+                    self.pos += 1
+                    continue
+                if self._peek() == "}":
+                    # After a trailing comma
+                    self.pos += 1
+                    return result
+                key = self._key()
+                if self._peek() != ":":
+                    raise JSONRepairError(f"Expected ':' at position {self.pos}")
+                self.pos += 1
+                result[key] = self.value()
+                if self.truncated:
+                    # A nested container was cut short; keep what it holds
+                    if self.depth == 1 and self.cut_field is None:
+                        self.cut_field = key
+                    return result
+                if self._separator("}"):
+                    return result
+        except _EndOfInput:
+            self.truncated = True
+            if self.depth == 1 and self.cut_field is None and key is not None and key not in result:
+                self.cut_field = key
+            return result
+        finally:
+            self.depth -= 1
+
+    def array(self) -> List[Any]:
+        self.pos += 1
+        self.depth += 1
+        result: List[Any] = []
+        try:
+            if self._peek() == "]":
+                self.pos += 1
+                return result
+            while True:
+                if self._peek() == ",":
+                    self.repairs.add("extra_comma")
+                    self.pos += 1
+                    continue
+                if self._peek() == "]":
+                    # After a trailing comma
+                    self.pos += 1
+                    return result
+                result.append(self.value())
+                if self.truncated or self._separator("]"):
+                    return result
+        except _EndOfInput:
+            self.truncated = True
+            return result
+        finally:
+            self.depth -= 1
+
+def parse_partial(text: str) -> PartialJSON:
+    """Parse the first JSON object in an LLM response, repairing what it can.
+
+    Raises JSONRepairError if there is no object or it is malformed beyond
+    the repairs above.
+    """
+    cleaned = _FENCE.sub("", text)
+    start = cleaned.find("{")
+    if start == -1:
+        raise JSONRepairError("No JSON object in the response")
+    parser = _Parser(cleaned)
+    if cleaned[:start].strip():
+        parser.repairs.add("leading_text")
+    parser.pos = start
+    value = parser.object()
+    if not parser.truncated and cleaned[parser.pos:].strip():
+        parser.repairs.add("trailing_text")
+    if parser.truncated:
+        parser.repairs.add("truncated")
+    return PartialJSON(value, parser.repairs, parser.truncated, parser.cut_field)
+
+def _string_list(value: Any) -> List[str]:
+    """Lenient list-of-strings coercion: null becomes an empty list, a lone
+    string becomes a list, and blank or duplicate items are dropped
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        raise ValueError("expected a list of strings")
+    items = []
+    for item in value:
+        if isinstance(item, dict):
+            item = ", ".join(str(part) for part in item.values() if part)
+        elif isinstance(item, (list, tuple)):
+            item = ", ".join(str(part) for part in item if part)
+        elif item is not None:
+            item = str(item)
+        if item and item.strip() and item.strip() not in items:
+            items.append(item.strip())
+    return items
+
+class ResumeExtraction(BaseModel):
+    skills: List[str]
+    experience: List[str]
+    qualifications: List[str]
+    keywords: List[str]
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _lists(cls, value: Any) -> List[str]:
+        return _string_list(value)
+
+class JobExtraction(BaseModel):
+    required_skills: List[str]
+    required_experience: List[str]
+    required_qualifications: List[str]
+    keywords: List[str]
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _lists(cls, value: Any) -> List[str]:
+        return _string_list(value)
+
+class MatchNarrative(BaseModel):
+    suggestions: List[str]
+    detailed_analysis: str
+
+    @field_validator("suggestions", mode="before")
+    @classmethod
+    def _suggestion_list(cls, value: Any) -> List[str]:
+        return _string_list(value)
+
+    @field_validator("detailed_analysis")
+    @classmethod
+    def _not_blank(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("detailed_analysis is empty")
+        return value.strip()
+
+COMPLETE_PROMPT = """
+        Your previous JSON response was incomplete. This is everything that was received, re-serialized:
+        {received}
+        
+        Reply with a JSON object containing only these fields: {fields}
+        {cut_field_note}- Only return the JSON, no additional text
+        """
+
+CUT_FIELD_NOTE = """- "{cut_field}" was cut off: list only the items after the ones already received
+        """
+
+FIX_PROMPT = """
+        Your previous response could not be used: {error}
+        
+        Previous response:
+        {response}
+        
+        Return it as a single valid JSON object with exactly these fields: {fields}
+        Do not re-analyze anything; only correct the format. Only return the JSON, no additional text.
+        """
+
+def _merge(received: Dict[str, Any], continuation: Dict[str, Any], cut_field: Optional[str]) -> Dict[str, Any]:
+    merged = dict(received)
+    for name, value in continuation.items():
+        if name == cut_field and isinstance(merged.get(name), list) and isinstance(value, list):
+            merged[name] = merged[name] + [item for item in value if item not in merged[name]]
+        elif name not in merged or name == cut_field:
+            merged[name] = value
+    return merged
+
+def _validate(schema: Type[BaseModel], value: Dict[str, Any]) -> Tuple[Optional[BaseModel], Optional[str]]:
+    try:
+        return schema.model_validate(value), None
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+
+def _parse(task: str, text: str) -> PartialJSON:
+    partial = parse_partial(text)
+    for repair in partial.repairs:
+        llm_json_repairs.inc(task=task, repair=repair)
+    return partial
+
+async def parse_llm_json(task: str, schema: Type[BaseModel], response: str,
+                         followup: Callable[[str], Awaitable[str]]) -> BaseModel:
+    """Parse and validate an LLM response against the task's schema.
+
+    Local repairs come first. A truncated or incomplete reply is completed by
+    asking for only the missing fields and items; a malformed one is sent
+    back to be reformatted, without the source document. Raises
+    LLMOutputError when the result still doesn't validate, so nothing empty
+    gets stored.
+    """
+    followups = LLM_JSON_MAX_FOLLOWUPS
+    outcome = "clean"
+    value: Optional[Dict[str, Any]] = None
+    error = None
+    try:
+        partial = _parse(task, response)
+        value = partial.value
+        if partial.repairs:
+            outcome = "repaired"
+        cut_field = partial.cut_field if partial.truncated else None
+        wanted = ([cut_field] if cut_field in value else []) + [name for name in schema.model_fields if name not in value]
+        if wanted and followups:
+            followups -= 1
+            outcome = "continued"
+            continuation = _parse(task, await followup(COMPLETE_PROMPT.format(
+                received=json.dumps(value, ensure_ascii=False),
+                fields=", ".join(wanted),
+                cut_field_note=CUT_FIELD_NOTE.format(cut_field=cut_field) if cut_field in value else ""
+            )))
+            value = _merge(value, continuation.value, cut_field)
+    except JSONRepairError as e:
+        error = str(e)
+
+    while True:
+        if value is not None:
+            result, error = _validate(schema, value)
+            if result is not None:
+                llm_json_outcomes.inc(task=task, outcome=outcome)
+                return result
+        if not followups:
+            break
+        followups -= 1
+        outcome = "fixed"
+        previous = json.dumps(value, ensure_ascii=False) if value is not None else response
+        try:
+            value = _parse(task, await followup(FIX_PROMPT.format(
+                error=error, response=previous, fields=", ".join(schema.model_fields)
+            ))).value
+        except JSONRepairError as e:
+            value, error = None, str(e)
+    llm_json_outcomes.inc(task=task, outcome="failed")
+    # The formatter truncates the response; the full text is rarely needed
+    logger.warning("Unusable %s response: %s", task, error, extra={"event": "llm.bad_output", "task": task, "response": response})
+    raise LLMOutputError(task, error)
@@ -0,0 +1,181 @@
+import os
+import logging
+import time
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+
+from metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+# Per-call deadline, including any hedged duplicate
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "30"))
+
+# Send a duplicate request when the first hasn't answered by the observed p95
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1.0"))
+# Don't hedge until enough latencies have been observed to trust the percentile
+LLM_HEDGE_MIN_SAMPLES = 20
+
+# Circuit breaker: open when the error rate over the window passes the threshold
+BREAKER_ERROR_THRESHOLD = float(os.getenv("LLM_BREAKER_ERROR_THRESHOLD", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+llm_calls = counter("llm_calls_total", "LLM calls by outcome")
+llm_hedges = counter("llm_hedged_requests_total", "Duplicate LLM requests sent because the first was slow")
+llm_hedge_wins = counter("llm_hedge_wins_total", "Hedged LLM requests that answered before the original")
+llm_latency = histogram("llm_call_latency_seconds", "Latency of successful LLM calls", [0.5, 1, 2, 5, 10, 20, 30, 60])
+llm_breaker_state = gauge("llm_circuit_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)")
+
+class LLMUnavailableError(Exception):
+    """The LLM call failed or timed out, or the circuit breaker is open"""
+
+class CircuitOpenError(LLMUnavailableError):
+    """The circuit breaker is open; the call was not attempted"""
+
+class LatencyTracker:
+    """Rolling window of recent call latencies"""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class CircuitBreaker:
+    """Error-rate circuit breaker with a single half-open probe"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self._results: Deque[Tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        llm_breaker_state.set(_STATE_VALUES[CLOSED], model=name)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("LLM circuit breaker for %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        llm_breaker_state.set(_STATE_VALUES[state], model=self.name)
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < BREAKER_OPEN_SECONDS:
+                return False
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        """Let another half-open probe through after one was abandoned"""
+        self._probe_in_flight = False
+
+    def record(self, success: bool):
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            if success:
+                self._results.clear()
+                self._set_state(CLOSED)
+            else:
+                self._opened_at = now
+                self._set_state(OPEN)
+            return
+
+        self._results.append((now, success))
+        while self._results and now - self._results[0][0] > BREAKER_WINDOW_SECONDS:
+            self._results.popleft()
+        failures = sum(1 for _, ok in self._results if not ok)
+        if len(self._results) >= BREAKER_MIN_CALLS and failures / len(self._results) >= BREAKER_ERROR_THRESHOLD:
+            self._opened_at = now
+            self._set_state(OPEN)
+
+class ResilientCaller:
+    """Wraps LLM calls for one model with a deadline, hedging and a circuit breaker"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(name)
+
+    async def call(self, send: Callable[[], Awaitable[str]], timeout: float = LLM_CALL_TIMEOUT_SECONDS) -> str:
+        """Run send() (which must start a fresh request each time it is called)"""
+        if not self.breaker.allow():
+            llm_calls.inc(model=self.name, outcome="rejected")
+            raise CircuitOpenError(f"LLM circuit breaker for {self.name} is open")
+
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(self._hedged(send), timeout)
+        except asyncio.TimeoutError:
+            self.breaker.record(False)
+            llm_calls.inc(model=self.name, outcome="timeout")
+            raise LLMUnavailableError(f"LLM call to {self.name} timed out after {timeout:.1f}s")
+        except asyncio.CancelledError:
+            # The caller gave up; says nothing about the provider's health
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            self.breaker.record(False)
+            llm_calls.inc(model=self.name, outcome="error")
+            # Unavailable like a timeout, so the router falls through to the next model
+            raise LLMUnavailableError(f"LLM call to {self.name} failed: {e}") from e
+
+        elapsed = time.monotonic() - started
+        self.breaker.record(True)
+        self.latency.add(elapsed)
+        llm_latency.observe(elapsed, model=self.name)
+        llm_calls.inc(model=self.name, outcome="success")
+        return response
+
+    async def _hedged(self, send: Callable[[], Awaitable[str]]) -> str:
+        first = asyncio.ensure_future(send())
+        tasks = {first}
+        try:
+            hedge_after = self.latency.percentile(LLM_HEDGE_PERCENTILE)
+            if not LLM_HEDGE_ENABLED or hedge_after is None:
+                return await first
+
+            done, _ = await asyncio.wait(tasks, timeout=max(hedge_after, LLM_HEDGE_MIN_DELAY_SECONDS))
+            if not done:
+                llm_hedges.inc(model=self.name)
+                tasks.add(asyncio.ensure_future(send()))
+
+            # First successful answer wins; fail only if every attempt failed
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # exception() raises on a cancelled task
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        if task is not first:
+                            llm_hedge_wins.inc(model=self.name)
+                        return task.result()
+                    error = task.exception()
+            raise error or LLMUnavailableError(f"Every LLM request to {self.name} was cancelled")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
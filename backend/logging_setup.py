@@ -0,0 +1,204 @@
+import os
+import sys
+import copy
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from metrics import counter
+
+# Log records are queued by the caller and written by a background thread,
+# so the event loop never blocks on stdout
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Records waiting to be written; beyond this new records are dropped, not waited for
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Longer messages and field values are truncated
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+# Fraction of info records kept per high-volume event; overrides from LOG_SAMPLE_RATES (JSON)
+LOG_SAMPLE_RATES: Dict[str, float] = {
+    "http.request": 0.1,
+    "llm.call": 0.1,
+    **json.loads(os.getenv("LOG_SAMPLE_RATES", "{}"))
+}
+
+REQUEST_ID_HEADER = "X-Request-ID"
+MAX_REQUEST_ID_LENGTH = 128
+
+log_records_dropped = counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+log_records_sampled_out = counter("log_records_sampled_out_total", "Log records skipped by sampling, by event")
+
+# Attributes every LogRecord has; anything else was passed in extra= and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_TRACEBACKS = logging.Formatter()
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+def truncate(value: Any, limit: int = LOG_MAX_FIELD_CHARS) -> Any:
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}…(+{len(value) - limit} chars)"
+    return value
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request id. Filters run in the thread
+    that logs, so this sees the request's context, including executor
+    threads a request copied its context into.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of records for events listed in LOG_SAMPLE_RATES.
+
+    Warnings and errors are always kept.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        rate = self.rates.get(event) if event else None
+        if rate is None or record.levelno >= logging.WARNING or random.random() < rate:
+            return True
+        log_records_sampled_out.inc(event=event)
+        return False
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of waiting"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render the traceback now, while they are current;
+        # truncation and serialization happen on the writer thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = _TRACEBACKS.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with extra= fields and the request id"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage()),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and name not in entry:
+                entry[name] = truncate(value if isinstance(value, (str, int, float, bool, type(None))) else str(value))
+        if record.exc_text:
+            entry["exception"] = truncate(record.exc_text, LOG_MAX_FIELD_CHARS * 4)
+        return json.dumps(entry, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return truncate(super().format(record), LOG_MAX_FIELD_CHARS * 2)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging(stream=None) -> logging.handlers.QueueListener:
+    """Route all logging through a bounded queue to a background writer thread (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JSONFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    # Uvicorn's loggers propagate to the root, so they go through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    # RequestIdMiddleware logs requests, with their id and sampled
+    logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Write out queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class RequestIdMiddleware:
+    """Assigns each HTTP request an id (X-Request-ID, kept if the client sent
+    one), makes it available to logging for the whole request, returns it
+    on the response and logs the request at a sampled rate.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("http")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.lower().encode("latin-1"):
+                request_id = value.decode("latin-1")[:MAX_REQUEST_ID_LENGTH]
+        request_id = request_id or uuid.uuid4().hex
+        token = _request_id.set(request_id)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.lower().encode("latin-1"), request_id.encode("latin-1"))
+                ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            level = logging.ERROR if status["code"] >= 500 else logging.INFO
+            self.logger.log(level, "%s %s %s", scope["method"], scope["path"], status["code"], extra={
+                "event": "http.request", "method": scope["method"], "path": scope["path"], "status": status["code"]
+            })
+            _request_id.reset(token)
@@ -0,0 +1,75 @@
+import os
+import logging
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ASCENDING
+
+from database import matches_collection, bump_version
+from analytics import remove_matches
+
+logger = logging.getLogger(__name__)
+
+# Optional expiry for match results (unset or 0 keeps matches forever).
+# Matches are deleted by a background job rather than a TTL index, so the
+# job analytics and the matches version stay in step with what was deleted.
+MATCHES_TTL_DAYS = int(os.getenv("MATCHES_TTL_DAYS", "0"))
+MATCH_EXPIRY_INTERVAL_SECONDS = int(os.getenv("MATCH_EXPIRY_INTERVAL_SECONDS", "3600"))
+MATCH_EXPIRY_BATCH_SIZE = int(os.getenv("MATCH_EXPIRY_BATCH_SIZE", "500"))
+
+# Fields remove_matches needs to undo a match's analytics contribution
+_PROJECTION = {"_id": 0, "id": 1, "job_id": 1, "overall_score": 1, "missing_skills": 1, "matched_keywords": 1}
+
+async def expire_matches(cutoff: datetime, batch_size: int = MATCH_EXPIRY_BATCH_SIZE) -> int:
+    """Delete matches created before cutoff, oldest first; returns how many were deleted"""
+    expired = 0
+    while True:
+        batch = await matches_collection.find(
+            {"created_at": {"$lt": cutoff}}, _PROJECTION
+        ).sort([("created_at", ASCENDING), ("id", ASCENDING)]).limit(batch_size).to_list(None)
+        if not batch:
+            return expired
+        await matches_collection.delete_many({"id": {"$in": [doc["id"] for doc in batch]}})
+        await remove_matches(batch)
+        await bump_version("matches")
+        expired += len(batch)
+
+class MatchExpiry:
+    """Periodically deletes matches older than MATCHES_TTL_DAYS"""
+
+    def __init__(self, ttl_days: int = MATCHES_TTL_DAYS):
+        self.ttl_days = ttl_days
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_days > 0
+
+    async def run_once(self) -> int:
+        # Same clock as models.py stamps created_at with
+        cutoff = datetime.now() - timedelta(days=self.ttl_days)
+        expired = await expire_matches(cutoff)
+        if expired:
+            logger.info("Expired %d matches created before %s", expired, cutoff.isoformat())
+        return expired
+
+    async def _loop(self, interval: int):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Error expiring matches: %s", e)
+            await asyncio.sleep(interval)
+
+    def start(self, interval: int = MATCH_EXPIRY_INTERVAL_SECONDS):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._loop(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
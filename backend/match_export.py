@@ -0,0 +1,185 @@
+import io
+import os
+import csv
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from pymongo import ASCENDING
+
+from database import resumes_collection, jobs_collection, matches_collection
+
+logger = logging.getLogger(__name__)
+
+# Matches fetched per cursor batch (and per join query)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Resume filenames / job titles remembered across batches
+EXPORT_JOIN_CACHE_SIZE = 10000
+
+CSV_COLUMNS = [
+    "id", "resume_id", "job_id", "overall_score", "skills_score", "experience_score",
+    "qualifications_score", "matched_keywords", "missing_skills", "created_at"
+]
+CSV_JOIN_COLUMNS = ["resume_filename", "job_title"]
+
+# First field of the CSV row written when an export fails part way
+CSV_ERROR_MARKER = "#error"
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Resume key for an exported match: '<created_at ISO>|<id>'"""
+    return f"{doc['created_at'].isoformat()}|{doc['id']}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    created_at, _, match_id = cursor.partition("|")
+    if not match_id:
+        raise ValueError("Export cursor must look like '<created_at>|<id>'")
+    return datetime.fromisoformat(created_at), match_id
+
+def build_export_query(
+    job_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    after: Optional[str] = None
+) -> Dict[str, Any]:
+    """Build the filter for an export ordered by (created_at, id)"""
+    conditions: List[Dict[str, Any]] = []
+    if job_id:
+        conditions.append({"job_id": job_id})
+
+    created_range = {}
+    if created_after:
+        created_range["$gte"] = created_after
+    if created_before:
+        created_range["$lt"] = created_before
+    if created_range:
+        conditions.append({"created_at": created_range})
+
+    if after:
+        last_created_at, last_id = decode_cursor(after)
+        conditions.append({"$or": [
+            {"created_at": {"$gt": last_created_at}},
+            {"created_at": last_created_at, "id": {"$gt": last_id}}
+        ]})
+
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+class _LRU(OrderedDict):
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+async def _fill_join_cache(collection, field: str, ids: List[str], cache: _LRU):
+    missing = list({doc_id for doc_id in ids if doc_id not in cache})
+    if not missing:
+        return
+    for doc_id in missing:
+        cache.put(doc_id, None)
+    async for doc in collection.find({"id": {"$in": missing}}, {"_id": 0, "id": 1, field: 1}):
+        cache.put(doc["id"], doc.get(field))
+
+def _to_csv_row(doc: Dict[str, Any], include_details: bool) -> List[Any]:
+    row = [
+        doc.get("id"),
+        doc.get("resume_id"),
+        doc.get("job_id"),
+        doc.get("overall_score"),
+        doc.get("skills_match", {}).get("score"),
+        doc.get("experience_match", {}).get("score"),
+        doc.get("qualifications_match", {}).get("score"),
+        ";".join(doc.get("matched_keywords", [])),
+        ";".join(doc.get("missing_skills", [])),
+        doc["created_at"].isoformat()
+    ]
+    if include_details:
+        row += [doc.get("resume_filename"), doc.get("job_title")]
+    return row
+
+def _serialize_batch(batch: List[Dict[str, Any]], export_format: str, include_details: bool) -> str:
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for doc in batch:
+            writer.writerow(_to_csv_row(doc, include_details))
+        return buffer.getvalue()
+
+    lines = []
+    for doc in batch:
+        doc["export_cursor"] = encode_cursor(doc)
+        doc["created_at"] = doc["created_at"].isoformat()
+        lines.append(json.dumps(doc, default=str))
+    return "\n".join(lines) + "\n"
+
+def _error_marker(error: Exception, last_sent: Optional[str], export_format: str) -> str:
+    if export_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow([CSV_ERROR_MARKER, f"Export failed: {error}", last_sent or ""])
+        return buffer.getvalue()
+    return json.dumps({"error": f"Export failed: {error}", "resume_after": last_sent}) + "\n"
+
+async def stream_matches(
+    query: Dict[str, Any],
+    export_format: str = "ndjson",
+    include_details: bool = False,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[str]:
+    """Stream matches in (created_at, id) order, one serialized chunk per cursor batch.
+
+    Only one batch is held in memory at a time. Every NDJSON record carries
+    an export_cursor; in CSV, '<created_at>|<id>' is built from the first
+    (id) and created_at columns. Pass either back as `after` to resume an
+    interrupted export.
+
+    If the export fails part way, the last line is an error marker instead
+    of a silent truncation: {"error": ..., "resume_after": ...} in NDJSON,
+    or a CSV row of CSV_ERROR_MARKER, the error and the resume cursor.
+    """
+    resume_names = _LRU(EXPORT_JOIN_CACHE_SIZE)
+    job_titles = _LRU(EXPORT_JOIN_CACHE_SIZE)
+
+    if export_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(CSV_COLUMNS + (CSV_JOIN_COLUMNS if include_details else []))
+        yield buffer.getvalue()
+
+    cursor = matches_collection.find(query, {"_id": 0}).sort(
+        [("created_at", ASCENDING), ("id", ASCENDING)]
+    ).batch_size(batch_size)
+
+    batch: List[Dict[str, Any]] = []
+
+    async def flush():
+        if include_details:
+            await _fill_join_cache(resumes_collection, "filename", [doc["resume_id"] for doc in batch], resume_names)
+            await _fill_join_cache(jobs_collection, "title", [doc["job_id"] for doc in batch], job_titles)
+            for doc in batch:
+                doc["resume_filename"] = resume_names.get(doc["resume_id"])
+                doc["job_title"] = job_titles.get(doc["job_id"])
+        return _serialize_batch(batch, export_format, include_details)
+
+    # Cursor of the last match already sent, for the error marker
+    last_sent: Optional[str] = None
+    try:
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                last = encode_cursor(batch[-1])
+                yield await flush()
+                last_sent, batch = last, []
+
+        if batch:
+            last = encode_cursor(batch[-1])
+            yield await flush()
+            last_sent = last
+    except Exception as e:
+        logger.exception("Error exporting matches: %s", e)
+        yield _error_marker(e, last_sent, export_format)
@@ -0,0 +1,132 @@
+import json
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from skill_embeddings import SkillEmbedder, SIMILARITY_THRESHOLD, SKILL_ALIASES, EMBEDDING_DIM
+
+# Weight of each category in the overall score
+CATEGORY_WEIGHTS = {
+    "skills_match": 0.5,
+    "experience_match": 0.3,
+    "qualifications_match": 0.2,
+}
+
+# Free-text experience/qualification lines need a looser similarity cut-off
+# than single skill phrases
+TEXT_SIMILARITY_THRESHOLD = 0.5
+
+# Bump when the scoring logic changes in a way the inputs below don't capture
+SCORING_REVISION = 1
+
+# Stamped on every match so rescoring can find results from older scoring rules
+MATCH_SCORING_VERSION = hashlib.sha256(json.dumps([
+    SCORING_REVISION, CATEGORY_WEIGHTS, TEXT_SIMILARITY_THRESHOLD,
+    SIMILARITY_THRESHOLD, EMBEDDING_DIM, SKILL_ALIASES
+], sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def resume_info_from_doc(resume_doc: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Build the matching input for a stored resume document"""
+    return {
+        "skills": resume_doc.get("extracted_skills", []),
+        "skill_ids": resume_doc.get("extracted_skill_ids"),
+        "experience": resume_doc.get("extracted_experience", []),
+        "qualifications": resume_doc.get("extracted_qualifications", []),
+        "keywords": resume_doc.get("extracted_keywords", [])
+    }
+
+def job_info_from_doc(job_doc: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Build the matching input for a stored job description document"""
+    return {
+        "required_skills": job_doc.get("required_skills", []),
+        "required_skill_ids": job_doc.get("required_skill_ids"),
+        "required_experience": job_doc.get("required_experience", []),
+        "required_qualifications": job_doc.get("required_qualifications", []),
+        "keywords": job_doc.get("extracted_keywords", [])
+    }
+
+def _split_matches(matches: List[Tuple[str, Any, float]]) -> Tuple[List[str], List[str]]:
+    matched = [required for required, candidate, _ in matches if candidate is not None]
+    missing = [required for required, candidate, _ in matches if candidate is None]
+    return matched, missing
+
+def _exact_skill_hits(resume_info: Dict, job_info: Dict) -> Optional[np.ndarray]:
+    """Mask over required skills found verbatim among the resume's skills, from interned ids"""
+    resume_ids = resume_info.get("skill_ids")
+    required_ids = job_info.get("required_skill_ids")
+    if resume_ids is None or required_ids is None or len(required_ids) != len(job_info.get("required_skills", [])):
+        return None
+    return np.isin(np.asarray(required_ids, dtype=np.int64), np.asarray(resume_ids, dtype=np.int64))
+
+def _category(embedder: SkillEmbedder, candidates: List[str], required: List[str], threshold: float,
+              exact: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    if exact is None or not exact.any():
+        matched, missing = _split_matches(embedder.match(candidates, required, threshold))
+    else:
+        # Exact hits need no embedding; only the rest go through fuzzy matching
+        rest = [skill for skill, hit in zip(required, exact) if not hit]
+        fuzzy, _ = _split_matches(embedder.match(candidates, rest, threshold))
+        fuzzy = set(fuzzy)
+        matched = [skill for skill, hit in zip(required, exact) if hit or skill in fuzzy]
+        missing = [skill for skill, hit in zip(required, exact) if not hit and skill not in fuzzy]
+    score = 100.0 * len(matched) / len(required) if required else 100.0
+    return {"score": round(score, 1), "matched": matched, "missing": missing}
+
+def compute_local_match(embedder: SkillEmbedder, resume_info: Dict, job_info: Dict) -> Dict[str, Any]:
+    """Compute matched/missing lists and category scores without an LLM call.
+
+    Returns the same structure the LLM used to produce, with empty
+    suggestions and detailed_analysis; those are generated on demand.
+    """
+    resume_terms = list(resume_info.get("skills", [])) + list(resume_info.get("keywords", []))
+
+    skills_match = _category(
+        embedder, resume_terms, job_info.get("required_skills", []), SIMILARITY_THRESHOLD,
+        _exact_skill_hits(resume_info, job_info)
+    )
+    experience_match = _category(
+        embedder, resume_info.get("experience", []), job_info.get("required_experience", []),
+        TEXT_SIMILARITY_THRESHOLD
+    )
+    qualifications_match = _category(
+        embedder, resume_info.get("qualifications", []), job_info.get("required_qualifications", []),
+        TEXT_SIMILARITY_THRESHOLD
+    )
+    matched_keywords, _ = _split_matches(embedder.match(resume_terms, job_info.get("keywords", [])))
+
+    categories = {
+        "skills_match": (skills_match, job_info.get("required_skills")),
+        "experience_match": (experience_match, job_info.get("required_experience")),
+        "qualifications_match": (qualifications_match, job_info.get("required_qualifications")),
+    }
+    # Only categories the job actually has requirements for carry weight
+    weighted = [(CATEGORY_WEIGHTS[name], result["score"]) for name, (result, required) in categories.items() if required]
+    total_weight = sum(weight for weight, _ in weighted)
+    overall_score = sum(weight * score for weight, score in weighted) / total_weight if total_weight else 0.0
+
+    return {
+        "overall_score": round(overall_score, 1),
+        "skills_match": skills_match,
+        "experience_match": experience_match,
+        "qualifications_match": qualifications_match,
+        "matched_keywords": matched_keywords,
+        "missing_skills": skills_match["missing"],
+        "suggestions": [],
+        "detailed_analysis": ""
+    }
+
+def build_local_narrative(match_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Templated suggestions and analysis, used when the LLM is unavailable"""
+    suggestions = [f"Highlight or gain experience with {skill}" for skill in match_result.get("missing_skills", [])[:5]]
+    for name, label in (("experience_match", "experience"), ("qualifications_match", "qualifications")):
+        for missing in match_result.get(name, {}).get("missing", [])[:2]:
+            suggestions.append(f"Address the {label} requirement: {missing}")
+
+    parts = [f"Overall match score is {match_result.get('overall_score', 0.0)}%."]
+    for name, label in (("skills_match", "Skills"), ("experience_match", "Experience"), ("qualifications_match", "Qualifications")):
+        category = match_result.get(name, {})
+        parts.append(
+            f"{label}: {category.get('score', 0.0)}% "
+            f"({len(category.get('matched', []))} matched, {len(category.get('missing', []))} missing)."
+        )
+    return {"suggestions": suggestions, "detailed_analysis": " ".join(parts)}
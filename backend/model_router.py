@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+from llm_resilience import ResilientCaller, LLMUnavailableError, LLM_CALL_TIMEOUT_SECONDS, OPEN
+from skill_embeddings import SKILL_ALIASES
+from deadlines import check, remaining
+
+logger = logging.getLogger(__name__)
+
+# Task names used in the route table
+RESUME_EXTRACTION = "resume_extraction"
+JOB_EXTRACTION = "job_extraction"
+NARRATIVE = "narrative"
+
+# Provider name of the in-process stand-in model
+LOCAL_PROVIDER = "local"
+
+# Model used for every task when no route table is configured
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash")
+
+def load_route_table() -> List[Dict[str, Any]]:
+    """Load the route table from LLM_ROUTE_TABLE (JSON) or LLM_ROUTE_TABLE_FILE.
+
+    Routes are checked in order; the first whose task and input size match
+    wins. Example:
+        [{"task": "*", "max_input_chars": 4000, "models": ["gemini/gemini-1.5-flash-8b", "gemini/gemini-1.5-flash"], "slo_seconds": 5},
+         {"task": "*", "models": ["gemini/gemini-1.5-flash"]}]
+    """
+    raw = os.getenv("LLM_ROUTE_TABLE")
+    path = os.getenv("LLM_ROUTE_TABLE_FILE")
+    if not raw and path:
+        with open(path) as route_file:
+            raw = route_file.read()
+    if not raw:
+        return [{"task": "*", "models": [f"{LLM_PROVIDER}/{LLM_MODEL}"]}]
+
+    routes = json.loads(raw)
+    for route in routes:
+        if not route.get("models"):
+            raise ValueError(f"Route {route} has no models")
+        for model in route["models"]:
+            if "/" not in model:
+                raise ValueError(f"Model {model!r} must look like 'provider/model'")
+    return routes
+
+ROUTE_TABLE = load_route_table()
+
+class LocalStandInModel:
+    """Deterministic in-process model for tests and local development.
+
+    Produces JSON in the shape each task expects from the input text alone:
+    known skills from the alias table, lines mentioning years as experience,
+    degree/certification lines as qualifications and frequent words as keywords.
+    """
+
+    _DEGREE = re.compile(r"\b(bachelor|master|phd|ph\.d|degree|diploma|certified|certification|mba|b\.?sc|m\.?sc)\b", re.I)
+    _YEARS = re.compile(r"\b(19|20)\d{2}\b|\b\d+\+?\s*years?\b", re.I)
+    _WORD = re.compile(r"[A-Za-z][A-Za-z+#.\-]{2,}")
+
+    def __init__(self):
+        self._skills = sorted(set(SKILL_ALIASES) | set(SKILL_ALIASES.values()), key=len, reverse=True)
+
+    def _extract(self, text: str) -> Dict[str, List[str]]:
+        lowered = text.lower()
+        skills = [skill for skill in self._skills if re.search(r"(?<![\w#+])" + re.escape(skill) + r"(?![\w#+])", lowered)]
+        lines = [line.strip(" \t•-*") for line in text.splitlines() if line.strip()]
+        experience = [line for line in lines if self._YEARS.search(line) and not self._DEGREE.search(line)]
+        qualifications = [line for line in lines if self._DEGREE.search(line)]
+        words = Counter(word.lower().rstrip(".-") for word in self._WORD.findall(text) if len(word) > 3)
+        keywords = [word for word, _ in words.most_common(15)]
+        return {"skills": skills, "experience": experience[:20], "qualifications": qualifications[:10], "keywords": keywords}
+
+    async def send(self, task: str, input_text: str) -> str:
+        if task == NARRATIVE:
+            return json.dumps({"suggestions": [], "detailed_analysis": "Generated by the local stand-in model."})
+        extracted = self._extract(input_text)
+        if task == JOB_EXTRACTION:
+            extracted = {
+                "required_skills": extracted["skills"],
+                "required_experience": extracted["experience"],
+                "required_qualifications": extracted["qualifications"],
+                "keywords": extracted["keywords"]
+            }
+        return json.dumps(extracted)
+
+class ModelRouter:
+    """Picks a model per call from the route table, input size and observed latency"""
+
+    def __init__(self, api_key: str, routes: Optional[List[Dict[str, Any]]] = None):
+        self.api_key = api_key
+        self.routes = routes if routes is not None else ROUTE_TABLE
+        self.local_model = LocalStandInModel()
+        self._callers: Dict[str, ResilientCaller] = {}
+
+    def _caller(self, model: str) -> ResilientCaller:
+        if model not in self._callers:
+            self._callers[model] = ResilientCaller(model)
+        return self._callers[model]
+
+    def _route(self, task: str, input_chars: int) -> Dict[str, Any]:
+        for route in self.routes:
+            if route.get("task", "*") not in ("*", task):
+                continue
+            if route.get("max_input_chars") is not None and input_chars > route["max_input_chars"]:
+                continue
+            return route
+        raise LLMUnavailableError(f"No route for task {task} with {input_chars} input characters")
+
+    def choose_models(self, task: str, input_chars: int) -> List[str]:
+        """Candidate models for a call, best first.
+
+        Models still collecting latency samples keep their place in the
+        table (so they get tried); the measured ones are reordered by
+        observed p95 among the remaining places. Then models over the
+        route's SLO are moved behind the rest, and models with an open
+        breaker go last.
+        """
+        route = self._route(task, input_chars)
+        slo = route.get("slo_seconds")
+        models = route["models"]
+        p95s = {model: self._caller(model).latency.percentile(0.95) for model in models}
+
+        # Unmeasured models stay in their slots; measured ones fill the rest by p95
+        measured = iter(sorted((model for model in models if p95s[model] is not None), key=lambda model: p95s[model]))
+        ordered = [model if p95s[model] is None else next(measured) for model in models]
+
+        def demotion(model):
+            over_slo = slo is not None and p95s[model] is not None and p95s[model] > slo
+            return (self._caller(model).breaker.state == OPEN, over_slo)
+
+        return sorted(ordered, key=demotion)
+
+    async def send(self, task: str, system_message: str, prompt: str, input_text: str,
+                   timeout: float = LLM_CALL_TIMEOUT_SECONDS) -> str:
+        """Send a prompt to the best model for the task, falling through to the next candidate if one is unavailable"""
+        last_error: Optional[Exception] = None
+        for model in self.choose_models(task, len(input_text)):
+            provider, model_name = model.split("/", 1)
+            # A fallback model only gets what is left of the request's deadline
+            check()
+            left = remaining()
+            attempt_timeout = timeout if left is None else min(timeout, left)
+
+            def send(provider=provider, model_name=model_name):
+                if provider == LOCAL_PROVIDER:
+                    return self.local_model.send(task, input_text)
+                # A fresh session per attempt, so a hedged duplicate is independent
+                chat = LlmChat(
+                    api_key=self.api_key,
+                    session_id=str(uuid.uuid4()),
+                    system_message=system_message
+                ).with_model(provider, model_name)
+                return chat.send_message(UserMessage(text=prompt))
+
+            started = time.perf_counter()
+            fields = {"event": "llm.call", "task": task, "model": model, "input_chars": len(input_text)}
+            try:
+                response = await self._caller(model).call(send, attempt_timeout)
+            except LLMUnavailableError as e:
+                logger.warning("LLM call to %s failed: %s", model, e, extra={**fields, "seconds": round(time.perf_counter() - started, 3)})
+                last_error = e
+                continue
+            logger.info("LLM call to %s", model, extra={**fields, "seconds": round(time.perf_counter() - started, 3), "response_chars": len(response)})
+            return response
+        raise last_error
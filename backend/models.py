@@ -11,6 +11,10 @@ class ResumeAnalysis(BaseModel):
     extracted_experience: List[str]
     extracted_qualifications: List[str]
     extracted_keywords: List[str]
+    extracted_skill_ids: Optional[List[int]] = None
+    skill_vector: Optional[Dict[str, float]] = None
+    processing_version: Optional[str] = None
+    sections: Optional[List[Dict[str, Any]]] = None
     created_at: datetime = None
     
     def __init__(self, **data):
@@ -28,6 +32,9 @@ class JobDescription(BaseModel):
     required_experience: List[str]
     required_qualifications: List[str]
     extracted_keywords: List[str]
+    required_skill_ids: Optional[List[int]] = None
+    skill_vector: Optional[Dict[str, float]] = None
+    processing_version: Optional[str] = None
     created_at: datetime = None
     
     def __init__(self, **data):
@@ -47,8 +54,13 @@ class MatchingResult(BaseModel):
     qualifications_match: Dict[str, Any]
     matched_keywords: List[str]
     missing_skills: List[str]
-    suggestions: List[str]
-    detailed_analysis: str
+    missing_skill_ids: Optional[List[int]] = None
+    matched_keyword_ids: Optional[List[int]] = None
+    suggestions: List[str] = []
+    detailed_analysis: str = ""
+    narrative_generated: bool = False
+    narrative_version: Optional[str] = None
+    processing_version: Optional[str] = None
     created_at: datetime = None
     
     def __init__(self, **data):
@@ -69,4 +81,16 @@ class JobDescriptionRequest(BaseModel):
 
 class MatchRequest(BaseModel):
     resume_id: str
-    job_id: str
\ No newline at end of file
+    job_id: str
+
+class ScreeningFilter(BaseModel):
+    ids: Optional[List[str]] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    skills: Optional[List[str]] = None
+
+class ScreeningRunRequest(BaseModel):
+    resume_filter: ScreeningFilter = ScreeningFilter()
+    job_filter: ScreeningFilter = ScreeningFilter()
+    shortlist_size: Optional[int] = None
+    llm_budget: Optional[int] = None
\ No newline at end of file
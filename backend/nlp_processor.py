@@ -1,31 +1,24 @@
 import os
+import logging
 import json
-import re
-from typing import List, Dict, Any, Tuple
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import hashlib
+from typing import Callable, List, Dict, Any, Optional
 from dotenv import load_dotenv
-import uuid
-import asyncio
 
 load_dotenv()
 
-class NLPProcessor:
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-    
-    async def extract_resume_info(self, resume_text: str) -> Dict[str, List[str]]:
-        """Extract skills, experience, and qualifications from resume"""
-        
-        session_id = str(uuid.uuid4())
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id=session_id,
-            system_message="You are an expert resume analyzer. Extract information from resumes and provide structured JSON responses."
-        ).with_model("gemini", "gemini-1.5-flash")
-        
-        prompt = f"""
+from llm_resilience import LLMUnavailableError, LLM_CALL_TIMEOUT_SECONDS
+from deadlines import check, remaining
+from profiling import stage
+from model_router import ModelRouter, ROUTE_TABLE, RESUME_EXTRACTION, JOB_EXTRACTION, NARRATIVE
+from match_scoring import build_local_narrative
+from llm_json import parse_llm_json, ResumeExtraction, JobExtraction, MatchNarrative
+
+logger = logging.getLogger(__name__)
+
+RESUME_SYSTEM_MESSAGE = "You are an expert resume analyzer. Extract information from resumes and provide structured JSON responses."
+
+RESUME_PROMPT = """
         Analyze the following resume and extract information in JSON format:
         
         Resume Text:
@@ -47,42 +40,10 @@ class NLPProcessor:
         - Be comprehensive but avoid duplicates
         - Only return the JSON, no additional text
         """
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        try:
-            # Clean the response and extract JSON
-            cleaned_response = self._clean_json_response(response)
-            extracted_info = json.loads(cleaned_response)
-            
-            return {
-                "skills": extracted_info.get("skills", []),
-                "experience": extracted_info.get("experience", []),
-                "qualifications": extracted_info.get("qualifications", []),
-                "keywords": extracted_info.get("keywords", [])
-            }
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            print(f"Response: {response}")
-            return {
-                "skills": [],
-                "experience": [],
-                "qualifications": [],
-                "keywords": []
-            }
-    
-    async def extract_job_info(self, job_description: str) -> Dict[str, List[str]]:
-        """Extract required skills, experience, and qualifications from job description"""
-        
-        session_id = str(uuid.uuid4())
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id=session_id,
-            system_message="You are an expert job description analyzer. Extract requirements from job descriptions and provide structured JSON responses."
-        ).with_model("gemini", "gemini-1.5-flash")
-        
-        prompt = f"""
+
+JOB_SYSTEM_MESSAGE = "You are an expert job description analyzer. Extract requirements from job descriptions and provide structured JSON responses."
+
+JOB_PROMPT = """
         Analyze the following job description and extract requirements in JSON format:
         
         Job Description:
@@ -104,123 +65,131 @@ class NLPProcessor:
         - Be comprehensive but avoid duplicates
         - Only return the JSON, no additional text
         """
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        try:
-            # Clean the response and extract JSON
-            cleaned_response = self._clean_json_response(response)
-            extracted_info = json.loads(cleaned_response)
-            
-            return {
-                "required_skills": extracted_info.get("required_skills", []),
-                "required_experience": extracted_info.get("required_experience", []),
-                "required_qualifications": extracted_info.get("required_qualifications", []),
-                "keywords": extracted_info.get("keywords", [])
-            }
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            print(f"Response: {response}")
-            return {
-                "required_skills": [],
-                "required_experience": [],
-                "required_qualifications": [],
-                "keywords": []
-            }
-    
-    async def calculate_match_score(self, resume_info: Dict, job_info: Dict) -> Dict[str, Any]:
-        """Calculate semantic matching score between resume and job requirements"""
-        
-        session_id = str(uuid.uuid4())
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id=session_id,
-            system_message="You are an expert resume-job matching analyzer. Calculate semantic matches and provide detailed analysis."
-        ).with_model("gemini", "gemini-1.5-flash")
-        
-        prompt = f"""
-        Analyze the semantic match between this resume and job requirements:
+
+NARRATIVE_SYSTEM_MESSAGE = "You are an expert resume-job matching analyzer. Explain match results and suggest improvements."
+
+NARRATIVE_PROMPT = """
+        A resume has been scored against job requirements. Explain the result and suggest improvements.
         
         Resume Information:
-        Skills: {resume_info.get('skills', [])}
-        Experience: {resume_info.get('experience', [])}
-        Qualifications: {resume_info.get('qualifications', [])}
-        Keywords: {resume_info.get('keywords', [])}
+        Skills: {skills}
+        Experience: {experience}
+        Qualifications: {qualifications}
         
         Job Requirements:
-        Required Skills: {job_info.get('required_skills', [])}
-        Required Experience: {job_info.get('required_experience', [])}
-        Required Qualifications: {job_info.get('required_qualifications', [])}
-        Keywords: {job_info.get('keywords', [])}
+        Required Skills: {required_skills}
+        Required Experience: {required_experience}
+        Required Qualifications: {required_qualifications}
+        
+        Match Result:
+        Overall Score: {overall_score}
+        Skills: {skills_match}
+        Experience: {experience_match}
+        Qualifications: {qualifications_match}
+        Missing Skills: {missing_skills}
         
         Please provide a JSON response with the following structure:
         {{
-            "overall_score": 85.5,
-            "skills_match": {{
-                "score": 80.0,
-                "matched": ["skill1", "skill2"],
-                "missing": ["skill3", "skill4"]
-            }},
-            "experience_match": {{
-                "score": 90.0,
-                "matched": ["experience1"],
-                "missing": ["experience2"]
-            }},
-            "qualifications_match": {{
-                "score": 85.0,
-                "matched": ["qualification1"],
-                "missing": ["qualification2"]
-            }},
-            "matched_keywords": ["keyword1", "keyword2"],
-            "missing_skills": ["skill3", "skill4"],
             "suggestions": ["suggestion1", "suggestion2"],
             "detailed_analysis": "Detailed analysis of the match..."
         }}
         
         Guidelines:
-        - Use semantic matching, not just exact keyword matching
-        - Overall score should be 0-100 based on weighted average
-        - Consider similar skills as matches (e.g., "JavaScript" and "JS")
+        - Treat the scores and matched/missing lists as given, do not recompute them
         - Provide actionable suggestions for improvement
         - Give detailed analysis explaining the scores
         - Only return the JSON, no additional text
         """
+
+def _version_hash(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:12]
+
+# Stamped on every stored document so a prompt or route table change can be
+# traced and stale documents reprocessed
+_ROUTES = json.dumps(ROUTE_TABLE, sort_keys=True)
+RESUME_EXTRACTION_VERSION = _version_hash(_ROUTES, RESUME_SYSTEM_MESSAGE, RESUME_PROMPT)
+JOB_EXTRACTION_VERSION = _version_hash(_ROUTES, JOB_SYSTEM_MESSAGE, JOB_PROMPT)
+NARRATIVE_VERSION = _version_hash(_ROUTES, NARRATIVE_SYSTEM_MESSAGE, NARRATIVE_PROMPT)
+
+class NLPProcessor:
+    def __init__(self):
+        self.api_key = os.getenv("GEMINI_API_KEY")
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        self.router = ModelRouter(self.api_key)
+    
+    async def _send(self, task: str, system_message: str, prompt: str, input_text: str,
+                    timeout: float = LLM_CALL_TIMEOUT_SECONDS) -> str:
+        """Send a prompt to the model the route table picks for this task and input size"""
+        # Don't start a call the request can no longer wait for, nor let one outlive it
+        check()
+        left = remaining()
+        if left is not None:
+            timeout = min(timeout, left)
+        with stage(f"llm_{task}"):
+            return await self.router.send(task, system_message, prompt, input_text, timeout)
+    
+    async def _send_json(self, task: str, system_message: str, prompt: str, input_text: str, schema,
+                         before_call: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Send a prompt and parse its reply against the task's schema.
+        
+        Truncated or malformed replies are repaired, completed or reformatted
+        with small follow-up calls; raises LLMOutputError if that fails.
+        before_call runs before every call, follow-ups included, and may
+        raise to stop one from being made.
+        """
+        async def send(prompt: str, input_text: str) -> str:
+            if before_call is not None:
+                before_call()
+            return await self._send(task, system_message, prompt, input_text)
+        
+        response = await send(prompt, input_text)
+        followup = lambda followup_prompt: send(followup_prompt, followup_prompt)
+        parsed = await parse_llm_json(task, schema, response, followup)
+        return parsed.model_dump()
+    
+    async def extract_resume_info(self, resume_text: str,
+                                  before_call: Optional[Callable[[], None]] = None) -> Dict[str, List[str]]:
+        """Extract skills, experience, and qualifications from resume"""
         
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        prompt = RESUME_PROMPT.format(resume_text=resume_text)
+        return await self._send_json(RESUME_EXTRACTION, RESUME_SYSTEM_MESSAGE, prompt, resume_text, ResumeExtraction, before_call)
+    
+    async def extract_job_info(self, job_description: str,
+                               before_call: Optional[Callable[[], None]] = None) -> Dict[str, List[str]]:
+        """Extract required skills, experience, and qualifications from job description"""
         
-        try:
-            # Clean the response and extract JSON
-            cleaned_response = self._clean_json_response(response)
-            match_result = json.loads(cleaned_response)
-            
-            return match_result
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            print(f"Response: {response}")
-            return {
-                "overall_score": 0.0,
-                "skills_match": {"score": 0.0, "matched": [], "missing": []},
-                "experience_match": {"score": 0.0, "matched": [], "missing": []},
-                "qualifications_match": {"score": 0.0, "matched": [], "missing": []},
-                "matched_keywords": [],
-                "missing_skills": [],
-                "suggestions": ["Unable to analyze match at this time"],
-                "detailed_analysis": "Analysis failed due to processing error"
-            }
+        prompt = JOB_PROMPT.format(job_description=job_description)
+        return await self._send_json(JOB_EXTRACTION, JOB_SYSTEM_MESSAGE, prompt, job_description, JobExtraction, before_call)
     
-    def _clean_json_response(self, response: str) -> str:
-        """Clean the response to extract valid JSON"""
-        # Remove any markdown formatting
-        response = re.sub(r'```json\s*', '', response)
-        response = re.sub(r'```\s*', '', response)
+    async def generate_match_narrative(self, resume_info: Dict, job_info: Dict, match_result: Dict,
+                                       before_call: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Generate suggestions and a detailed analysis for an already scored match.
         
-        # Find JSON object
-        json_start = response.find('{')
-        json_end = response.rfind('}')
+        Returns a local narrative marked "fallback" if the LLM is unavailable,
+        which should not be cached; raises LLMOutputError if the response
+        could not be parsed. before_call is passed to _send_json.
+        """
+        
+        prompt = NARRATIVE_PROMPT.format(
+            skills=resume_info.get('skills', []),
+            experience=resume_info.get('experience', []),
+            qualifications=resume_info.get('qualifications', []),
+            required_skills=job_info.get('required_skills', []),
+            required_experience=job_info.get('required_experience', []),
+            required_qualifications=job_info.get('required_qualifications', []),
+            overall_score=match_result.get('overall_score', 0.0),
+            skills_match=match_result.get('skills_match', {}),
+            experience_match=match_result.get('experience_match', {}),
+            qualifications_match=match_result.get('qualifications_match', {}),
+            missing_skills=match_result.get('missing_skills', [])
+        )
         
-        if json_start != -1 and json_end != -1:
-            return response[json_start:json_end + 1]
+        try:
+            narrative = await self._send_json(NARRATIVE, NARRATIVE_SYSTEM_MESSAGE, prompt, prompt, MatchNarrative, before_call)
+        except LLMUnavailableError as e:
+            # Degrade to a templated narrative; callers must not cache it
+            logger.warning("Using local narrative: %s", e)
+            return {**build_local_narrative(match_result), "fallback": True}
         
-        return response.strip()
\ No newline at end of file
+        return {**narrative, "narrative_version": NARRATIVE_VERSION}
@@ -0,0 +1,236 @@
+import os
+import sys
+import asyncio
+import time
+import hmac
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+from fastapi import HTTPException, Request
+
+from logging_setup import current_request_id
+
+# Admin endpoints and header-triggered profiling need X-Admin-Token to match ADMIN_TOKEN;
+# without ADMIN_TOKEN they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+PROFILE_REQUEST_HEADER = "X-Profile-Request"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Sampling profiler output (folded stacks, one "frame;frame;frame count" line per stack)
+PROFILE_OUTPUT_DIR = os.getenv(
+    "PROFILE_OUTPUT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+)
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = 300
+
+# Requests slower than this keep their per-stage breakdown in a ring buffer
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
+SLOW_REQUEST_BUFFER_SIZE = int(os.getenv("SLOW_REQUEST_BUFFER_SIZE", "200"))
+
+def require_admin(request: Request):
+    """Reject the request unless it carries the admin token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not hmac.compare_digest(request.headers.get(ADMIN_TOKEN_HEADER, ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+class RequestTimings:
+    """Per-stage durations of one request; stages may be timed from worker threads"""
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            total, count = self.stages.get(name, [0.0, 0])
+            self.stages[name] = [total + seconds, count + 1]
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[1][0], reverse=True)
+        return [{"stage": name, "ms": round(total * 1000, 1), "count": count} for name, (total, count) in stages]
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a stage of the current request (no-op outside a request).
+
+    Works across awaits; for work on executor threads, run it with
+    contextvars.copy_context().run so the thread sees the request.
+    """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+class SlowRequestLog:
+    """Bounded ring buffer of slow requests"""
+
+    def __init__(self, size: int = SLOW_REQUEST_BUFFER_SIZE):
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=size)
+
+    def add(self, entry: Dict[str, Any]):
+        self._entries.append(entry)
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        entries = list(reversed(self._entries))
+        return entries[:limit] if limit else entries
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class SamplingProfiler:
+    """Samples every thread's stack with sys._current_frames while any session is active.
+
+    Each session (a fixed duration, or one profiled request) gets its own
+    folded-stack counts, written to PROFILE_OUTPUT_DIR when it ends.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS, output_dir: str = PROFILE_OUTPUT_DIR):
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self._sessions: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> Counter:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: Counter = Counter()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_frame_name(frame))
+                frame = frame.f_back
+            stacks[";".join([names.get(ident, str(ident))] + frames[::-1])] += 1
+        return stacks
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+            stacks = self._sample()
+            with self._lock:
+                for counts in self._sessions.values():
+                    counts.update(stacks)
+            time.sleep(self.interval)
+
+    def start_session(self, label: str) -> str:
+        session_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{label}"
+        with self._lock:
+            self._sessions[session_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return session_id
+
+    def stop_session(self, session_id: str) -> Optional[str]:
+        """End a session and write its folded stacks; returns the file name"""
+        with self._lock:
+            counts = self._sessions.pop(session_id, None)
+        if counts is None:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = f"{session_id}.folded"
+        with open(os.path.join(self.output_dir, filename), "w") as output:
+            for stack, count in counts.most_common():
+                output.write(f"{stack} {count}\n")
+        return filename
+
+    def profile_for(self, seconds: float) -> str:
+        """Profile the whole process for a number of seconds; returns the output file name"""
+        seconds = max(0.1, min(seconds, PROFILE_MAX_SECONDS))
+        session_id = self.start_session(f"{seconds:g}s")
+        timer = threading.Timer(seconds, self.stop_session, args=(session_id,))
+        timer.daemon = True
+        timer.start()
+        return f"{session_id}.folded"
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.output_dir):
+            return []
+        with self._lock:
+            running = {f"{session_id}.folded" for session_id in self._sessions}
+        return [
+            {"name": name, "size": os.path.getsize(os.path.join(self.output_dir, name))}
+            for name in sorted(os.listdir(self.output_dir), reverse=True)
+            if name.endswith(".folded") and name not in running
+        ]
+
+    def profile_path(self, name: str) -> Optional[str]:
+        path = os.path.join(self.output_dir, os.path.basename(name))
+        return path if name.endswith(".folded") and os.path.isfile(path) else None
+
+profiler = SamplingProfiler()
+slow_requests = SlowRequestLog()
+
+class ProfilingMiddleware:
+    """Times every HTTP request by stage, records the slow ones, and profiles
+    requests that ask for it (X-Profile-Request with a valid X-Admin-Token).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        session_id = None
+        if ADMIN_TOKEN and headers.get(PROFILE_REQUEST_HEADER.lower()) and hmac.compare_digest(
+            headers.get(ADMIN_TOKEN_HEADER.lower(), ""), ADMIN_TOKEN
+        ):
+            session_id = profiler.start_session(scope["path"].strip("/").replace("/", "_") or "root")
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        request_id = current_request_id()
+        status = {"code": 500}
+        started = time.perf_counter()
+        started_at = datetime.now(timezone.utc)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if session_id is not None:
+                    message = {**message, "headers": list(message.get("headers", [])) + [
+                        (PROFILE_ID_HEADER.lower().encode("latin-1"), f"{session_id}.folded".encode("latin-1"))
+                    ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            if session_id is not None:
+                # Writing the folded stacks is blocking file I/O
+                await asyncio.to_thread(profiler.stop_session, session_id)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= SLOW_REQUEST_THRESHOLD_MS:
+                slow_requests.add({
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status["code"],
+                    "duration_ms": round(elapsed_ms, 1),
+                    "started_at": started_at.isoformat(),
+                    "stages": timings.breakdown()
+                })
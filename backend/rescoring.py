@@ -0,0 +1,347 @@
+import os
+import logging
+import time
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from pymongo import DESCENDING, UpdateOne
+
+from database import resumes_collection, jobs_collection, matches_collection, bump_version
+from nlp_processor import NLPProcessor, RESUME_EXTRACTION_VERSION, JOB_EXTRACTION_VERSION, NARRATIVE_VERSION
+from match_scoring import compute_local_match, resume_info_from_doc, job_info_from_doc, MATCH_SCORING_VERSION
+from skill_embeddings import SkillEmbedder
+from skill_vectors import JobVectorIndex, build_skill_vector
+from analytics import record_match
+from resume_sections import split_sections, stored_sections
+from skill_dictionary import skill_dictionary, interned_fields
+from search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Background rescoring of documents produced by an older prompt/model/scoring version
+RESCORE_ENABLED = os.getenv("RESCORE_ENABLED", "false").lower() == "true"
+RESCORE_LLM_BUDGET_PER_HOUR = int(os.getenv("RESCORE_LLM_BUDGET_PER_HOUR", "120"))
+RESCORE_INTERVAL_SECONDS = int(os.getenv("RESCORE_INTERVAL_SECONDS", "60"))
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", "50"))
+# Views remembered per collection between runs; the oldest are forgotten beyond this
+RESCORE_MAX_TRACKED_VIEWS = int(os.getenv("RESCORE_MAX_TRACKED_VIEWS", "10000"))
+
+# Fields rewritten when a match is rescored
+_SCORE_FIELDS = (
+    "overall_score", "skills_match", "experience_match", "qualifications_match",
+    "matched_keywords", "missing_skills"
+)
+
+# Resume and job fields scoring doesn't need
+_INPUT_PROJECTION = {"_id": 0, "original_text": 0, "description": 0, "sections": 0}
+
+# Only orders rescoring; responses leave it out, so writing it bumps no version
+VIEW_FIELD = "last_viewed_at"
+
+# Recently viewed first, then newest first
+_PRIORITY = [(VIEW_FIELD, DESCENDING), ("created_at", DESCENDING)]
+
+class LLMBudgetExhausted(Exception):
+    """No LLM call is left in the hourly budget"""
+
+class LLMBudget:
+    """Token bucket limiting LLM calls per hour"""
+
+    def __init__(self, per_hour: int):
+        self.per_hour = per_hour
+        self._tokens = float(per_hour)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.per_hour, self._tokens + (now - self._updated) * self.per_hour / 3600)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def acquire(self):
+        """Take one call; raises LLMBudgetExhausted if none is left"""
+        if not self.try_acquire():
+            raise LLMBudgetExhausted()
+
+    @property
+    def remaining(self) -> int:
+        self._refill()
+        return int(self._tokens)
+
+async def rescore_match(embedder: SkillEmbedder, match_doc: Dict[str, Any],
+                        resume_doc: Dict[str, Any], job_doc: Dict[str, Any]) -> bool:
+    """Recompute a stored match from its current inputs; returns True if the scores changed.
+
+    A changed match loses its cached narrative, which is regenerated on the
+    next view. Callers bump the matches version once their batch is written.
+    """
+    result = compute_local_match(embedder, resume_info_from_doc(resume_doc), job_info_from_doc(job_doc))
+    update: Dict[str, Any] = {"processing_version": MATCH_SCORING_VERSION}
+    changed = any(match_doc.get(field) != result[field] for field in _SCORE_FIELDS)
+    if changed:
+        update.update({field: result[field] for field in _SCORE_FIELDS})
+        update.update(await interned_fields("matches", result))
+        update.update({"suggestions": [], "detailed_analysis": "", "narrative_generated": False, "narrative_version": None})
+
+    await matches_collection.update_one({"id": match_doc["id"]}, {"$set": update})
+    if changed:
+        await record_match({**match_doc, **update}, previous=match_doc)
+    return changed
+
+async def _load_by_id(collection, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Load the scoring inputs for several documents in one query"""
+    return {
+        doc["id"]: doc
+        async for doc in collection.find({"id": {"$in": list(set(doc_ids))}}, _INPUT_PROJECTION)
+    }
+
+class Rescorer:
+    """Finds documents stamped with an outdated version and reprocesses them.
+
+    Resumes and jobs are re-extracted with the LLM within an hourly call
+    budget; their matches, and matches from an older scoring version, are
+    rescored locally. Recently viewed documents go first.
+    """
+
+    def __init__(self, nlp_processor: NLPProcessor, embedder: SkillEmbedder, job_index: JobVectorIndex,
+                 budget_per_hour: int = RESCORE_LLM_BUDGET_PER_HOUR, batch_size: int = RESCORE_BATCH_SIZE):
+        self.nlp_processor = nlp_processor
+        self.embedder = embedder
+        self.job_index = job_index
+        # Set by the app once the search index is open
+        self.search_index: Optional[SearchIndex] = None
+        self.budget = LLMBudget(budget_per_hour)
+        self.batch_size = batch_size
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._run_task: Optional[asyncio.Task] = None
+        self._viewed: Dict[str, Dict[str, datetime]] = {"resumes": {}, "jobs": {}, "matches": {}}
+        self.progress: Dict[str, Any] = {
+            "running": False,
+            "last_run_started_at": None,
+            "last_run_finished_at": None,
+            "stale": {},
+            "processed": {"resumes": 0, "jobs": 0, "matches": 0, "narratives_cleared": 0},
+            "llm_calls": 0,
+            "errors": 0,
+            "last_error": None
+        }
+
+    def note_viewed(self, collection_name: str, doc_id: str):
+        """Record a view; persisted as last_viewed_at on the next run"""
+        viewed = self._viewed[collection_name]
+        # Re-inserted so the dict stays ordered by last view
+        viewed.pop(doc_id, None)
+        viewed[doc_id] = datetime.now(timezone.utc)
+        if len(viewed) > RESCORE_MAX_TRACKED_VIEWS:
+            del viewed[next(iter(viewed))]
+
+    async def _flush_views(self):
+        collections = {"resumes": resumes_collection, "jobs": jobs_collection, "matches": matches_collection}
+        for name, viewed in self._viewed.items():
+            if not viewed:
+                continue
+            self._viewed[name] = {}
+            await collections[name].bulk_write(
+                [UpdateOne({"id": doc_id}, {"$set": {VIEW_FIELD: at}}) for doc_id, at in viewed.items()],
+                ordered=False
+            )
+
+    async def count_stale(self) -> Dict[str, int]:
+        return {
+            "resumes": await resumes_collection.count_documents({"processing_version": {"$ne": RESUME_EXTRACTION_VERSION}}),
+            "jobs": await jobs_collection.count_documents({"processing_version": {"$ne": JOB_EXTRACTION_VERSION}}),
+            "matches": await matches_collection.count_documents({"processing_version": {"$ne": MATCH_SCORING_VERSION}}),
+        }
+
+    def _record_error(self, context: str, error: Exception):
+        logger.error("Error rescoring %s: %s", context, error)
+        self.progress["errors"] += 1
+        self.progress["last_error"] = f"{context}: {error}"
+
+    async def _rescore_matches_for(self, field: str, doc: Dict[str, Any]) -> int:
+        """Rescore every match that used a re-extracted resume or job"""
+        match_docs = await matches_collection.find({field: doc["id"]}).to_list(None)
+        if field == "job_id":
+            jobs, resumes = {doc["id"]: doc}, await _load_by_id(resumes_collection, [m["resume_id"] for m in match_docs])
+        else:
+            resumes, jobs = {doc["id"]: doc}, await _load_by_id(jobs_collection, [m["job_id"] for m in match_docs])
+        rescored = 0
+        for match_doc in match_docs:
+            resume_doc = resumes.get(match_doc["resume_id"])
+            job_doc = jobs.get(match_doc["job_id"])
+            if resume_doc and job_doc:
+                await rescore_match(self.embedder, match_doc, resume_doc, job_doc)
+                rescored += 1
+        if rescored:
+            await bump_version("matches")
+        return rescored
+
+    def _spend(self):
+        """before_call hook: every extraction call, follow-ups included, comes out of the budget"""
+        self.budget.acquire()
+        self.progress["llm_calls"] += 1
+
+    async def _reextract_jobs(self) -> bool:
+        """Returns False once the LLM budget is exhausted"""
+        cursor = jobs_collection.find({"processing_version": {"$ne": JOB_EXTRACTION_VERSION}}).sort(_PRIORITY).limit(self.batch_size)
+        async for job_doc in cursor:
+            try:
+                job_info = await self.nlp_processor.extract_job_info(job_doc["description"], self._spend)
+                required_skills = self.embedder.canonicalize_many(job_info.get("required_skills", []))
+                if not any(job_info.values()):
+                    raise ValueError("extraction returned no fields")
+                update = {
+                    "required_skills": required_skills,
+                    "required_skill_ids": await skill_dictionary.intern(required_skills),
+                    "required_experience": job_info.get("required_experience", []),
+                    "required_qualifications": job_info.get("required_qualifications", []),
+                    "extracted_keywords": job_info.get("keywords", []),
+                    "skill_vector": build_skill_vector(required_skills, job_info.get("keywords", [])),
+                    "processing_version": JOB_EXTRACTION_VERSION
+                }
+                await jobs_collection.update_one({"id": job_doc["id"]}, {"$set": update})
+                await bump_version("jobs")
+                if self.search_index is not None:
+                    await self.search_index.index("job", {**job_doc, **update})
+                self.job_index.add(job_doc["id"], update["skill_vector"], job_doc.get("title", ""))
+                self.progress["processed"]["jobs"] += 1
+                self.progress["processed"]["matches"] += await self._rescore_matches_for("job_id", {**job_doc, **update})
+            except LLMBudgetExhausted:
+                # Left stale, to be re-extracted once the budget refills
+                return False
+            except Exception as e:
+                self._record_error(f"job {job_doc['id']}", e)
+        return True
+
+    async def _reextract_resumes(self) -> bool:
+        """Returns False once the LLM budget is exhausted"""
+        cursor = resumes_collection.find({"processing_version": {"$ne": RESUME_EXTRACTION_VERSION}}).sort(_PRIORITY).limit(self.batch_size)
+        async for resume_doc in cursor:
+            try:
+                resume_info = await self.nlp_processor.extract_resume_info(resume_doc["original_text"], self._spend)
+                skills = self.embedder.canonicalize_many(resume_info.get("skills", []))
+                if not any(resume_info.values()):
+                    raise ValueError("extraction returned no fields")
+                update = {
+                    "extracted_skills": skills,
+                    "extracted_skill_ids": await skill_dictionary.intern(skills),
+                    "extracted_experience": resume_info.get("experience", []),
+                    "extracted_qualifications": resume_info.get("qualifications", []),
+                    "extracted_keywords": resume_info.get("keywords", []),
+                    "skill_vector": build_skill_vector(skills, resume_info.get("keywords", [])),
+                    "processing_version": RESUME_EXTRACTION_VERSION,
+                    # Extracted as a whole, so fields are no longer attributed to sections
+                    "sections": stored_sections(split_sections(resume_doc["original_text"]))
+                }
+                await resumes_collection.update_one({"id": resume_doc["id"]}, {"$set": update})
+                await bump_version("resumes")
+                if self.search_index is not None:
+                    await self.search_index.index("resume", {**resume_doc, **update})
+                self.progress["processed"]["resumes"] += 1
+                self.progress["processed"]["matches"] += await self._rescore_matches_for("resume_id", {**resume_doc, **update})
+            except LLMBudgetExhausted:
+                return False
+            except Exception as e:
+                self._record_error(f"resume {resume_doc['id']}", e)
+        return True
+
+    async def _rescore_stale_matches(self):
+        # Local scoring only, so this is not limited by the LLM budget
+        match_docs = await matches_collection.find(
+            {"processing_version": {"$ne": MATCH_SCORING_VERSION}}
+        ).sort(_PRIORITY).limit(self.batch_size * 10).to_list(None)
+        resumes = await _load_by_id(resumes_collection, [match_doc["resume_id"] for match_doc in match_docs])
+        jobs = await _load_by_id(jobs_collection, [match_doc["job_id"] for match_doc in match_docs])
+        rescored = 0
+        for match_doc in match_docs:
+            try:
+                resume_doc = resumes.get(match_doc["resume_id"])
+                job_doc = jobs.get(match_doc["job_id"])
+                if resume_doc and job_doc:
+                    await rescore_match(self.embedder, match_doc, resume_doc, job_doc)
+                    rescored += 1
+            except Exception as e:
+                self._record_error(f"match {match_doc['id']}", e)
+        self.progress["processed"]["matches"] += rescored
+        if rescored:
+            await bump_version("matches")
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Process one batch of stale documents"""
+        async with self._lock:
+            self.progress["running"] = True
+            self.progress["last_run_started_at"] = datetime.now(timezone.utc)
+            try:
+                await self._flush_views()
+
+                # Narratives are regenerated lazily, so outdated ones are just cleared
+                cleared = await matches_collection.update_many(
+                    {"narrative_generated": True, "narrative_version": {"$ne": NARRATIVE_VERSION}},
+                    {"$set": {"suggestions": [], "detailed_analysis": "", "narrative_generated": False, "narrative_version": None}}
+                )
+                self.progress["processed"]["narratives_cleared"] += cleared.modified_count
+                if cleared.modified_count:
+                    await bump_version("matches")
+
+                if await self._reextract_jobs():
+                    await self._reextract_resumes()
+                await self._rescore_stale_matches()
+                self.progress["stale"] = await self.count_stale()
+            except Exception as e:
+                self._record_error("run", e)
+            finally:
+                self.progress["running"] = False
+                self.progress["last_run_finished_at"] = datetime.now(timezone.utc)
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self.progress,
+            "versions": {
+                "resumes": RESUME_EXTRACTION_VERSION,
+                "jobs": JOB_EXTRACTION_VERSION,
+                "matches": MATCH_SCORING_VERSION,
+                "narratives": NARRATIVE_VERSION
+            },
+            "llm_budget_per_hour": self.budget.per_hour,
+            "llm_budget_remaining": self.budget.remaining
+        }
+
+    def request_run(self) -> bool:
+        """Start one batch in the background; False if a batch is already running"""
+        if self.progress["running"] or (self._run_task is not None and not self._run_task.done()):
+            return False
+        self._run_task = asyncio.create_task(self.run_once())
+        self._run_task.add_done_callback(self._run_finished)
+        return True
+
+    def _run_finished(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self._record_error("run", task.exception())
+
+    async def _loop(self, interval: int):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(interval)
+
+    def start(self, interval: int = RESCORE_INTERVAL_SECONDS):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(interval))
+
+    async def stop(self):
+        for task in (self._task, self._run_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._run_task = None
+        await self._flush_views()
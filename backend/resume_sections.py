@@ -0,0 +1,135 @@
+import re
+import hashlib
+from typing import Any, Dict, List, Optional
+
+# Extracted resume fields, as stored on a ResumeAnalysis document
+RESUME_FIELDS = {
+    "skills": "extracted_skills",
+    "experience": "extracted_experience",
+    "qualifications": "extracted_qualifications",
+    "keywords": "extracted_keywords",
+}
+
+# Common resume headings, matched against a whole line
+HEADING_WORDS = {
+    "summary", "profile", "objective", "about me", "skills", "technical skills", "core competencies",
+    "experience", "work experience", "professional experience", "employment history", "work history",
+    "education", "qualifications", "certifications", "certificates", "licenses", "projects",
+    "publications", "awards", "honors", "achievements", "languages", "interests", "volunteer",
+    "volunteering", "references", "training", "courses"
+}
+
+HEADER_SECTION = "header"
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip().rstrip(":").strip()
+    if not stripped or len(stripped) > 40 or len(stripped.split()) > 5:
+        return False
+    if stripped.lower() in HEADING_WORDS:
+        return True
+    # ALL CAPS lines ("WORK EXPERIENCE") and "Heading:" lines with nothing after the colon
+    letters = [c for c in stripped if c.isalpha()]
+    if len(letters) >= 3 and all(c.isupper() for c in letters):
+        return True
+    return line.strip().endswith(":") and not re.search(r"[.,;]", stripped)
+
+def _section_hash(heading: str, body: str) -> str:
+    normalized = re.sub(r"\s+", " ", f"{heading}\n{body}").strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+def split_sections(text: str) -> List[Dict[str, Any]]:
+    """Split resume text into sections at detected headings.
+
+    Text before the first heading becomes the "header" section. Each section
+    has a heading, its body text and a whitespace/case-insensitive hash.
+    """
+    sections: List[Dict[str, Any]] = []
+    heading, lines = HEADER_SECTION, []
+
+    def close():
+        body = "\n".join(lines).strip()
+        if body or heading != HEADER_SECTION:
+            sections.append({"heading": heading, "text": body, "hash": _section_hash(heading, body)})
+
+    for line in text.splitlines():
+        if _is_heading(line):
+            close()
+            heading, lines = line.strip().rstrip(":").strip(), []
+        else:
+            lines.append(line)
+    close()
+    return sections
+
+def section_text(section: Dict[str, Any]) -> str:
+    if section["heading"] == HEADER_SECTION:
+        return section["text"]
+    return f"{section['heading']}\n{section['text']}"
+
+def stored_sections(sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sections as kept on the resume document (hashes and per-section fields, not text)"""
+    return [{"heading": s["heading"], "hash": s["hash"], "fields": s.get("fields")} for s in sections]
+
+def diff_sections(old: List[Dict[str, Any]], new: List[Dict[str, Any]]):
+    """Returns (unchanged new sections, changed or added new sections, removed old sections)"""
+    old_hashes = {s["hash"] for s in old}
+    new_hashes = {s["hash"] for s in new}
+    unchanged = [s for s in new if s["hash"] in old_hashes]
+    changed = [s for s in new if s["hash"] not in old_hashes]
+    removed = [s for s in old if s["hash"] not in new_hashes]
+    return unchanged, changed, removed
+
+def _key(item: str) -> str:
+    return re.sub(r"\s+", " ", str(item)).strip().lower()
+
+def _attributed(item: str, field: str, section: Dict[str, Any]) -> bool:
+    """Whether an extracted item came from a section.
+
+    Uses the fields stored for the section when it was extracted on its own;
+    otherwise (resumes extracted as a whole) falls back to finding the item
+    as whole words in the section text, so "go" isn't found in "good".
+    """
+    if section.get("fields") is not None:
+        return _key(item) in {_key(value) for value in section["fields"].get(field, [])}
+    text = section.get("text")
+    key = _key(item)
+    # Lookarounds rather than \b, which fails next to "+" or "#" ("c++", "c#")
+    return bool(text is not None and key and re.search(rf"(?<!\w){re.escape(key)}(?!\w)", _key(text)))
+
+def merge_section_fields(current: Dict[str, List[str]], removed: List[Dict[str, Any]],
+                         kept: List[Dict[str, Any]], extracted: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Merge re-extracted section fields into the stored resume fields.
+
+    Items attributed to a removed (or edited) old section are dropped unless a
+    kept section also accounts for them; items from re-extracted sections are
+    appended without duplicates. `current` and the result are keyed like
+    extract_resume_info's output.
+    """
+    merged: Dict[str, List[str]] = {}
+    for field, values in current.items():
+        merged[field] = [
+            value for value in values
+            if not any(_attributed(value, field, s) for s in removed)
+            or any(_attributed(value, field, s) for s in kept)
+        ]
+    for section in extracted:
+        for field in merged:
+            seen = {_key(value) for value in merged[field]}
+            for value in section["fields"].get(field, []):
+                if _key(value) not in seen:
+                    merged[field].append(value)
+                    seen.add(_key(value))
+    return merged
+
+def fields_from_doc(resume_doc: Dict[str, Any]) -> Dict[str, List[str]]:
+    return {field: list(resume_doc.get(stored, [])) for field, stored in RESUME_FIELDS.items()}
+
+def attach_text(sections: Optional[List[Dict[str, Any]]], text: str) -> List[Dict[str, Any]]:
+    """Re-attach section text from the stored original text to stored sections.
+
+    Documents stored before sections were tracked have none; their sections
+    are derived from the original text, with unknown per-section fields.
+    """
+    by_hash = {s["hash"]: s for s in split_sections(text)}
+    if not sections:
+        return list(by_hash.values())
+    return [{**s, "text": by_hash.get(s["hash"], {}).get("text")} for s in sections]
@@ -0,0 +1,380 @@
+import os
+import logging
+import uuid
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from pymongo import ASCENDING, DESCENDING
+
+from database import database, resumes_collection, jobs_collection, matches_collection, bump_version, flush_writes
+from models import MatchingResult, ScreeningFilter, ScreeningRunRequest
+from nlp_processor import NLPProcessor
+from match_scoring import compute_local_match, resume_info_from_doc, job_info_from_doc, MATCH_SCORING_VERSION
+from skill_embeddings import SkillEmbedder
+from skill_vectors import build_skill_vector, to_dense
+from analytics import record_match
+from skill_dictionary import interned_fields
+from llm_json import LLM_JSON_MAX_FOLLOWUPS
+
+logger = logging.getLogger(__name__)
+
+# Screening runs score a pool of resumes against a set of jobs in one pass
+screening_runs_collection = database.screening_runs
+screening_results_collection = database.screening_results
+
+# Resumes per job that get a full local match and are stored, by default and at most
+SCREENING_SHORTLIST_SIZE = int(os.getenv("SCREENING_SHORTLIST_SIZE", "50"))
+SCREENING_MAX_SHORTLIST_SIZE = int(os.getenv("SCREENING_MAX_SHORTLIST_SIZE", "1000"))
+# LLM calls per run (narratives and their follow-ups), by default and at most
+SCREENING_LLM_BUDGET = int(os.getenv("SCREENING_LLM_BUDGET", "100"))
+SCREENING_MAX_LLM_BUDGET = int(os.getenv("SCREENING_MAX_LLM_BUDGET", "2000"))
+SCREENING_LLM_CONCURRENCY = int(os.getenv("SCREENING_LLM_CONCURRENCY", "4"))
+# Resume vectors scored per matrix product, bounding memory for large pools
+SCREENING_CHUNK_SIZE = int(os.getenv("SCREENING_CHUNK_SIZE", "4096"))
+# Documents per insert_many
+SCREENING_WRITE_BATCH = int(os.getenv("SCREENING_WRITE_BATCH", "1000"))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_RESUME_PROJECTION = {"_id": 0, "id": 1, "skill_vector": 1, "extracted_skills": 1, "extracted_keywords": 1}
+_JOB_PROJECTION = {"_id": 0, "description": 0, "sections": 0}
+
+def build_filter_query(screening_filter: ScreeningFilter, skills_field: str) -> Dict[str, Any]:
+    """Mongo filter for the resumes or jobs a run covers"""
+    query: Dict[str, Any] = {}
+    if screening_filter.ids:
+        query["id"] = {"$in": screening_filter.ids}
+    created_range = {}
+    if screening_filter.created_after:
+        created_range["$gte"] = screening_filter.created_after
+    if screening_filter.created_before:
+        created_range["$lt"] = screening_filter.created_before
+    if created_range:
+        query["created_at"] = created_range
+    if screening_filter.skills:
+        query[skills_field] = {"$all": screening_filter.skills}
+    return query
+
+def _vector(doc: Dict[str, Any], skills_field: str) -> np.ndarray:
+    sparse = doc.get("skill_vector")
+    if sparse is None:
+        sparse = build_skill_vector(doc.get(skills_field, []), doc.get("extracted_keywords", []))
+    return to_dense(sparse)
+
+class _BudgetSpent(Exception):
+    """A narrative needs more calls than the run's budget has left for it"""
+
+def merge_top_k(best_scores: np.ndarray, best_rows: np.ndarray, scores: np.ndarray, rows: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Fold a chunk's (resumes x jobs) scores into the running per-job top k.
+
+    best_scores/best_rows are (<=k x jobs); rows holds the chunk's resume
+    positions. Returns the new top k per column, unordered.
+    """
+    scores = np.vstack([best_scores, scores])
+    rows = np.vstack([best_rows, np.broadcast_to(rows[:, None], (rows.size, scores.shape[1]))])
+    if scores.shape[0] <= k:
+        return scores, rows
+    top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    return np.take_along_axis(scores, top, axis=0), np.take_along_axis(rows, top, axis=0)
+
+class ScreeningRunner:
+    """Runs all-pairs screening: a vectorized resumes x jobs score matrix,
+    full local matches for each job's shortlist, and narratives for the best
+    pairs within a fixed LLM budget. Runs execute one at a time.
+    """
+
+    def __init__(self, nlp_processor: NLPProcessor, embedder: SkillEmbedder):
+        self.nlp_processor = nlp_processor
+        self.embedder = embedder
+        self._lock = asyncio.Lock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def start(self, request: ScreeningRunRequest) -> Dict[str, Any]:
+        """Queue a run; returns its stored document"""
+        shortlist_size = request.shortlist_size or SCREENING_SHORTLIST_SIZE
+        llm_budget = SCREENING_LLM_BUDGET if request.llm_budget is None else request.llm_budget
+        if not 1 <= shortlist_size <= SCREENING_MAX_SHORTLIST_SIZE:
+            raise ValueError(f"shortlist_size must be between 1 and {SCREENING_MAX_SHORTLIST_SIZE}")
+        if not 0 <= llm_budget <= SCREENING_MAX_LLM_BUDGET:
+            raise ValueError(f"llm_budget must be between 0 and {SCREENING_MAX_LLM_BUDGET}")
+
+        run = {
+            "id": str(uuid.uuid4()),
+            "status": QUEUED,
+            "resume_filter": request.resume_filter.model_dump(),
+            "job_filter": request.job_filter.model_dump(),
+            "shortlist_size": shortlist_size,
+            "llm_budget": llm_budget,
+            "progress": {
+                "resumes": 0, "jobs": 0, "pairs_scored": 0, "jobs_shortlisted": 0,
+                "matches_stored": 0, "matches_reused": 0, "llm_calls": 0,
+                "narratives_generated": 0, "narratives_failed": 0
+            },
+            "error": None,
+            "created_at": datetime.now(timezone.utc),
+            "started_at": None,
+            "finished_at": None
+        }
+        await screening_runs_collection.insert_one(dict(run))
+        self._tasks[run["id"]] = asyncio.create_task(self._run(run, request))
+        return run
+
+    async def _update(self, run: Dict[str, Any], **fields):
+        run.update(fields)
+        await screening_runs_collection.update_one(
+            {"id": run["id"]}, {"$set": {**fields, "progress": run["progress"]}}
+        )
+
+    async def _run(self, run: Dict[str, Any], request: ScreeningRunRequest):
+        try:
+            async with self._lock:
+                await self._update(run, status=RUNNING, started_at=datetime.now(timezone.utc))
+                await self._screen(run, request)
+                await self._update(run, status=COMPLETED, finished_at=datetime.now(timezone.utc))
+        except asyncio.CancelledError:
+            await asyncio.shield(self._update(run, status=CANCELLED, finished_at=datetime.now(timezone.utc)))
+        except Exception as e:
+            logger.exception("Error in screening run %s: %s", run["id"], e)
+            await self._update(run, status=FAILED, error=str(e), finished_at=datetime.now(timezone.utc))
+        finally:
+            self._tasks.pop(run["id"], None)
+
+    async def _screen(self, run: Dict[str, Any], request: ScreeningRunRequest):
+        progress = run["progress"]
+        job_filter = request.job_filter.model_copy(update={
+            "skills": self.embedder.canonicalize_many(request.job_filter.skills or []) or None
+        })
+        resume_filter = request.resume_filter.model_copy(update={
+            "skills": self.embedder.canonicalize_many(request.resume_filter.skills or []) or None
+        })
+
+        jobs = await jobs_collection.find(build_filter_query(job_filter, "required_skills"), _JOB_PROJECTION).to_list(None)
+        progress["jobs"] = len(jobs)
+        if not jobs:
+            return
+        job_matrix = np.stack([_vector(job, "required_skills") for job in jobs])
+
+        # Score every resume against every job, keeping each job's top k
+        k = run["shortlist_size"]
+        best_scores = np.zeros((0, len(jobs)), dtype=np.float32)
+        best_rows = np.zeros((0, len(jobs)), dtype=np.int64)
+        resume_ids: List[str] = []
+        chunk: List[np.ndarray] = []
+
+        def fold():
+            nonlocal best_scores, best_rows
+            rows = np.arange(len(resume_ids) - len(chunk), len(resume_ids))
+            scores = np.stack(chunk) @ job_matrix.T
+            best_scores, best_rows = merge_top_k(best_scores, best_rows, scores, rows, k)
+            progress["pairs_scored"] += scores.size
+            chunk.clear()
+
+        async for resume in resumes_collection.find(build_filter_query(resume_filter, "extracted_skills"), _RESUME_PROJECTION):
+            resume_ids.append(resume["id"])
+            chunk.append(_vector(resume, "extracted_skills"))
+            if len(chunk) >= SCREENING_CHUNK_SIZE:
+                fold()
+                progress["resumes"] = len(resume_ids)
+                await self._update(run)
+        if chunk:
+            fold()
+        progress["resumes"] = len(resume_ids)
+        await self._update(run)
+
+        # Full local match for each job's shortlist, stored job by job
+        for column, job in enumerate(jobs):
+            order = np.argsort(-best_scores[:, column], kind="stable")
+            shortlist = [
+                (resume_ids[best_rows[i, column]], float(best_scores[i, column]))
+                for i in order if best_scores[i, column] > 0
+            ]
+            await self._store_shortlist(run, job, shortlist)
+            progress["jobs_shortlisted"] += 1
+            await self._update(run)
+
+        await self._generate_narratives(run, jobs)
+
+    async def _store_shortlist(self, run: Dict[str, Any], job: Dict[str, Any], shortlist: List[Tuple[str, float]]):
+        progress = run["progress"]
+        resume_ids = [resume_id for resume_id, _ in shortlist]
+        resumes: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(resume_ids), SCREENING_WRITE_BATCH):
+            async for resume in resumes_collection.find({"id": {"$in": resume_ids[start:start + SCREENING_WRITE_BATCH]}}, {"original_text": 0, "sections": 0}):
+                resumes[resume["id"]] = resume
+
+        # Reuse matches already scored under the current rules instead of
+        # duplicating them; buffered matches must reach Mongo to be found
+        await flush_writes("matches")
+        existing: Dict[str, Dict[str, Any]] = {}
+        async for match in matches_collection.find({
+            "job_id": job["id"], "resume_id": {"$in": resume_ids}, "processing_version": MATCH_SCORING_VERSION
+        }):
+            existing.setdefault(match["resume_id"], match)
+
+        job_info = job_info_from_doc(job)
+        new_matches: List[Dict[str, Any]] = []
+        results: List[Dict[str, Any]] = []
+        for resume_id, screen_score in shortlist:
+            resume = resumes.get(resume_id)
+            if resume is None:
+                continue
+            match = existing.get(resume_id)
+            if match is None:
+                result = compute_local_match(self.embedder, resume_info_from_doc(resume), job_info)
+                match = MatchingResult(
+                    resume_id=resume_id,
+                    job_id=job["id"],
+                    overall_score=result["overall_score"],
+                    skills_match=result["skills_match"],
+                    experience_match=result["experience_match"],
+                    qualifications_match=result["qualifications_match"],
+                    matched_keywords=result["matched_keywords"],
+                    missing_skills=result["missing_skills"],
+                    **await interned_fields("matches", result),
+                    processing_version=MATCH_SCORING_VERSION
+                ).model_dump()
+                new_matches.append(match)
+            results.append({
+                "run_id": run["id"],
+                "job_id": job["id"],
+                "resume_id": resume_id,
+                "resume_filename": resume.get("filename"),
+                "match_id": match["id"],
+                "screen_score": round(100.0 * screen_score, 1),
+                "overall_score": match["overall_score"],
+                "missing_skills": match["missing_skills"],
+                "narrative_generated": bool(match.get("narrative_generated"))
+            })
+            # Scoring is CPU-bound; let other requests in between pairs
+            await asyncio.sleep(0)
+
+        results.sort(key=lambda result: (-result["overall_score"], -result["screen_score"]))
+        for rank, result in enumerate(results, 1):
+            result["rank"] = rank
+        for start in range(0, len(new_matches), SCREENING_WRITE_BATCH):
+            await matches_collection.insert_many(new_matches[start:start + SCREENING_WRITE_BATCH], ordered=False)
+        if new_matches:
+            await bump_version("matches")
+        for start in range(0, len(results), SCREENING_WRITE_BATCH):
+            await screening_results_collection.insert_many(results[start:start + SCREENING_WRITE_BATCH], ordered=False)
+        for match in new_matches:
+            await record_match(match)
+        progress["matches_stored"] += len(new_matches)
+        progress["matches_reused"] += len(results) - len(new_matches)
+
+    async def _generate_narratives(self, run: Dict[str, Any], jobs: List[Dict[str, Any]]):
+        """Spend the run's LLM budget on the best pairs, taking rank 1 of every job, then rank 2, ...
+
+        Every call counts against the budget, including follow-ups that
+        complete or fix a reply, so a narrative may be cut off by it.
+        """
+        progress = run["progress"]
+        budget = run["llm_budget"]
+        if budget <= 0:
+            return
+        candidates = await screening_results_collection.find(
+            {"run_id": run["id"], "narrative_generated": False, "rank": {"$lte": budget}}
+        ).sort([("rank", ASCENDING)]).to_list(None)
+        candidates = candidates[:budget]
+        jobs_by_id = {job["id"]: job for job in jobs}
+        slots = asyncio.Semaphore(SCREENING_LLM_CONCURRENCY)
+        unavailable = asyncio.Event()
+
+        # Calls held for narratives in progress: each may need follow-ups to
+        # complete or fix its reply, and those must fit in the budget too
+        reserved = 0
+        released = asyncio.Condition()
+
+        async def generate(result):
+            nonlocal reserved
+            async with slots:
+                # Wait for narratives in progress to return calls they didn't need
+                async with released:
+                    await released.wait_for(lambda: progress["llm_calls"] + reserved < budget or not reserved)
+                if unavailable.is_set() or progress["llm_calls"] >= budget:
+                    return
+                allowance = min(1 + LLM_JSON_MAX_FOLLOWUPS, budget - progress["llm_calls"] - reserved)
+                reserved += allowance
+                calls = 0
+
+                def spend():
+                    nonlocal reserved, calls
+                    if calls >= allowance:
+                        raise _BudgetSpent()
+                    calls += 1
+                    reserved -= 1
+                    progress["llm_calls"] += 1
+
+                try:
+                    await generate_one(result, spend)
+                finally:
+                    reserved -= allowance - calls
+                    async with released:
+                        released.notify_all()
+
+        async def generate_one(result, spend):
+            match = await matches_collection.find_one({"id": result["match_id"]})
+            resume = await resumes_collection.find_one({"id": result["resume_id"]}, {"original_text": 0, "sections": 0})
+            if match is None or resume is None:
+                return
+            try:
+                generated = await self.nlp_processor.generate_match_narrative(
+                    resume_info_from_doc(resume), job_info_from_doc(jobs_by_id[result["job_id"]]), match, spend
+                )
+            except _BudgetSpent:
+                progress["narratives_failed"] += 1
+                return
+            except Exception as e:
+                logger.warning("Error generating screening narrative for match %s: %s", result["match_id"], e)
+                progress["narratives_failed"] += 1
+                return
+            if generated.pop("fallback", False):
+                # The LLM is unavailable; don't spend the rest of the budget on fallbacks
+                unavailable.set()
+                progress["narratives_failed"] += 1
+                return
+            generated["narrative_generated"] = True
+            await matches_collection.update_one({"id": result["match_id"]}, {"$set": generated})
+            await bump_version("matches")
+            await screening_results_collection.update_one({"_id": result["_id"]}, {"$set": {"narrative_generated": True}})
+            progress["narratives_generated"] += 1
+
+        await asyncio.gather(*(generate(result) for result in candidates))
+        await self._update(run)
+
+    async def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        return await screening_runs_collection.find_one({"id": run_id}, {"_id": 0})
+
+    async def list_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return await screening_runs_collection.find({}, {"_id": 0}).sort([("created_at", DESCENDING)]).limit(limit).to_list(None)
+
+    async def shortlist(self, run_id: str, job_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """A job's ranked shortlist; available as soon as that job has been screened"""
+        cursor = screening_results_collection.find({"run_id": run_id, "job_id": job_id}, {"_id": 0, "run_id": 0})
+        return await cursor.sort([("rank", ASCENDING)]).limit(limit).to_list(None)
+
+    def cancel(self, run_id: str) -> bool:
+        task = self._tasks.get(run_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def recover(self):
+        """Mark runs interrupted by a restart as failed"""
+        await screening_runs_collection.update_many(
+            {"status": {"$in": [QUEUED, RUNNING]}, "id": {"$nin": list(self._tasks)}},
+            {"$set": {"status": FAILED, "error": "Interrupted by a server restart", "finished_at": datetime.now(timezone.utc)}}
+        )
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
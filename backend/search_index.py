@@ -0,0 +1,263 @@
+import os
+import html
+import logging
+import re
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from profiling import stage
+
+logger = logging.getLogger(__name__)
+
+# On-disk full-text index over resumes and job descriptions (SQLite FTS5)
+SEARCH_INDEX_PATH = os.getenv(
+    "SEARCH_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_index.sqlite3")
+)
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+SEARCH_MAX_PAGE_SIZE = 100
+# Matches are counted exactly up to this many; beyond it the total is a lower bound
+SEARCH_COUNT_LIMIT = int(os.getenv("SEARCH_COUNT_LIMIT", "1000"))
+
+# Indexed columns in FTS order, with their BM25 weight
+FIELD_BOOSTS: List[Tuple[str, float]] = [
+    ("title", 3.0),
+    ("skills", 4.0),
+    ("experience", 2.0),
+    ("qualifications", 2.0),
+    ("keywords", 3.0),
+    ("body", 1.0),
+]
+FIELDS = [name for name, _ in FIELD_BOOSTS]
+_BM25 = "bm25({table}, " + ", ".join(str(weight) for _, weight in FIELD_BOOSTS) + ")"
+
+# Source fields per document kind, in FIELDS order. Each kind has its own
+# FTS table, so filtering by kind costs nothing at query time.
+_SOURCE_FIELDS = {
+    "resume": ("filename", "extracted_skills", "extracted_experience", "extracted_qualifications", "extracted_keywords", "original_text"),
+    "job": ("title", "required_skills", "required_experience", "required_qualifications", "extracted_keywords", "description"),
+}
+
+OPERATORS = {"AND", "OR", "NOT"}
+# Dropped from free-text queries so "python in Berlin" doesn't require "in"
+STOPWORDS = {"a", "an", "and", "at", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+# A "quoted phrase" (optionally field-scoped, as in title:"data engineer") or a bare word
+_TOKEN = re.compile(r'(?:([A-Za-z_]+):)?"([^"]*)"|(\S+)')
+
+KINDS = list(_SOURCE_FIELDS)
+
+def _table(kind: str) -> str:
+    return f"{kind}_documents"
+
+_SCHEMA = ["CREATE TABLE IF NOT EXISTS docs (rowid INTEGER PRIMARY KEY, doc_id TEXT UNIQUE NOT NULL, kind TEXT NOT NULL)"] + [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {_table(kind)} USING fts5("
+    + ", ".join(FIELDS) + ", tokenize = 'porter unicode61 remove_diacritics 2')"
+    for kind in KINDS
+]
+
+# snippet() highlights with these control characters; the snippet is
+# HTML-escaped and only then are they turned into <mark> tags, so document
+# text can't inject markup
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+def _snippet_html(snippet: str) -> str:
+    return html.escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+class SearchQueryError(ValueError):
+    """The query has no searchable terms"""
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+def build_fts_query(query: str) -> str:
+    """Translate a user query into a safe FTS5 expression.
+
+    Supports "quoted phrases", AND/OR/NOT (upper case), prefix* terms and
+    field:term or field:"a phrase" for the indexed fields; bare terms are ANDed. Everything else
+    is quoted, so user input can't produce FTS5 syntax errors.
+    """
+    parts: List[str] = []
+    for phrase_field, phrase, word in _TOKEN.findall(query):
+        if phrase or phrase_field:
+            prefix = ""
+            if phrase_field.lower() in FIELDS:
+                prefix = phrase_field.lower() + ":"
+            elif phrase_field and phrase_field.lower() not in STOPWORDS:
+                # Not an indexed field, so it is just another term
+                parts.append(_quote(phrase_field))
+            if phrase.strip():
+                parts.append(prefix + _quote(phrase.strip()))
+            continue
+        if word in OPERATORS:
+            parts.append(word)
+            continue
+        field, _, term = word.partition(":")
+        prefix = ""
+        if term and field.lower() in FIELDS:
+            prefix, word = field.lower() + ":", term
+        star = word.endswith("*")
+        word = word.strip("*()^-:.,;!?'\"")
+        if not word or (not prefix and word.lower() in STOPWORDS):
+            continue
+        parts.append(prefix + _quote(word) + ("*" if star else ""))
+
+    # Operators need a term on both sides; FTS5 NOT is binary
+    cleaned: List[str] = []
+    for part in parts:
+        if part in OPERATORS and (not cleaned or cleaned[-1] in OPERATORS):
+            continue
+        cleaned.append(part)
+    while cleaned and cleaned[-1] in OPERATORS:
+        cleaned.pop()
+    if not cleaned:
+        raise SearchQueryError("Query has no searchable terms")
+    return " ".join(cleaned)
+
+def _join(values: Any) -> str:
+    if isinstance(values, list):
+        values = "\n".join(str(value) for value in values)
+    return str(values or "").replace(_MARK_START, "").replace(_MARK_END, "")
+
+class SearchIndex:
+    """BM25-ranked search with field boosts, phrase queries and snippets.
+
+    SQLite calls run on a small thread pool with a connection per thread;
+    WAL mode lets searches run while a document is being indexed.
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH, workers: int = SEARCH_WORKERS):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+        with self._write_lock:
+            connection = self._connection()
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _upsert_many(self, rows: List[Tuple[str, str, List[str]]]):
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                for doc_id, kind, values in rows:
+                    existing = connection.execute("SELECT rowid FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+                    if existing:
+                        connection.execute(f"DELETE FROM {_table(kind)} WHERE rowid = ?", existing)
+                        rowid = existing[0]
+                    else:
+                        rowid = connection.execute("INSERT INTO docs (doc_id, kind) VALUES (?, ?)", (doc_id, kind)).lastrowid
+                    connection.execute(
+                        f"INSERT INTO {_table(kind)} (rowid, {', '.join(FIELDS)}) VALUES (?, {', '.join('?' * len(FIELDS))})",
+                        (rowid, *values)
+                    )
+
+    @staticmethod
+    def _row(kind: str, doc: Dict[str, Any]) -> Tuple[str, str, List[str]]:
+        return doc["id"], kind, [_join(doc.get(field)) for field in _SOURCE_FIELDS[kind]]
+
+    async def index(self, kind: str, doc: Dict[str, Any]):
+        """Add or replace a resume or job in the index.
+
+        Failures are logged rather than raised: the document is already
+        stored, and catch_up indexes anything missing on the next start.
+        """
+        try:
+            with stage("search_index"):
+                await self._run(self._upsert_many, [self._row(kind, doc)])
+        except Exception as e:
+            logger.error("Error indexing %s %s for search: %s", kind, doc.get("id"), e)
+
+    def _missing(self, doc_ids: List[str]) -> List[str]:
+        placeholders = ", ".join("?" * len(doc_ids))
+        found = {row[0] for row in self._connection().execute(f"SELECT doc_id FROM docs WHERE doc_id IN ({placeholders})", doc_ids)}
+        return [doc_id for doc_id in doc_ids if doc_id not in found]
+
+    async def catch_up(self, collection, kind: str, batch_size: int = 500) -> int:
+        """Index documents stored while the index was unavailable (or before it existed)"""
+        indexed = 0
+        batch: List[str] = []
+
+        async def flush():
+            nonlocal indexed
+            missing = await self._run(self._missing, batch)
+            if missing:
+                docs = await collection.find({"id": {"$in": missing}}).to_list(None)
+                await self._run(self._upsert_many, [self._row(kind, doc) for doc in docs])
+                indexed += len(docs)
+
+        async for doc in collection.find({}, {"_id": 0, "id": 1}):
+            batch.append(doc["id"])
+            if len(batch) >= batch_size:
+                await flush()
+                batch = []
+        if batch:
+            await flush()
+        return indexed
+
+    def _search_kind(self, kind: str, fts_query: str, limit: int) -> Tuple[int, bool, List[Dict[str, Any]]]:
+        table = _table(kind)
+        connection = self._connection()
+        total = connection.execute(
+            f"SELECT count(*) FROM (SELECT rowid FROM {table} WHERE {table} MATCH ? LIMIT ?)",
+            (fts_query, SEARCH_COUNT_LIMIT + 1)
+        ).fetchone()[0]
+        rows = connection.execute(
+            f"SELECT docs.doc_id, {table}.title, {_BM25.format(table=table)} AS score, "
+            f"snippet({table}, -1, char(2), char(3), '…', 24) "
+            f"FROM {table} JOIN docs ON docs.rowid = {table}.rowid "
+            f"WHERE {table} MATCH ? ORDER BY score LIMIT ?",
+            (fts_query, limit)
+        ).fetchall()
+        results = [
+            {"id": doc_id, "type": kind, "title": title, "score": round(-score, 3), "snippet": _snippet_html(snippet)}
+            for doc_id, title, score, snippet in rows
+        ]
+        return min(total, SEARCH_COUNT_LIMIT), total <= SEARCH_COUNT_LIMIT, results
+
+    def _search(self, fts_query: str, kind: Optional[str], limit: int, offset: int) -> Dict[str, Any]:
+        total, exact = 0, True
+        results: List[Tuple[int, float, Dict[str, Any]]] = []
+        # BM25 scores depend on each table's own term statistics, so they
+        # aren't comparable across tables: each kind is ranked on its own and
+        # merged hits are interleaved by rank, ties going to the hit closer
+        # to its kind's best score
+        for searched in ([kind] if kind else KINDS):
+            kind_total, kind_exact, kind_results = self._search_kind(searched, fts_query, offset + limit)
+            total += kind_total
+            exact = exact and kind_exact
+            best = (kind_results[0]["score"] if kind_results else 0.0) or 1.0
+            results.extend(
+                (rank, -result["score"] / best, result) for rank, result in enumerate(kind_results)
+            )
+        results.sort(key=lambda ranked: ranked[:2])
+        results = [result for _, _, result in results]
+        return {"total": total, "total_exact": exact, "results": results[offset:offset + limit]}
+
+    async def search(self, query: str, kind: Optional[str] = None, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+        """Search resumes and/or jobs; raises SearchQueryError for an empty query"""
+        if kind is not None and kind not in KINDS:
+            raise SearchQueryError(f"Unknown document type {kind!r}; expected one of {KINDS}")
+        fts_query = build_fts_query(query)
+        page = max(1, page)
+        page_size = max(1, min(page_size, SEARCH_MAX_PAGE_SIZE))
+        result = await self._run(self._search, fts_query, kind, page_size, (page - 1) * page_size)
+        return {"query": query, "fts_query": fts_query, "page": page, "page_size": page_size, **result}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
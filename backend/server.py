@@ -1,27 +1,91 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse
+from starlette.background import BackgroundTask
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 import uvicorn
 import os
-from typing import List, Optional
+import logging
+import asyncio
+import contextvars
+import tempfile
+import zipfile
+from typing import Optional
 from datetime import datetime
 import json
 
 # Import our modules
-from models import ResumeAnalysis, JobDescription, MatchingResult, UploadRequest, JobDescriptionRequest, MatchRequest
-from database import init_database, close_database, resumes_collection, jobs_collection, matches_collection
-from nlp_processor import NLPProcessor
+from models import ResumeAnalysis, JobDescription, MatchingResult, UploadRequest, JobDescriptionRequest, MatchRequest, ScreeningRunRequest
+from database import (
+    init_database, close_database, resumes_collection, jobs_collection, matches_collection,
+    insert_document, bump_version, find_by_id, flush_writes
+)
+from nlp_processor import NLPProcessor, RESUME_EXTRACTION_VERSION, JOB_EXTRACTION_VERSION
 from file_processor import FileProcessor
+from skill_vectors import JobVectorIndex, build_skill_vector
+from skill_embeddings import SkillEmbedder
+from match_scoring import compute_local_match, resume_info_from_doc, job_info_from_doc, MATCH_SCORING_VERSION
+from http_cache import cached_json_response
+from match_export import build_export_query, stream_matches
+from analytics import record_match, rebuild_job_analytics, get_job_analytics
+from rescoring import Rescorer, RESCORE_ENABLED, VIEW_FIELD, rescore_match
+from match_expiry import MatchExpiry
+from resume_sections import (
+    split_sections, section_text, stored_sections, diff_sections, merge_section_fields,
+    fields_from_doc, attach_text, RESUME_FIELDS
+)
+from llm_resilience import LLMUnavailableError, BREAKER_OPEN_SECONDS
+from llm_json import LLMOutputError
+from metrics import render_metrics
+from skill_dictionary import skill_dictionary, interned_fields
+from admission import AdmissionControlMiddleware, ADMISSION_ENABLED
+from deadlines import run_with_deadline, current_deadline, check, DeadlineExceeded
+from search_index import SearchIndex, SearchQueryError
+from idempotency import run_idempotent, IDEMPOTENCY_HEADER
+from profiling import ProfilingMiddleware, profiler, slow_requests, require_admin, stage
+from screening import ScreeningRunner
+from logging_setup import setup_logging, RequestIdMiddleware
+
+# Before anything logs, so every record goes through the background writer
+setup_logging()
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    global search_index
     await init_database()
+    await skill_dictionary.load()
+    await job_vector_index.load(jobs_collection)
+    search_index = SearchIndex()
+    rescorer.search_index = search_index
+    search_catch_up = asyncio.create_task(_catch_up_search_index())
+    await screening_runner.recover()
+    if RESCORE_ENABLED:
+        rescorer.start()
+    match_expiry.start()
     yield
     # Shutdown
+    search_catch_up.cancel()
+    await screening_runner.stop()
+    await rescorer.stop()
+    await match_expiry.stop()
+    skill_embedder.save()
+    extraction_pool.shutdown(wait=False)
+    search_index.close()
     await close_database()
 
+async def _catch_up_search_index():
+    """Index documents stored while the search index was unavailable"""
+    try:
+        indexed = await search_index.catch_up(resumes_collection, "resume")
+        indexed += await search_index.catch_up(jobs_collection, "job")
+        if indexed:
+            logger.info("Search index caught up with %d documents", indexed)
+    except Exception as e:
+        logger.error("Error catching up search index: %s", e)
+
 app = FastAPI(
     title="Resume and Job Description Matcher",
     description="AI-powered resume and job description matching system",
@@ -29,6 +93,11 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Shed load on the LLM-bound endpoints before their bodies are read.
+# Added before CORS so that 429 responses still carry CORS headers.
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -38,9 +107,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so slow-request timings cover the whole request including admission queueing
+app.add_middleware(ProfilingMiddleware)
+
+# Around everything else, so every log record of a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
+# Archive upload limits
+ARCHIVE_MAX_SIZE_MB = int(os.getenv("ARCHIVE_MAX_SIZE_MB", "1024"))
+ARCHIVE_ENTRY_MAX_SIZE_MB = int(os.getenv("ARCHIVE_ENTRY_MAX_SIZE_MB", "100"))
+ARCHIVE_CONCURRENCY = int(os.getenv("ARCHIVE_CONCURRENCY", "8"))
+
+# Resume updates: LLM calls in flight per request when re-extracting sections
+SECTION_EXTRACTION_CONCURRENCY = int(os.getenv("SECTION_EXTRACTION_CONCURRENCY", "2"))
+# Above this share of changed sections, one whole-text extraction is cheaper
+SECTION_REEXTRACT_MAX_SHARE = float(os.getenv("SECTION_REEXTRACT_MAX_SHARE", "0.5"))
+
 # Initialize processors
 nlp_processor = NLPProcessor()
 file_processor = FileProcessor()
+job_vector_index = JobVectorIndex()
+skill_embedder = SkillEmbedder()
+rescorer = Rescorer(nlp_processor, skill_embedder, job_vector_index)
+screening_runner = ScreeningRunner(nlp_processor, skill_embedder)
+match_expiry = MatchExpiry()
+# Opened in lifespan, so importing the app doesn't touch the index file
+search_index: Optional[SearchIndex] = None
+
+# Thread pool for CPU-bound text extraction, kept off the event loop
+extraction_pool = ThreadPoolExecutor(max_workers=int(os.getenv("EXTRACTION_WORKERS", "4")))
 
 @app.get("/")
 async def root():
@@ -50,9 +145,37 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose process metrics in the Prometheus text format"""
+    return render_metrics()
+
+def _llm_unavailable(e: LLMUnavailableError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"LLM provider unavailable: {str(e)}",
+        headers={"Retry-After": str(int(BREAKER_OPEN_SECONDS))}
+    )
+
+def _llm_bad_output(e: LLMOutputError) -> HTTPException:
+    # Nothing was stored; the client can retry the request as is
+    return HTTPException(status_code=502, detail=f"LLM returned an unusable response: {e.reason}")
+
+async def _run_request(http_request: Request, endpoint: str, payload, handler):
+    """Idempotency, deadline and disconnect handling shared by the LLM-bound endpoints"""
+    key = http_request.headers.get(IDEMPOTENCY_HEADER)
+    return await run_idempotent(
+        key, endpoint, payload,
+        # With a key, a retry may be waiting for this result, so a disconnect doesn't cancel it
+        lambda: run_with_deadline(http_request, endpoint, handler, cancel_on_disconnect=key is None)
+    )
+
 @app.post("/api/upload-resume")
-async def upload_resume(request: UploadRequest):
+async def upload_resume(request: UploadRequest, http_request: Request):
     """Upload and process a resume file"""
+    return await _run_request(http_request, "upload_resume", request, lambda: _upload_resume(request))
+
+async def _upload_resume(request: UploadRequest):
     try:
         # Validate file size (100MB limit)
         if not file_processor.validate_file_size(request.file_content, 100):
@@ -65,30 +188,20 @@ async def upload_resume(request: UploadRequest):
                 detail=f"Unsupported file type. Supported formats: {file_processor.get_supported_formats()}"
             )
         
-        # Extract text from file
-        extracted_text = file_processor.extract_text_from_base64(
-            request.file_content, 
-            request.file_type
+        # Extract text from file; the copied context carries the request's stage timings
+        extracted_text = await asyncio.get_running_loop().run_in_executor(
+            extraction_pool,
+            contextvars.copy_context().run,
+            file_processor.extract_text_from_base64,
+            request.file_content,
+            request.file_type,
+            current_deadline()
         )
         
         if not extracted_text:
             raise HTTPException(status_code=400, detail="Failed to extract text from file")
         
-        # Process with NLP
-        resume_info = await nlp_processor.extract_resume_info(extracted_text)
-        
-        # Create resume analysis object
-        resume_analysis = ResumeAnalysis(
-            filename=request.filename,
-            original_text=extracted_text,
-            extracted_skills=resume_info.get("skills", []),
-            extracted_experience=resume_info.get("experience", []),
-            extracted_qualifications=resume_info.get("qualifications", []),
-            extracted_keywords=resume_info.get("keywords", [])
-        )
-        
-        # Save to database
-        await resumes_collection.insert_one(resume_analysis.model_dump())
+        resume_analysis = await _analyze_resume(request.filename, extracted_text)
         
         return {
             "message": "Resume processed successfully",
@@ -99,29 +212,329 @@ async def upload_resume(request: UploadRequest):
             "extracted_keywords": resume_analysis.extracted_keywords
         }
         
+    except HTTPException:
+        raise
+    except LLMUnavailableError as e:
+        raise _llm_unavailable(e)
+    except LLMOutputError as e:
+        raise _llm_bad_output(e)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"Error processing resume: {e}")
+        logger.exception("Error processing resume: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing resume: {str(e)}")
 
+@app.put("/api/resumes/{resume_id}")
+async def update_resume(resume_id: str, request: UploadRequest, http_request: Request):
+    """Replace a resume's file, re-extracting only the sections that changed"""
+    return await _run_request(
+        http_request, "update_resume", {"resume_id": resume_id, **request.model_dump()},
+        lambda: _update_resume(resume_id, request)
+    )
+
+async def _update_resume(resume_id: str, request: UploadRequest):
+    try:
+        if not file_processor.validate_file_size(request.file_content, 100):
+            raise HTTPException(status_code=413, detail="File size exceeds 100MB limit")
+        
+        if request.file_type.lower() not in file_processor.get_supported_formats():
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Unsupported file type. Supported formats: {file_processor.get_supported_formats()}"
+            )
+        
+        resume_doc = await find_by_id("resumes", resume_id)
+        if not resume_doc:
+            raise HTTPException(status_code=404, detail="Resume not found")
+        
+        extracted_text = await asyncio.get_running_loop().run_in_executor(
+            extraction_pool,
+            contextvars.copy_context().run,
+            file_processor.extract_text_from_base64,
+            request.file_content,
+            request.file_type,
+            current_deadline()
+        )
+        
+        if not extracted_text:
+            raise HTTPException(status_code=400, detail="Failed to extract text from file")
+        
+        old_sections = attach_text(resume_doc.get("sections"), resume_doc["original_text"])
+        new_sections = split_sections(extracted_text)
+        unchanged, changed, removed = diff_sections(old_sections, new_sections)
+        old_by_hash = {section["hash"]: section for section in old_sections}
+        kept = [old_by_hash[section["hash"]] for section in unchanged]
+        current = fields_from_doc(resume_doc)
+        
+        # A mostly rewritten resume, or one stored before sections were
+        # tracked, is extracted as a whole: one call instead of one per section
+        whole_text = bool(changed) and (
+            not resume_doc.get("sections") or len(changed) > SECTION_REEXTRACT_MAX_SHARE * len(new_sections)
+        )
+        if whole_text:
+            merged = await nlp_processor.extract_resume_info(extracted_text)
+            merged = {field: merged.get(field, []) for field in RESUME_FIELDS}
+            merged["skills"] = skill_embedder.canonicalize_many(merged["skills"])
+            sections = stored_sections(new_sections)
+        else:
+            # Only the edited and added sections go to the LLM, a few at a time
+            slots = asyncio.Semaphore(SECTION_EXTRACTION_CONCURRENCY)
+            
+            async def extract(section):
+                async with slots:
+                    return await nlp_processor.extract_resume_info(section_text(section))
+            
+            extracted = await asyncio.gather(*(extract(section) for section in changed))
+            for section, section_info in zip(changed, extracted):
+                section_info["skills"] = skill_embedder.canonicalize_many(section_info.get("skills", []))
+                section["fields"] = section_info
+            merged = merge_section_fields(current, removed, kept, changed)
+            sections = stored_sections([old_by_hash.get(s["hash"], s) for s in new_sections])
+        fields_changed = merged != current
+        # Stop before writing if the extraction used up the deadline
+        check()
+        
+        update = {
+            "filename": request.filename,
+            "original_text": extracted_text,
+            "sections": sections,
+            "updated_at": datetime.now()
+        }
+        if fields_changed:
+            update.update({stored: merged[field] for field, stored in RESUME_FIELDS.items()})
+            update["processing_version"] = RESUME_EXTRACTION_VERSION
+            update["skill_vector"] = build_skill_vector(merged["skills"], merged["keywords"])
+            update["extracted_skill_ids"] = await skill_dictionary.intern(merged["skills"])
+        await flush_writes("resumes")
+        await resumes_collection.update_one({"id": resume_id}, {"$set": update})
+        await bump_version("resumes")
+        await search_index.index("resume", {**resume_doc, **update})
+        
+        # Matches only depend on the extracted fields, so an edit that leaves
+        # them unchanged needs no rescoring
+        rescored = 0
+        if fields_changed:
+            resume_doc.update(update)
+            await flush_writes("matches")
+            match_docs = await matches_collection.find({"resume_id": resume_id}).to_list(None)
+            job_ids = list({match_doc["job_id"] for match_doc in match_docs})
+            job_docs = {doc["id"]: doc async for doc in jobs_collection.find({"id": {"$in": job_ids}})}
+            for match_doc in match_docs:
+                check()
+                job_doc = job_docs.get(match_doc["job_id"])
+                if job_doc and await rescore_match(skill_embedder, match_doc, resume_doc, job_doc):
+                    rescored += 1
+            if match_docs:
+                await bump_version("matches")
+        
+        return {
+            "message": "Resume updated successfully",
+            "resume_id": resume_id,
+            "sections_total": len(new_sections),
+            "sections_reextracted": len(changed),
+            "whole_text_extracted": whole_text,
+            "sections_removed": len(removed),
+            "fields_changed": fields_changed,
+            "matches_rescored": rescored,
+            "extracted_skills": merged["skills"],
+            "extracted_experience": merged["experience"],
+            "extracted_qualifications": merged["qualifications"],
+            "extracted_keywords": merged["keywords"]
+        }
+        
+    except HTTPException:
+        raise
+    except LLMUnavailableError as e:
+        raise _llm_unavailable(e)
+    except LLMOutputError as e:
+        raise _llm_bad_output(e)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.exception("Error updating resume: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error updating resume: {str(e)}")
+
+async def _analyze_resume(filename: str, extracted_text: str) -> ResumeAnalysis:
+    """Run NLP extraction on resume text and store the resulting analysis"""
+    resume_info = await nlp_processor.extract_resume_info(extracted_text)
+    resume_info["skills"] = skill_embedder.canonicalize_many(resume_info.get("skills", []))
+    
+    # Create resume analysis object
+    resume_analysis = ResumeAnalysis(
+        filename=filename,
+        original_text=extracted_text,
+        extracted_skills=resume_info.get("skills", []),
+        extracted_skill_ids=await skill_dictionary.intern(resume_info.get("skills", [])),
+        extracted_experience=resume_info.get("experience", []),
+        extracted_qualifications=resume_info.get("qualifications", []),
+        extracted_keywords=resume_info.get("keywords", []),
+        skill_vector=build_skill_vector(resume_info.get("skills", []), resume_info.get("keywords", [])),
+        processing_version=RESUME_EXTRACTION_VERSION,
+        sections=stored_sections(split_sections(extracted_text))
+    )
+    
+    # Save to database, unless the extraction used up the deadline
+    check()
+    resume_doc = resume_analysis.model_dump()
+    await insert_document("resumes", resume_doc)
+    await search_index.index("resume", resume_doc)
+    return resume_analysis
+
+async def _process_archive_entry(filename: str, file_data: bytes, file_type: str) -> dict:
+    # The copied context carries the request's stage timings and request id
+    extracted_text = await asyncio.get_running_loop().run_in_executor(
+        extraction_pool, contextvars.copy_context().run, file_processor.extract_text_from_bytes, file_data, file_type
+    )
+    # Drop the raw bytes before the (slow) NLP call
+    del file_data
+    if not extracted_text:
+        return {"filename": filename, "status": "error", "error": "Failed to extract text from file"}
+    
+    resume_analysis = await _analyze_resume(filename, extracted_text)
+    return {
+        "filename": filename,
+        "status": "ok",
+        "resume_id": resume_analysis.id,
+        "extracted_skills": resume_analysis.extracted_skills
+    }
+
+def _remove_file(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+async def _stream_archive_results(archive_path: str):
+    """Process zip entries with bounded concurrency, yielding one NDJSON line per entry.
+    
+    At most ARCHIVE_CONCURRENCY decompressed entries are held in memory: the
+    next entry is only read once a slot is free.
+    """
+    loop = asyncio.get_running_loop()
+    supported = file_processor.get_supported_formats()
+    entry_limit = ARCHIVE_ENTRY_MAX_SIZE_MB * 1024 * 1024
+    slots = asyncio.Semaphore(ARCHIVE_CONCURRENCY)
+    results: asyncio.Queue = asyncio.Queue()
+    pending = set()
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    
+    async def run_entry(filename, file_data, file_type):
+        try:
+            result = await _process_archive_entry(filename, file_data, file_type)
+        except Exception as e:
+            logger.warning("Error processing archive entry %s: %s", filename, e)
+            result = {"filename": filename, "status": "error", "error": str(e)}
+        finally:
+            slots.release()
+        await results.put(result)
+    
+    async def read_entries():
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    filename = os.path.basename(info.filename)
+                    file_type = file_processor.get_file_type(filename)
+                    if not filename or file_type not in supported:
+                        await results.put({"filename": info.filename, "status": "skipped", "error": "Unsupported file type"})
+                        continue
+                    if info.file_size > entry_limit:
+                        await results.put({"filename": filename, "status": "error", "error": f"File size exceeds {ARCHIVE_ENTRY_MAX_SIZE_MB}MB limit"})
+                        continue
+                    
+                    await slots.acquire()
+                    try:
+                        file_data = await loop.run_in_executor(extraction_pool, archive.read, info)
+                    except Exception as e:
+                        slots.release()
+                        await results.put({"filename": filename, "status": "error", "error": str(e)})
+                        continue
+                    task = asyncio.create_task(run_entry(filename, file_data, file_type))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                    del file_data
+        except zipfile.BadZipFile as e:
+            await results.put({"filename": None, "status": "error", "error": f"Invalid archive: {e}"})
+        if pending:
+            await asyncio.gather(*pending)
+        await results.put(None)
+    
+    reader = asyncio.create_task(read_entries())
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            counts[result["status"]] += 1
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"summary": counts}) + "\n"
+    finally:
+        # Client went away: stop reading and abandon in-flight entries
+        reader.cancel()
+        for task in list(pending):
+            task.cancel()
+        _remove_file(archive_path)
+
+@app.post("/api/upload-resume-archive")
+async def upload_resume_archive(request: Request):
+    """Upload a zip of resumes as the raw request body; results stream back as NDJSON"""
+    max_bytes = ARCHIVE_MAX_SIZE_MB * 1024 * 1024
+    received = 0
+    
+    # Spool the body to disk chunk by chunk; the zip central directory is at
+    # the end, so entries can only be read once the upload is complete
+    fd, archive_path = tempfile.mkstemp(suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as archive_file:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Archive size exceeds {ARCHIVE_MAX_SIZE_MB}MB limit")
+                archive_file.write(chunk)
+        if received == 0:
+            raise HTTPException(status_code=400, detail="Empty archive")
+    except BaseException:
+        _remove_file(archive_path)
+        raise
+    
+    return StreamingResponse(
+        _stream_archive_results(archive_path),
+        media_type="application/x-ndjson",
+        # Also covers a client that disconnects before streaming starts
+        background=BackgroundTask(_remove_file, archive_path)
+    )
+
 @app.post("/api/analyze-job")
-async def analyze_job_description(request: JobDescriptionRequest):
+async def analyze_job_description(request: JobDescriptionRequest, http_request: Request):
     """Analyze a job description"""
+    return await _run_request(http_request, "analyze_job", request, lambda: _analyze_job_description(request))
+
+async def _analyze_job_description(request: JobDescriptionRequest):
     try:
         # Process with NLP
         job_info = await nlp_processor.extract_job_info(request.description)
+        job_info["required_skills"] = skill_embedder.canonicalize_many(job_info.get("required_skills", []))
         
         # Create job description object
         job_description = JobDescription(
             title=request.title,
             description=request.description,
             required_skills=job_info.get("required_skills", []),
+            required_skill_ids=await skill_dictionary.intern(job_info.get("required_skills", [])),
             required_experience=job_info.get("required_experience", []),
             required_qualifications=job_info.get("required_qualifications", []),
-            extracted_keywords=job_info.get("keywords", [])
+            extracted_keywords=job_info.get("keywords", []),
+            skill_vector=build_skill_vector(job_info.get("required_skills", []), job_info.get("keywords", [])),
+            processing_version=JOB_EXTRACTION_VERSION
         )
         
-        # Save to database
-        await jobs_collection.insert_one(job_description.model_dump())
+        # Save to database, unless the extraction used up the deadline
+        check()
+        job_doc = job_description.model_dump()
+        await insert_document("jobs", job_doc)
+        await search_index.index("job", job_doc)
+        job_vector_index.add(job_description.id, job_description.skill_vector, job_description.title)
         
         return {
             "message": "Job description analyzed successfully",
@@ -132,41 +545,39 @@ async def analyze_job_description(request: JobDescriptionRequest):
             "extracted_keywords": job_description.extracted_keywords
         }
         
+    except LLMUnavailableError as e:
+        raise _llm_unavailable(e)
+    except LLMOutputError as e:
+        raise _llm_bad_output(e)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"Error analyzing job description: {e}")
+        logger.exception("Error analyzing job description: %s", e)
         raise HTTPException(status_code=500, detail=f"Error analyzing job description: {str(e)}")
 
 @app.post("/api/match")
-async def match_resume_job(request: MatchRequest):
+async def match_resume_job(request: MatchRequest, http_request: Request):
     """Match a resume with a job description"""
+    return await _run_request(http_request, "match", request, lambda: _match_resume_job(request))
+
+async def _match_resume_job(request: MatchRequest):
     try:
         # Get resume from database
-        resume_doc = await resumes_collection.find_one({"id": request.resume_id})
+        resume_doc = await find_by_id("resumes", request.resume_id)
         if not resume_doc:
             raise HTTPException(status_code=404, detail="Resume not found")
         
         # Get job from database
-        job_doc = await jobs_collection.find_one({"id": request.job_id})
+        job_doc = await find_by_id("jobs", request.job_id)
         if not job_doc:
             raise HTTPException(status_code=404, detail="Job description not found")
         
-        # Prepare data for matching
-        resume_info = {
-            "skills": resume_doc.get("extracted_skills", []),
-            "experience": resume_doc.get("extracted_experience", []),
-            "qualifications": resume_doc.get("extracted_qualifications", []),
-            "keywords": resume_doc.get("extracted_keywords", [])
-        }
-        
-        job_info = {
-            "required_skills": job_doc.get("required_skills", []),
-            "required_experience": job_doc.get("required_experience", []),
-            "required_qualifications": job_doc.get("required_qualifications", []),
-            "keywords": job_doc.get("extracted_keywords", [])
-        }
-        
-        # Calculate match score
-        match_result = await nlp_processor.calculate_match_score(resume_info, job_info)
+        # Calculate match score locally; the narrative is generated on demand
+        check()
+        with stage("scoring"):
+            match_result = compute_local_match(
+                skill_embedder, resume_info_from_doc(resume_doc), job_info_from_doc(job_doc)
+            )
         
         # Create matching result object
         matching_result = MatchingResult(
@@ -178,12 +589,16 @@ async def match_resume_job(request: MatchRequest):
             qualifications_match=match_result.get("qualifications_match", {}),
             matched_keywords=match_result.get("matched_keywords", []),
             missing_skills=match_result.get("missing_skills", []),
+            **await interned_fields("matches", match_result),
             suggestions=match_result.get("suggestions", []),
-            detailed_analysis=match_result.get("detailed_analysis", "")
+            detailed_analysis=match_result.get("detailed_analysis", ""),
+            processing_version=MATCH_SCORING_VERSION
         )
         
         # Save to database
-        await matches_collection.insert_one(matching_result.model_dump())
+        match_doc = matching_result.model_dump()
+        await insert_document("matches", match_doc)
+        await record_match(match_doc)
         
         return {
             "message": "Match analysis completed",
@@ -195,102 +610,333 @@ async def match_resume_job(request: MatchRequest):
             "matched_keywords": matching_result.matched_keywords,
             "missing_skills": matching_result.missing_skills,
             "suggestions": matching_result.suggestions,
-            "detailed_analysis": matching_result.detailed_analysis
+            "detailed_analysis": matching_result.detailed_analysis,
+            "narrative_generated": matching_result.narrative_generated
         }
         
+    except HTTPException:
+        raise
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"Error matching resume and job: {e}")
+        logger.exception("Error matching resume and job: %s", e)
         raise HTTPException(status_code=500, detail=f"Error matching resume and job: {str(e)}")
 
+@app.get("/api/resumes/{resume_id}/top-jobs")
+async def rank_jobs_for_resume(resume_id: str, k: int = 10):
+    """Rank every stored job against a resume and return the top K"""
+    try:
+        resume_doc = await find_by_id(
+            "resumes", resume_id,
+            {"_id": 0, "skill_vector": 1, "extracted_skills": 1, "extracted_keywords": 1}
+        )
+        if not resume_doc:
+            raise HTTPException(status_code=404, detail="Resume not found")
+        rescorer.note_viewed("resumes", resume_id)
+        
+        resume_vector = resume_doc.get("skill_vector")
+        if resume_vector is None:
+            resume_vector = build_skill_vector(
+                resume_doc.get("extracted_skills", []),
+                resume_doc.get("extracted_keywords", [])
+            )
+        
+        ranked = job_vector_index.top_k(resume_vector, max(1, min(k, 1000)))
+        
+        return {
+            "resume_id": resume_id,
+            "total_jobs": len(job_vector_index),
+            "jobs": [
+                {"job_id": job_id, "title": title, "score": round(score * 100, 1)}
+                for job_id, title, score in ranked
+            ]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error ranking jobs: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error ranking jobs: {str(e)}")
+
+async def _list_collection(collection, key: str):
+    cursor = collection.find({}, {VIEW_FIELD: 0})
+    documents = []
+    async for doc in cursor:
+        # Remove MongoDB ObjectId and convert datetime
+        doc.pop('_id', None)
+        if 'created_at' in doc:
+            doc['created_at'] = doc['created_at'].isoformat()
+        documents.append(doc)
+    
+    return {key: documents}, True
+
 @app.get("/api/resumes")
-async def get_resumes():
+async def get_resumes(request: Request):
     """Get all processed resumes"""
     try:
-        cursor = resumes_collection.find({})
-        resumes = []
-        async for doc in cursor:
-            # Remove MongoDB ObjectId and convert datetime
-            doc.pop('_id', None)
-            if 'created_at' in doc:
-                doc['created_at'] = doc['created_at'].isoformat()
-            resumes.append(doc)
-        
-        return {"resumes": resumes}
+        return await cached_json_response(
+            request, "resumes", ["resumes"],
+            lambda: _list_collection(resumes_collection, "resumes")
+        )
     except Exception as e:
-        print(f"Error getting resumes: {e}")
+        logger.exception("Error getting resumes: %s", e)
         raise HTTPException(status_code=500, detail=f"Error getting resumes: {str(e)}")
 
 @app.get("/api/jobs")
-async def get_jobs():
+async def get_jobs(request: Request):
     """Get all analyzed job descriptions"""
     try:
-        cursor = jobs_collection.find({})
-        jobs = []
-        async for doc in cursor:
-            # Remove MongoDB ObjectId and convert datetime
-            doc.pop('_id', None)
-            if 'created_at' in doc:
-                doc['created_at'] = doc['created_at'].isoformat()
-            jobs.append(doc)
-        
-        return {"jobs": jobs}
+        return await cached_json_response(
+            request, "jobs", ["jobs"],
+            lambda: _list_collection(jobs_collection, "jobs")
+        )
     except Exception as e:
-        print(f"Error getting jobs: {e}")
+        logger.exception("Error getting jobs: %s", e)
         raise HTTPException(status_code=500, detail=f"Error getting jobs: {str(e)}")
 
 @app.get("/api/matches")
-async def get_matches():
+async def get_matches(request: Request):
     """Get all matching results"""
     try:
-        cursor = matches_collection.find({})
-        matches = []
-        async for doc in cursor:
-            # Remove MongoDB ObjectId and convert datetime
-            doc.pop('_id', None)
-            if 'created_at' in doc:
-                doc['created_at'] = doc['created_at'].isoformat()
-            matches.append(doc)
-        
-        return {"matches": matches}
+        return await cached_json_response(
+            request, "matches", ["matches"],
+            lambda: _list_collection(matches_collection, "matches")
+        )
     except Exception as e:
-        print(f"Error getting matches: {e}")
+        logger.exception("Error getting matches: %s", e)
         raise HTTPException(status_code=500, detail=f"Error getting matches: {str(e)}")
 
+@app.get("/api/matches/export")
+async def export_matches(
+    format: str = "ndjson",
+    job_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    after: Optional[str] = None,
+    include_details: bool = False
+):
+    """Stream matches as NDJSON or CSV, ordered by (created_at, id).
+    
+    Pass the last export_cursor (or '<created_at>|<id>' from the last CSV row)
+    as `after` to resume an interrupted export.
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Unsupported export format. Supported formats: ['ndjson', 'csv']")
+    
+    try:
+        query = build_export_query(job_id, created_after, created_before, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_matches(query, format, include_details),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=matches.{format}"}
+    )
+
+@app.get("/api/analytics/jobs/{job_id}")
+async def get_job_skill_gaps(job_id: str, top: int = 10):
+    """Get the score distribution and most common skill gaps for a job"""
+    try:
+        summary = await get_job_analytics(job_id, max(1, min(top, 100)))
+        if summary is None:
+            raise HTTPException(status_code=404, detail="No matches recorded for this job")
+        return summary
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error getting job analytics: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error getting job analytics: {str(e)}")
+
+@app.post("/api/analytics/rebuild")
+async def rebuild_analytics(job_id: Optional[str] = None):
+    """Recompute the materialized job summaries from stored matches"""
+    try:
+        await rebuild_job_analytics(job_id)
+        return {"message": "Analytics rebuilt", "job_id": job_id}
+    except Exception as e:
+        logger.exception("Error rebuilding analytics: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error rebuilding analytics: {str(e)}")
+
+@app.get("/api/rescore/status")
+async def get_rescore_status():
+    """Get progress of the stale-document rescoring pipeline"""
+    try:
+        status = rescorer.status()
+        if not status["stale"]:
+            status["stale"] = await rescorer.count_stale()
+        return status
+    except Exception as e:
+        logger.exception("Error getting rescore status: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error getting rescore status: {str(e)}")
+
+@app.post("/api/rescore/run", status_code=202)
+async def run_rescore():
+    """Start one rescoring batch in the background"""
+    if not rescorer.request_run():
+        return {"message": "Rescoring already running"}
+    return {"message": "Rescoring started"}
+
+@app.post("/api/screening-runs", status_code=202)
+async def start_screening_run(request: ScreeningRunRequest):
+    """Score every matching resume against every matching job in the background"""
+    try:
+        run = await screening_runner.start(request)
+        run.pop("_id", None)
+        return run
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error starting screening run: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error starting screening run: {str(e)}")
+
+@app.get("/api/screening-runs")
+async def list_screening_runs(limit: int = 20):
+    """Recent screening runs with their progress"""
+    try:
+        return {"runs": await screening_runner.list_runs(min(max(limit, 1), 100))}
+    except Exception as e:
+        logger.exception("Error fetching screening runs: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error fetching screening runs: {str(e)}")
+
+@app.get("/api/screening-runs/{run_id}")
+async def get_screening_run(run_id: str):
+    """Status and progress of a screening run"""
+    run = await screening_runner.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Screening run not found")
+    return run
+
+@app.get("/api/screening-runs/{run_id}/jobs/{job_id}/shortlist")
+async def get_screening_shortlist(run_id: str, job_id: str, limit: int = 50):
+    """A job's ranked shortlist, available as soon as the job has been screened"""
+    try:
+        run = await screening_runner.get_run(run_id)
+        if run is None:
+            raise HTTPException(status_code=404, detail="Screening run not found")
+        shortlist = await screening_runner.shortlist(run_id, job_id, min(max(limit, 1), 1000))
+        return {"run_id": run_id, "job_id": job_id, "status": run["status"], "shortlist": shortlist}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error fetching screening shortlist: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error fetching screening shortlist: {str(e)}")
+
+@app.post("/api/screening-runs/{run_id}/cancel")
+async def cancel_screening_run(run_id: str):
+    """Cancel a queued or running screening run"""
+    if not screening_runner.cancel(run_id):
+        raise HTTPException(status_code=404, detail="No queued or running screening run with this id")
+    return {"message": "Screening run cancelled"}
+
+@app.get("/api/search")
+async def search(q: str, type: Optional[str] = None, page: int = 1, page_size: int = 20):
+    """Full-text search over stored resumes and job descriptions"""
+    try:
+        return await search_index.search(q, type, page, page_size)
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error searching: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error searching: {str(e)}")
+
+@app.post("/api/admin/profile")
+async def start_profile(http_request: Request, seconds: float = 30):
+    """Sample every thread's stack for a number of seconds (admin only)"""
+    require_admin(http_request)
+    profile = profiler.profile_for(seconds)
+    return {"message": "Profiling started", "profile": profile}
+
+@app.get("/api/admin/profiles")
+async def list_profiles(http_request: Request):
+    """Finished profiles, newest first (admin only)"""
+    require_admin(http_request)
+    return {"profiles": profiler.list_profiles()}
+
+@app.get("/api/admin/profiles/{name}")
+async def get_profile(name: str, http_request: Request):
+    """A profile as folded stacks, for flamegraph.pl or speedscope (admin only)"""
+    require_admin(http_request)
+    path = profiler.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=os.path.basename(path))
+
+@app.get("/api/admin/slow-requests")
+async def get_slow_requests(http_request: Request, limit: Optional[int] = None):
+    """Recent requests over the slow threshold with their per-stage timings (admin only)"""
+    require_admin(http_request)
+    return {"requests": slow_requests.entries(limit)}
+
+async def _match_details(match_id: str, narrative: bool):
+    match_doc = await find_by_id("matches", match_id)
+    if not match_doc:
+        raise HTTPException(status_code=404, detail="Match not found")
+    rescorer.note_viewed("resumes", match_doc["resume_id"])
+    rescorer.note_viewed("jobs", match_doc["job_id"])
+    
+    # Get resume and job details
+    resume_doc = await find_by_id("resumes", match_doc["resume_id"])
+    job_doc = await find_by_id("jobs", match_doc["job_id"])
+    
+    # Generate suggestions and analysis once, then cache them on the match
+    if narrative and not match_doc.get("narrative_generated") and resume_doc and job_doc:
+        generated = await nlp_processor.generate_match_narrative(
+            resume_info_from_doc(resume_doc), job_info_from_doc(job_doc), match_doc
+        )
+        if generated.pop("fallback", False):
+            # LLM unavailable: show the local narrative without caching it
+            match_doc.update(generated)
+        else:
+            generated["narrative_generated"] = True
+            # The match may still be in the write-behind buffer
+            await flush_writes("matches")
+            await matches_collection.update_one({"id": match_id}, {"$set": generated})
+            await bump_version("matches")
+            match_doc.update(generated)
+    
+    # Remove MongoDB ObjectId and convert datetime
+    match_doc.pop('_id', None)
+    match_doc.pop(VIEW_FIELD, None)
+    if 'created_at' in match_doc:
+        match_doc['created_at'] = match_doc['created_at'].isoformat()
+    
+    if resume_doc:
+        resume_doc.pop('_id', None)
+        resume_doc.pop(VIEW_FIELD, None)
+        if 'created_at' in resume_doc:
+            resume_doc['created_at'] = resume_doc['created_at'].isoformat()
+    
+    if job_doc:
+        job_doc.pop('_id', None)
+        job_doc.pop(VIEW_FIELD, None)
+        if 'created_at' in job_doc:
+            job_doc['created_at'] = job_doc['created_at'].isoformat()
+    
+    payload = {
+        "match": match_doc,
+        "resume": resume_doc,
+        "job": job_doc
+    }
+    # Don't cache a response that still lacks a requested narrative
+    return payload, not narrative or bool(match_doc.get("narrative_generated"))
+
 @app.get("/api/match/{match_id}")
-async def get_match_details(match_id: str):
-    """Get detailed match information"""
+async def get_match_details(request: Request, match_id: str, narrative: bool = False):
+    """Get detailed match information, generating the narrative if requested"""
     try:
-        match_doc = await matches_collection.find_one({"id": match_id})
-        if not match_doc:
-            raise HTTPException(status_code=404, detail="Match not found")
-        
-        # Get resume and job details
-        resume_doc = await resumes_collection.find_one({"id": match_doc["resume_id"]})
-        job_doc = await jobs_collection.find_one({"id": match_doc["job_id"]})
-        
-        # Remove MongoDB ObjectId and convert datetime
-        match_doc.pop('_id', None)
-        if 'created_at' in match_doc:
-            match_doc['created_at'] = match_doc['created_at'].isoformat()
-        
-        if resume_doc:
-            resume_doc.pop('_id', None)
-            if 'created_at' in resume_doc:
-                resume_doc['created_at'] = resume_doc['created_at'].isoformat()
-        
-        if job_doc:
-            job_doc.pop('_id', None)
-            if 'created_at' in job_doc:
-                job_doc['created_at'] = job_doc['created_at'].isoformat()
-        
-        return {
-            "match": match_doc,
-            "resume": resume_doc,
-            "job": job_doc
-        }
+        rescorer.note_viewed("matches", match_id)
+        return await cached_json_response(
+            request, f"match:{match_id}:{int(narrative)}", ["matches", "resumes", "jobs"],
+            lambda: _match_details(match_id, narrative)
+        )
+    except HTTPException:
+        raise
+    except LLMOutputError as e:
+        raise _llm_bad_output(e)
     except Exception as e:
-        print(f"Error getting match details: {e}")
+        logger.exception("Error getting match details: %s", e)
         raise HTTPException(status_code=500, detail=f"Error getting match details: {str(e)}")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8001, log_config=None)
\ No newline at end of file
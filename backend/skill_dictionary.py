@@ -0,0 +1,130 @@
+import sys
+import asyncio
+from typing import Dict, List, Optional, Sequence
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from write_behind import DUPLICATE_KEY_ERROR
+from database import database, resumes_collection, jobs_collection, matches_collection, bump_version
+
+# Global canonical skill -> small integer id mapping
+skills_dictionary_collection = database.skills_dictionary
+counters_collection = database.counters
+
+# Fields interned as id arrays, aligned with the string list they mirror.
+# The string lists are still stored: the analytics pipelines, search index,
+# export and API responses read them. They can be dropped once those
+# resolve names from the ids.
+INTERNED_FIELDS = {
+    "resumes": [("extracted_skills", "extracted_skill_ids")],
+    "jobs": [("required_skills", "required_skill_ids")],
+    "matches": [("missing_skills", "missing_skill_ids"), ("matched_keywords", "matched_keyword_ids")],
+}
+
+class SkillDictionary:
+    """Interns canonical skill names as integer ids, cached in process.
+
+    Ids are allocated from a Mongo counter and never reused, so they are
+    stable across processes and restarts.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._skills: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _remember(self, skill: str, skill_id: int):
+        self._ids[skill] = skill_id
+        self._skills[skill_id] = skill
+
+    async def load(self):
+        """Load the whole dictionary into the cache"""
+        async for doc in skills_dictionary_collection.find({}):
+            self._remember(doc["skill"], doc["_id"])
+
+    async def _allocate(self, skills: List[str]):
+        # One counter increment and one insert for the whole batch
+        counter = await counters_collection.find_one_and_update(
+            {"_id": "skills_dictionary"},
+            {"$inc": {"seq": len(skills)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        first_id = counter["seq"] - len(skills) + 1
+        docs = [{"_id": first_id + offset, "skill": skill} for offset, skill in enumerate(skills)]
+        taken: List[str] = []
+        try:
+            await skills_dictionary_collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors) or e.details.get("writeConcernErrors"):
+                raise
+            # Another request or process interned these first; its ids win and ours go unused
+            taken = [skills[error["index"]] for error in errors]
+        for doc in docs:
+            if doc["skill"] not in taken:
+                self._remember(doc["skill"], doc["_id"])
+        if taken:
+            async for doc in skills_dictionary_collection.find({"skill": {"$in": taken}}):
+                self._remember(doc["skill"], doc["_id"])
+
+    async def intern(self, skills: Sequence[str]) -> List[int]:
+        """Ids for canonical skill names, in the same order, allocating new ones as needed.
+
+        Concurrent calls don't wait for each other: the cache is only updated
+        between awaits, and a skill interned twice at once keeps whichever
+        id was inserted first.
+        """
+        missing = [skill for skill in dict.fromkeys(skills) if skill not in self._ids]
+        if missing:
+            async for doc in skills_dictionary_collection.find({"skill": {"$in": missing}}):
+                self._remember(doc["skill"], doc["_id"])
+            missing = [skill for skill in missing if skill not in self._ids]
+            if missing:
+                await self._allocate(missing)
+        return [self._ids[skill] for skill in skills]
+
+    def lookup(self, skill_ids: Sequence[int]) -> List[Optional[str]]:
+        """Skill names for ids (None for ids not in the cache)"""
+        return [self._skills.get(skill_id) for skill_id in skill_ids]
+
+async def interned_fields(collection_name: str, doc: Dict) -> Dict[str, List[int]]:
+    """The id arrays for a document's interned string fields"""
+    return {
+        ids_field: await skill_dictionary.intern(doc.get(field, []))
+        for field, ids_field in INTERNED_FIELDS[collection_name]
+    }
+
+async def backfill(batch_size: int = 500) -> Dict[str, int]:
+    """Add id arrays to documents stored before skills were interned"""
+    await skill_dictionary.load()
+    collections = {"resumes": resumes_collection, "jobs": jobs_collection, "matches": matches_collection}
+    updated = {}
+    for name, collection in collections.items():
+        pairs = INTERNED_FIELDS[name]
+        # Matches missing and null arrays alike
+        query = {"$or": [{ids_field: None} for _, ids_field in pairs]}
+        projection = {"id": 1, **{field: 1 for field, _ in pairs}}
+        updated[name] = 0
+        operations = []
+        async for doc in collection.find(query, projection):
+            operations.append(UpdateOne({"id": doc["id"]}, {"$set": await interned_fields(name, doc)}))
+            if len(operations) >= batch_size:
+                await collection.bulk_write(operations, ordered=False)
+                updated[name] += len(operations)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            updated[name] += len(operations)
+        if updated[name]:
+            await bump_version(name)
+    return updated
+
+skill_dictionary = SkillDictionary()
+
+if __name__ == "__main__":
+    # python skill_dictionary.py --backfill : intern skills of existing documents
+    if "--backfill" in sys.argv:
+        print(asyncio.run(backfill()))
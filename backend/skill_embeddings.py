@@ -0,0 +1,225 @@
+import os
+import logging
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from skill_vectors import normalize_term
+
+logger = logging.getLogger(__name__)
+
+# Width of the character n-gram space used for skill phrase embeddings
+EMBEDDING_DIM = int(os.getenv("SKILL_EMBEDDING_DIM", "256"))
+NGRAM_SIZE = 3
+
+# Cosine similarity at or above which two skill phrases count as equivalent
+SIMILARITY_THRESHOLD = float(os.getenv("SKILL_SIMILARITY_THRESHOLD", "0.8"))
+
+# On-disk cache of vectors for the canonical skills of the alias table
+EMBEDDING_CACHE_PATH = os.getenv(
+    "SKILL_EMBEDDING_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "skill_embeddings.npz")
+)
+# Bumped when the cache contents change meaning; older files are ignored and rebuilt
+EMBEDDING_CACHE_FORMAT = 3
+
+# Other phrases (extracted skills, keywords, experience and qualification
+# lines) are kept in an in-memory LRU of this many vectors and never written
+# to disk
+EMBEDDING_LRU_SIZE = int(os.getenv("SKILL_EMBEDDING_LRU_SIZE", "20000"))
+
+# Curated aliases: normalized variant -> canonical skill name
+SKILL_ALIASES: Dict[str, str] = {
+    "js": "javascript",
+    "java script": "javascript",
+    "ecmascript": "javascript",
+    "es6": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "python3": "python",
+    "python 3": "python",
+    "golang": "go",
+    "c sharp": "c#",
+    "csharp": "c#",
+    "cpp": "c++",
+    "node": "node.js",
+    "nodejs": "node.js",
+    "node js": "node.js",
+    "reactjs": "react",
+    "react.js": "react",
+    "react js": "react",
+    "vuejs": "vue.js",
+    "vue": "vue.js",
+    "angularjs": "angular",
+    "nextjs": "next.js",
+    "expressjs": "express",
+    "express.js": "express",
+    "postgres": "postgresql",
+    "psql": "postgresql",
+    "mongo": "mongodb",
+    "mssql": "sql server",
+    "ms sql server": "sql server",
+    "microsoft sql server": "sql server",
+    "k8s": "kubernetes",
+    "kube": "kubernetes",
+    "amazon web services": "aws",
+    "google cloud": "google cloud platform",
+    "gcp": "google cloud platform",
+    "azure cloud": "microsoft azure",
+    "azure": "microsoft azure",
+    "ci/cd": "ci/cd",
+    "cicd": "ci/cd",
+    "ci cd": "ci/cd",
+    "continuous integration": "ci/cd",
+    "ml": "machine learning",
+    "dl": "deep learning",
+    "ai": "artificial intelligence",
+    "nlp": "natural language processing",
+    "sklearn": "scikit-learn",
+    "scikit learn": "scikit-learn",
+    "tf": "tensorflow",
+    "restful api": "rest api",
+    "restful apis": "rest api",
+    "rest apis": "rest api",
+    "rest": "rest api",
+    "oop": "object-oriented programming",
+    "object oriented programming": "object-oriented programming",
+    "tdd": "test-driven development",
+    "test driven development": "test-driven development",
+    "ux": "user experience",
+    "ui": "user interface",
+    "html5": "html",
+    "css3": "css",
+}
+
+# The fixed vocabulary whose vectors are persisted
+_CANONICAL_SKILLS = frozenset(SKILL_ALIASES.values())
+
+def _ngrams(phrase: str) -> List[str]:
+    padded = f"#{phrase}#"
+    if len(padded) <= NGRAM_SIZE:
+        return [padded]
+    return [padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)]
+
+class SkillEmbedder:
+    """Local, network-free skill canonicalization and fuzzy matching.
+
+    Skills are first mapped through the alias table, then embedded as hashed
+    character n-gram vectors so near-spellings ("postgre sql", "PostgreSQL")
+    land close together. Vectors for the alias table's canonical skills are
+    cached on disk; every other phrase, including free-form skills the LLM
+    extracted, only in a bounded in-memory LRU.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+                 lru_size: int = EMBEDDING_LRU_SIZE):
+        self.dim = dim
+        self.cache_path = cache_path
+        self.lru_size = lru_size
+        self._cache: Dict[str, np.ndarray] = {}
+        self._recent: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._dirty = False
+        self._load_cache()
+        for skill in sorted(_CANONICAL_SKILLS - self._cache.keys()):
+            self._cache[skill] = self._embed(skill)
+            self._dirty = True
+
+    def canonicalize(self, skill: str) -> str:
+        """Map a raw skill phrase to its canonical name"""
+        term = normalize_term(skill)
+        return SKILL_ALIASES.get(term, term)
+
+    def canonicalize_many(self, skills: List[str]) -> List[str]:
+        """Canonicalize a list of skills, dropping empties and duplicates but keeping order"""
+        seen = set()
+        canonical = []
+        for skill in skills or []:
+            term = self.canonicalize(skill)
+            if term and term not in seen:
+                seen.add(term)
+                canonical.append(term)
+        return canonical
+
+    def _embed(self, phrase: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for gram in _ngrams(phrase):
+            vector[zlib.crc32(gram.encode("utf-8")) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, skills: List[str]) -> np.ndarray:
+        """Return an (n, dim) matrix of unit vectors for canonicalized skills"""
+        matrix = np.zeros((len(skills), self.dim), dtype=np.float32)
+        for row, skill in enumerate(skills):
+            phrase = self.canonicalize(skill)
+            vector = self._cache.get(phrase)
+            if vector is None:
+                vector = self._recent.get(phrase)
+                if vector is None:
+                    vector = self._embed(phrase)
+                    self._recent[phrase] = vector
+                    if len(self._recent) > self.lru_size:
+                        self._recent.popitem(last=False)
+                else:
+                    self._recent.move_to_end(phrase)
+            matrix[row] = vector
+        return matrix
+
+    def similarity(self, left: List[str], right: List[str]) -> np.ndarray:
+        """Cosine similarity matrix between two skill lists, computed in one batch"""
+        if not left or not right:
+            return np.zeros((len(left or []), len(right or [])), dtype=np.float32)
+        return self.embed_many(left) @ self.embed_many(right).T
+
+    def match(self, candidate_skills: List[str], required_skills: List[str],
+              threshold: float = SIMILARITY_THRESHOLD) -> List[Tuple[str, Optional[str], float]]:
+        """For each required skill, find the closest candidate skill.
+
+        Returns (required, matched candidate or None, similarity) per required skill.
+        """
+        if not required_skills:
+            return []
+        if not candidate_skills:
+            return [(required, None, 0.0) for required in required_skills]
+
+        scores = self.similarity(required_skills, candidate_skills)
+        best = scores.argmax(axis=1)
+        results = []
+        for row, required in enumerate(required_skills):
+            score = float(scores[row, best[row]])
+            matched = candidate_skills[best[row]] if score >= threshold else None
+            results.append((required, matched, score))
+        return results
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if "format" not in data or int(data["format"]) != EMBEDDING_CACHE_FORMAT:
+                    return
+                if data["vectors"].shape[1] != self.dim:
+                    return
+                self._cache = {
+                    skill: vector for skill, vector in zip(data["skills"].tolist(), data["vectors"])
+                    if skill in _CANONICAL_SKILLS
+                }
+        except Exception as e:
+            logger.error("Error loading skill embedding cache: %s", e)
+
+    def save(self):
+        """Persist the canonical skill vectors to disk if any were added"""
+        if not self.cache_path or not self._dirty or not self._cache:
+            return
+        try:
+            skills = list(self._cache.keys())
+            tmp_path = f"{self.cache_path}.tmp.npz"
+            np.savez(
+                tmp_path, format=np.array(EMBEDDING_CACHE_FORMAT), skills=np.array(skills),
+                vectors=np.stack([self._cache[s] for s in skills])
+            )
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+        except Exception as e:
+            logger.error("Error saving skill embedding cache: %s", e)
@@ -0,0 +1,148 @@
+import os
+import re
+import hashlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# Width of the hashed skill/keyword space
+SKILL_VECTOR_DIM = int(os.getenv("SKILL_VECTOR_DIM", "512"))
+
+# Relative weights of the features that make up a vector
+SKILL_WEIGHT = 1.0
+KEYWORD_WEIGHT = 0.5
+TOKEN_WEIGHT = 0.25
+
+def normalize_term(term: str) -> str:
+    """Lowercase a skill/keyword and collapse whitespace and surrounding punctuation"""
+    term = re.sub(r"\s+", " ", str(term).lower()).strip()
+    return term.strip(" .,;:!?()[]{}\"'")
+
+def _bucket(feature: str, dim: int) -> int:
+    # blake2b rather than hash() so buckets are stable across processes
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % dim
+
+def build_skill_vector(skills: List[str], keywords: List[str], dim: int = SKILL_VECTOR_DIM) -> Dict[str, float]:
+    """Build an L2-normalized sparse hashed vector, stored as {bucket: weight}"""
+    weights: Dict[int, float] = {}
+
+    def add(feature: str, weight: float):
+        bucket = _bucket(feature, dim)
+        weights[bucket] = max(weights.get(bucket, 0.0), weight)
+
+    for terms, weight in ((skills, SKILL_WEIGHT), (keywords, KEYWORD_WEIGHT)):
+        for term in terms or []:
+            term = normalize_term(term)
+            if not term:
+                continue
+            add(term, weight)
+            # Individual words let "python programming" meet "python"
+            tokens = term.split(" ")
+            if len(tokens) > 1:
+                for token in tokens:
+                    add(token, weight * TOKEN_WEIGHT)
+
+    norm = sum(value * value for value in weights.values()) ** 0.5
+    if norm == 0:
+        return {}
+    return {str(bucket): value / norm for bucket, value in weights.items()}
+
+def to_dense(sparse: Dict[str, float], dim: int = SKILL_VECTOR_DIM) -> np.ndarray:
+    """Expand a stored sparse vector into a dense float32 row"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for bucket, value in (sparse or {}).items():
+        vector[int(bucket)] = value
+    return vector
+
+class JobVectorIndex:
+    """In-memory inverted index of job skill vectors for single-pass top-K ranking.
+
+    Vectors are sparse (a few dozen hashed buckets out of dim), so each
+    bucket keeps a posting list of (job position, weight). A ranking pass
+    only reads the postings of the query's non-zero buckets, and memory
+    grows with the non-zero entries rather than with jobs x dim.
+    """
+
+    def __init__(self, dim: int = SKILL_VECTOR_DIM):
+        self.dim = dim
+        # Per bucket: job positions and weights, filled up to _sizes[bucket]
+        self._rows = [np.zeros(0, dtype=np.int32) for _ in range(dim)]
+        self._weights = [np.zeros(0, dtype=np.float32) for _ in range(dim)]
+        self._sizes = [0] * dim
+        # Per job: the buckets it has postings in, for replacing its vector
+        self._buckets: List[np.ndarray] = []
+        self._job_ids: List[str] = []
+        self._titles: List[str] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._job_ids)
+
+    def _append(self, bucket: int, position: int, weight: float):
+        size = self._sizes[bucket]
+        if size == self._rows[bucket].size:
+            # Grow geometrically so appends stay amortized O(1)
+            capacity = max(16, size * 2)
+            self._rows[bucket] = np.resize(self._rows[bucket], capacity)
+            self._weights[bucket] = np.resize(self._weights[bucket], capacity)
+        self._rows[bucket][size] = position
+        self._weights[bucket][size] = weight
+        self._sizes[bucket] = size + 1
+
+    def _remove(self, bucket: int, position: int):
+        size = self._sizes[bucket]
+        rows, weights = self._rows[bucket], self._weights[bucket]
+        for index in np.flatnonzero(rows[:size] == position)[::-1]:
+            # Postings are unordered, so the last one fills the gap
+            size -= 1
+            rows[index], weights[index] = rows[size], weights[size]
+        self._sizes[bucket] = size
+
+    def add(self, job_id: str, sparse: Dict[str, float], title: str = ""):
+        """Insert or replace the vector for a job"""
+        position = self._positions.get(job_id)
+        if position is None:
+            position = len(self._job_ids)
+            self._positions[job_id] = position
+            self._job_ids.append(job_id)
+            self._titles.append(title)
+            self._buckets.append(np.zeros(0, dtype=np.int32))
+        else:
+            self._titles[position] = title
+            for bucket in self._buckets[position]:
+                self._remove(int(bucket), position)
+        buckets = []
+        for bucket, weight in (sparse or {}).items():
+            if weight:
+                self._append(int(bucket), position, weight)
+                buckets.append(int(bucket))
+        self._buckets[position] = np.array(buckets, dtype=np.int32)
+
+    def top_k(self, sparse: Dict[str, float], k: int = 10) -> List[Tuple[str, str, float]]:
+        """Score a vector against every job and return (job_id, title, score) for the best k"""
+        count = len(self._job_ids)
+        if count == 0 or k <= 0 or not sparse:
+            return []
+
+        scores = np.zeros(count, dtype=np.float32)
+        for bucket, weight in sparse.items():
+            bucket = int(bucket)
+            size = self._sizes[bucket]
+            # Positions are unique within a bucket, so fancy-index += is safe
+            scores[self._rows[bucket][:size]] += np.float32(weight) * self._weights[bucket][:size]
+        if k < count:
+            candidates = np.argpartition(-scores, k)[:k]
+        else:
+            candidates = np.arange(count)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        return [(self._job_ids[i], self._titles[i], float(scores[i])) for i in ranked]
+
+    async def load(self, collection):
+        """Load every stored job vector, computing it for documents that predate vectors"""
+        projection = {"_id": 0, "id": 1, "title": 1, "skill_vector": 1, "required_skills": 1, "extracted_keywords": 1}
+        async for doc in collection.find({}, projection):
+            sparse: Optional[Dict[str, float]] = doc.get("skill_vector")
+            if sparse is None:
+                sparse = build_skill_vector(doc.get("required_skills", []), doc.get("extracted_keywords", []), self.dim)
+            self.add(doc["id"], sparse, doc.get("title", ""))
@@ -0,0 +1,141 @@
+import os
+import logging
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pymongo.errors import BulkWriteError
+
+from metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+# Buffer inserts and write them with insert_many instead of one insert_one per request
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", "50"))
+# Callers wait for a flush instead of buffering past this many documents per collection
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "5000"))
+# Attempts at the final flush on shutdown before giving up
+WRITE_BEHIND_SHUTDOWN_ATTEMPTS = 5
+
+DUPLICATE_KEY_ERROR = 11000
+
+flush_latency = histogram("write_behind_flush_seconds", "Time to write one buffered batch", [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5])
+batch_sizes = histogram("write_behind_batch_size", "Documents per buffered insert_many", [1, 5, 10, 25, 50, 100, 250, 500, 1000])
+pending_documents = gauge("write_behind_pending_documents", "Documents buffered and not yet written")
+flush_errors = counter("write_behind_flush_errors_total", "Failed write-behind flushes; the documents are retried")
+
+FlushBatch = Callable[[str, List[Dict[str, Any]]], Awaitable[None]]
+
+class WriteBehindBuffer:
+    """Per-collection insert buffer flushed by size or time.
+
+    Buffered documents stay readable by id until they are written, so a
+    client can use a returned id straight away.
+    """
+
+    def __init__(self, flush_batch: FlushBatch, max_batch: int = WRITE_BEHIND_MAX_BATCH,
+                 interval_ms: int = WRITE_BEHIND_FLUSH_INTERVAL_MS):
+        self._flush_batch = flush_batch
+        self.max_batch = max_batch
+        self.interval = interval_ms / 1000
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_id: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, collection_name: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """A buffered (not yet written) document, if there is one"""
+        return self._by_id.get(collection_name, {}).get(doc_id)
+
+    async def add(self, collection_name: str, document: Dict[str, Any]):
+        pending = self._pending.setdefault(collection_name, [])
+        if len(pending) >= WRITE_BEHIND_MAX_PENDING:
+            # Writes are falling behind; push back on the caller
+            await self.flush(collection_name)
+            pending = self._pending.setdefault(collection_name, [])
+        pending.append(document)
+        self._by_id.setdefault(collection_name, {})[document["id"]] = document
+        pending_documents.set(len(pending), collection=collection_name)
+        if len(pending) >= self.max_batch:
+            self._wake.set()
+
+    async def flush(self, collection_name: Optional[str] = None):
+        """Write everything buffered (for one collection, or all of them)"""
+        async with self._lock:
+            names = [collection_name] if collection_name else list(self._pending)
+            for name in names:
+                while self._pending.get(name):
+                    batch = self._pending[name][:self.max_batch]
+                    self._pending[name] = self._pending[name][self.max_batch:]
+                    try:
+                        failed = await self._write(name, batch)
+                    except asyncio.CancelledError:
+                        self._pending[name] = batch + self._pending[name]
+                        raise
+                    if failed:
+                        # Retried on the next flush, ahead of newer documents
+                        self._pending[name] = failed + self._pending[name]
+                        break
+                pending_documents.set(len(self._pending.get(name, [])), collection=name)
+
+    async def _write(self, collection_name: str, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert a batch; returns the documents that still need writing"""
+        started = time.monotonic()
+        try:
+            await self._flush_batch(collection_name, batch)
+            failed = []
+        except BulkWriteError as e:
+            # Duplicates are documents written by an earlier attempt
+            failed_indexes = {error["index"] for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY_ERROR}
+            failed = [doc for i, doc in enumerate(batch) if i in failed_indexes]
+            if failed or e.details.get("writeConcernErrors"):
+                logger.error("Write-behind flush to %s failed for %d documents: %s", collection_name, len(failed), e)
+                flush_errors.inc(collection=collection_name)
+        except Exception as e:
+            logger.error("Write-behind flush to %s failed: %s", collection_name, e)
+            flush_errors.inc(collection=collection_name)
+            return batch
+
+        flush_latency.observe(time.monotonic() - started, collection=collection_name)
+        batch_sizes.observe(len(batch), collection=collection_name)
+        by_id = self._by_id.get(collection_name, {})
+        failed_ids = {doc["id"] for doc in failed}
+        for doc in batch:
+            if doc["id"] not in failed_ids:
+                by_id.pop(doc["id"], None)
+        return failed
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        """Stop the flusher and write everything still buffered"""
+        if self._task is not None:
+            # Not while a flush is in progress; its batch is out of the buffer
+            async with self._lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for attempt in range(WRITE_BEHIND_SHUTDOWN_ATTEMPTS):
+            await self.flush()
+            if not any(self._pending.values()):
+                return
+            await asyncio.sleep(0.5 * (attempt + 1))
+        lost = {name: len(docs) for name, docs in self._pending.items() if docs}
+        raise RuntimeError(f"Write-behind buffer could not be flushed on shutdown: {lost}")
@@ -8,7 +8,10 @@ import asyncio
 import aiohttp
 import json
 import base64
+import io
 import os
+import uuid
+import zipfile
 from typing import Dict, Any, Optional
 import sys
 
@@ -366,6 +369,355 @@ class BackendTester:
             self.log_test("Get Match Details", False, f"Exception: {str(e)}")
             return False
     
+    async def test_conditional_get(self):
+        """Test ETag revalidation: 304 while unchanged, a new ETag after a write"""
+        if not self.resume_id or not self.job_id:
+            self.log_test("Conditional GET", False, "Missing resume_id or job_id from previous tests")
+            return False
+        
+        try:
+            async with self.session.get(f"{self.base_url}/api/matches") as response:
+                etag = response.headers.get("ETag")
+                if response.status != 200 or not etag:
+                    self.log_test("Conditional GET", False, f"HTTP {response.status}, ETag: {etag}")
+                    return False
+            
+            async with self.session.get(f"{self.base_url}/api/matches", headers={"If-None-Match": etag}) as response:
+                if response.status != 304:
+                    self.log_test("Conditional GET", False, f"Unchanged list returned HTTP {response.status}, expected 304")
+                    return False
+            
+            # A new match bumps the matches version
+            payload = {"resume_id": self.resume_id, "job_id": self.job_id}
+            async with self.session.post(f"{self.base_url}/api/match", json=payload) as response:
+                if response.status != 200:
+                    self.log_test("Conditional GET", False, f"Match HTTP {response.status}: {await response.text()}")
+                    return False
+                new_match_id = (await response.json())["match_id"]
+            await asyncio.sleep(0.5)  # Let a write-behind buffer flush, if enabled
+            
+            async with self.session.get(f"{self.base_url}/api/matches", headers={"If-None-Match": etag}) as response:
+                new_etag = response.headers.get("ETag")
+                if response.status != 200 or new_etag == etag:
+                    self.log_test("Conditional GET", False, f"Changed list returned HTTP {response.status}, ETag {new_etag}")
+                    return False
+                match_ids = [match["id"] for match in (await response.json())["matches"]]
+                if new_match_id not in match_ids:
+                    self.log_test("Conditional GET", False, "Changed list does not include the new match")
+                    return False
+            
+            self.log_test("Conditional GET", True, f"304 while unchanged, ETag {etag} -> {new_etag} after a match")
+            return True
+        except Exception as e:
+            self.log_test("Conditional GET", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_export_resume(self):
+        """Test resuming a match export from an export_cursor"""
+        try:
+            async with self.session.get(f"{self.base_url}/api/matches/export", params={"format": "ndjson"}) as response:
+                if response.status != 200:
+                    self.log_test("Export Resume", False, f"HTTP {response.status}: {await response.text()}")
+                    return False
+                records = [json.loads(line) for line in (await response.text()).splitlines() if line]
+            
+            if any("error" in record for record in records):
+                self.log_test("Export Resume", False, f"Export ended with an error marker: {records[-1]}")
+                return False
+            if len(records) < 2:
+                self.log_test("Export Resume", False, f"Need at least 2 matches to test resuming, got {len(records)}")
+                return False
+            
+            # Resuming after the first record must return exactly the rest, in order
+            params = {"format": "ndjson", "after": records[0]["export_cursor"]}
+            async with self.session.get(f"{self.base_url}/api/matches/export", params=params) as response:
+                resumed = [json.loads(line) for line in (await response.text()).splitlines() if line]
+            
+            expected_ids = [record["id"] for record in records[1:]]
+            resumed_ids = [record["id"] for record in resumed]
+            if resumed_ids == expected_ids:
+                self.log_test("Export Resume", True, f"Resumed after 1 of {len(records)} records, got the other {len(resumed)}")
+                return True
+            else:
+                self.log_test("Export Resume", False, f"Expected {expected_ids}, got {resumed_ids}")
+                return False
+        except Exception as e:
+            self.log_test("Export Resume", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_analytics_rebuild(self):
+        """Test that incrementally maintained job analytics equal a full rebuild"""
+        if not self.job_id:
+            self.log_test("Analytics Rebuild", False, "Missing job_id from previous tests")
+            return False
+        
+        try:
+            url = f"{self.base_url}/api/analytics/jobs/{self.job_id}?top=100"
+            fields = ("match_count", "average_score", "score_histogram", "top_missing_skills", "top_matched_keywords")
+            
+            def comparable(summary):
+                # Skills with equal counts may come back in either order
+                return {
+                    field: sorted((item["skill"], item["count"]) for item in value) if field.startswith("top_") else value
+                    for field, value in summary.items() if field in fields
+                }
+            
+            async with self.session.get(url) as response:
+                if response.status != 200:
+                    self.log_test("Analytics Rebuild", False, f"HTTP {response.status}: {await response.text()}")
+                    return False
+                incremental = await response.json()
+            
+            async with self.session.post(f"{self.base_url}/api/analytics/rebuild", params={"job_id": self.job_id}) as response:
+                if response.status != 200:
+                    self.log_test("Analytics Rebuild", False, f"Rebuild HTTP {response.status}: {await response.text()}")
+                    return False
+            
+            async with self.session.get(url) as response:
+                rebuilt = await response.json()
+            
+            incremental_fields, rebuilt_fields = comparable(incremental), comparable(rebuilt)
+            differences = [field for field in fields if incremental_fields.get(field) != rebuilt_fields.get(field)]
+            if differences:
+                self.log_test("Analytics Rebuild", False, 
+                            f"Incremental and rebuilt analytics differ in {differences}: {incremental} vs {rebuilt}")
+                return False
+            self.log_test("Analytics Rebuild", True, 
+                        f"{incremental['match_count']} matches, average {incremental['average_score']}% before and after rebuild")
+            return True
+        except Exception as e:
+            self.log_test("Analytics Rebuild", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_update_resume_sections(self):
+        """Test that a resume update re-extracts only the sections that changed"""
+        if not self.resume_id:
+            self.log_test("Resume Section Update", False, "Missing resume_id from previous tests")
+            return False
+        
+        def payload(text):
+            return {
+                "file_content": base64.b64encode(text.encode('utf-8')).decode('utf-8'),
+                "filename": "sarah_johnson_resume.txt",
+                "file_type": "txt"
+            }
+        
+        try:
+            url = f"{self.base_url}/api/resumes/{self.resume_id}"
+            resume_text = self.create_sample_resume_text()
+            
+            # Same text as uploaded: nothing to re-extract
+            async with self.session.put(url, json=payload(resume_text)) as response:
+                if response.status != 200:
+                    self.log_test("Resume Section Update", False, f"HTTP {response.status}: {await response.text()}")
+                    return False
+                unchanged = await response.json()
+            if unchanged["sections_reextracted"] != 0 or unchanged["fields_changed"]:
+                self.log_test("Resume Section Update", False, f"Unchanged resume was re-extracted: {unchanged}")
+                return False
+            
+            # One added section: only that section goes to the LLM
+            edited_text = resume_text + "\n        PROJECTS\n        • Built a Rust command-line tool for log analysis\n"
+            async with self.session.put(url, json=payload(edited_text)) as response:
+                if response.status != 200:
+                    self.log_test("Resume Section Update", False, f"HTTP {response.status}: {await response.text()}")
+                    return False
+                edited = await response.json()
+            
+            if (edited["sections_reextracted"] == 1 and edited["sections_removed"] == 0
+                    and edited["sections_total"] == unchanged["sections_total"] + 1):
+                self.log_test("Resume Section Update", True, 
+                            f"Re-extracted 1 of {edited['sections_total']} sections, {edited['matches_rescored']} matches rescored")
+                return True
+            else:
+                self.log_test("Resume Section Update", False, f"Unexpected section counts: {edited}")
+                return False
+        except Exception as e:
+            self.log_test("Resume Section Update", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_write_behind_read_through(self):
+        """Test that a new match is readable at once and reaches the list after a flush.
+        
+        With WRITE_BEHIND_ENABLED the match is still buffered when it is first read.
+        """
+        if not self.resume_id or not self.job_id:
+            self.log_test("Write-Behind Read-Through", False, "Missing resume_id or job_id from previous tests")
+            return False
+        
+        try:
+            payload = {"resume_id": self.resume_id, "job_id": self.job_id}
+            async with self.session.post(f"{self.base_url}/api/match", json=payload) as response:
+                if response.status != 200:
+                    self.log_test("Write-Behind Read-Through", False, f"Match HTTP {response.status}: {await response.text()}")
+                    return False
+                match_id = (await response.json())["match_id"]
+            
+            # No delay: a buffered match must be served from the buffer
+            async with self.session.get(f"{self.base_url}/api/match/{match_id}") as response:
+                if response.status != 200:
+                    self.log_test("Write-Behind Read-Through", False, f"Immediate read HTTP {response.status}")
+                    return False
+                if (await response.json())["match"]["id"] != match_id:
+                    self.log_test("Write-Behind Read-Through", False, "Immediate read returned another match")
+                    return False
+            
+            # Well past the flush interval, the match must be in Mongo
+            await asyncio.sleep(1.0)
+            async with self.session.get(f"{self.base_url}/api/matches/export", params={"job_id": self.job_id}) as response:
+                exported_ids = [json.loads(line)["id"] for line in (await response.text()).splitlines() if line]
+            if match_id in exported_ids:
+                self.log_test("Write-Behind Read-Through", True, f"Match {match_id[:8]}... readable at once and flushed")
+                return True
+            else:
+                self.log_test("Write-Behind Read-Through", False, "Match was not flushed to the database")
+                return False
+        except Exception as e:
+            self.log_test("Write-Behind Read-Through", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_idempotent_requests(self):
+        """Test Idempotency-Key replay, body mismatch and a retry of a request still running.
+        
+        The retry gets 409 only if the original outlasts the server's
+        IDEMPOTENCY_WAIT_SECONDS; run both with a small value (e.g. 1) to
+        exercise it, the same value is read here.
+        """
+        wait_seconds = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))
+        url = f"{self.base_url}/api/analyze-job"
+        try:
+            # A fresh key and a description the LLM cache hasn't seen, so the original is slow
+            key = f"test-{uuid.uuid4()}"
+            payload = {
+                "title": "Senior Full-Stack Developer",
+                "description": f"{self.create_sample_job_description()}\nReference: {key}"
+            }
+            headers = {"Idempotency-Key": key}
+            
+            async def post(body):
+                async with self.session.post(url, json=body, headers=headers) as response:
+                    return response.status, dict(response.headers), await response.json()
+            
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            original = asyncio.create_task(post(payload))
+            await asyncio.sleep(0.2)
+            retry_status, retry_headers, retry_body = await post(payload)
+            retry_finished = loop.time()
+            status, _, body = await original
+            if status != 200:
+                self.log_test("Idempotent Requests", False, f"Original HTTP {status}: {body}")
+                return False
+            
+            # The retry either waited for the original or gave up after the wait
+            if retry_finished - started < wait_seconds:
+                if retry_status != 200 or retry_headers.get("Idempotent-Replayed") != "true" or retry_body != body:
+                    self.log_test("Idempotent Requests", False, f"Concurrent retry was not replayed: HTTP {retry_status}")
+                    return False
+            elif retry_status != 409 or "Retry-After" not in retry_headers:
+                self.log_test("Idempotent Requests", False, f"Retry after the wait expected 409, got HTTP {retry_status}")
+                return False
+            
+            # Once completed, a retry replays the stored response without running it again
+            replay_status, replay_headers, replay_body = await post(payload)
+            if replay_status != 200 or replay_headers.get("Idempotent-Replayed") != "true" or replay_body != body:
+                self.log_test("Idempotent Requests", False, f"Replay HTTP {replay_status}: {replay_body}")
+                return False
+            
+            # The same key with a different body is rejected
+            mismatch_status, _, _ = await post({**payload, "title": "Data Engineer"})
+            if mismatch_status != 422:
+                self.log_test("Idempotent Requests", False, f"Body mismatch expected 422, got HTTP {mismatch_status}")
+                return False
+            
+            self.log_test("Idempotent Requests", True,
+                          f"Concurrent retry HTTP {retry_status}, replay of job {body['job_id'][:8]}..., mismatch 422")
+            return True
+        except Exception as e:
+            self.log_test("Idempotent Requests", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_screening_run(self):
+        """Test that a screening run stays within its LLM budget and shortlist size"""
+        if not self.job_id:
+            self.log_test("Screening Run", False, "Missing job_id from previous tests")
+            return False
+        
+        try:
+            shortlist_size, llm_budget = 2, 1
+            payload = {"job_filter": {"ids": [self.job_id]}, "shortlist_size": shortlist_size, "llm_budget": llm_budget}
+            async with self.session.post(f"{self.base_url}/api/screening-runs", json=payload) as response:
+                if response.status != 202:
+                    self.log_test("Screening Run", False, f"Start HTTP {response.status}: {await response.text()}")
+                    return False
+                run_id = (await response.json())["id"]
+            
+            # Runs execute in the background, one at a time
+            run = None
+            for _ in range(120):
+                async with self.session.get(f"{self.base_url}/api/screening-runs/{run_id}") as response:
+                    run = await response.json()
+                if run["status"] in ("completed", "failed", "cancelled"):
+                    break
+                await asyncio.sleep(1.0)
+            if run["status"] != "completed":
+                self.log_test("Screening Run", False, f"Run ended {run['status']}: {run.get('error')}")
+                return False
+            
+            progress = run["progress"]
+            # Follow-up calls that complete or fix a narrative count too
+            if progress["llm_calls"] > llm_budget or progress["narratives_generated"] > progress["llm_calls"]:
+                self.log_test("Screening Run", False, f"LLM budget {llm_budget} exceeded: {progress}")
+                return False
+            
+            async with self.session.get(f"{self.base_url}/api/screening-runs/{run_id}/jobs/{self.job_id}/shortlist") as response:
+                shortlist = (await response.json())["shortlist"]
+            scores = [result["overall_score"] for result in shortlist]
+            if not shortlist or len(shortlist) > shortlist_size:
+                self.log_test("Screening Run", False, f"Shortlist of {len(shortlist)} for top-{shortlist_size}")
+                return False
+            if [result["rank"] for result in shortlist] != list(range(1, len(shortlist) + 1)) or scores != sorted(scores, reverse=True):
+                self.log_test("Screening Run", False, f"Shortlist not ranked by score: {scores}")
+                return False
+            
+            self.log_test("Screening Run", True,
+                          f"Shortlist of {len(shortlist)}, {progress['llm_calls']}/{llm_budget} LLM calls, "
+                          f"{progress['narratives_generated']} narratives")
+            return True
+        except Exception as e:
+            self.log_test("Screening Run", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_upload_resume_archive(self):
+        """Test zip archive upload with per-entry NDJSON results"""
+        try:
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w") as zip_file:
+                zip_file.writestr("resumes/sarah_johnson_resume.txt", self.create_sample_resume_text())
+                zip_file.writestr("resumes/notes.exe", "not a resume")
+            
+            async with self.session.post(
+                f"{self.base_url}/api/upload-resume-archive",
+                data=archive.getvalue(),
+                headers={"Content-Type": "application/zip"}
+            ) as response:
+                if response.status == 200:
+                    lines = [json.loads(line) for line in (await response.text()).splitlines() if line]
+                    summary = lines[-1].get("summary", {}) if lines else {}
+                    if summary.get("ok") == 1 and summary.get("skipped") == 1:
+                        self.log_test("Resume Archive Upload", True, f"Summary: {summary}")
+                        return True
+                    else:
+                        self.log_test("Resume Archive Upload", False, f"Unexpected results: {lines}")
+                        return False
+                else:
+                    error_text = await response.text()
+                    self.log_test("Resume Archive Upload", False, f"HTTP {response.status}: {error_text}")
+                    return False
+        except Exception as e:
+            self.log_test("Resume Archive Upload", False, f"Exception: {str(e)}")
+            return False
+    
     async def test_error_handling(self):
         """Test error handling scenarios"""
         error_tests_passed = 0
@@ -431,6 +783,14 @@ class BackendTester:
                 ("Get Jobs", self.test_get_jobs),
                 ("Get Matches", self.test_get_matches),
                 ("Get Match Details", self.test_get_match_details),
+                ("Conditional GET", self.test_conditional_get),
+                ("Export Resume", self.test_export_resume),
+                ("Analytics Rebuild", self.test_analytics_rebuild),
+                ("Resume Section Update", self.test_update_resume_sections),
+                ("Write-Behind Read-Through", self.test_write_behind_read_through),
+                ("Idempotent Requests", self.test_idempotent_requests),
+                ("Screening Run", self.test_screening_run),
+                ("Resume Archive Upload", self.test_upload_resume_archive),
                 ("Error Handling", self.test_error_handling)
             ]
             
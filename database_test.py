@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Unit tests for index management and the query-plan check
+Runs without the backend services: python -m pytest database_test.py
+With a MongoDB server at MONGO_URL, the query shapes are also explained against
+real indexes in a scratch database (skipped otherwise).
+"""
+
+import os
+import sys
+import copy
+import unittest
+from typing import Any, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from database import INDEX_SPECS, LEGACY_INDEXES, QUERY_SHAPES, MONGO_URL, ensure_indexes, check_query_plans
+
+class FakeCursor:
+    def __init__(self, collection: "FakeCollection", query: Dict[str, Any]):
+        self.collection = collection
+        self.query = query
+        self.sorted_by = None
+
+    def sort(self, keys):
+        self.sorted_by = keys
+        return self
+
+    async def explain(self) -> Dict[str, Any]:
+        self.collection.explained.append((self.query, self.sorted_by))
+        return {"queryPlanner": {"winningPlan": self.collection.plan}}
+
+class FakeCollection:
+    """Index metadata and explain() output, in the shapes Motor returns them"""
+
+    def __init__(self, indexes: Dict[str, Dict[str, Any]] = None):
+        self.indexes = {"_id_": {"key": [("_id", 1)]}, **(indexes or {})}
+        self.dropped: List[str] = []
+        self.created: List[str] = []
+        self.plan: Dict[str, Any] = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+        self.explained = []
+
+    async def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(self.indexes)
+
+    async def drop_index(self, name: str):
+        del self.indexes[name]
+        self.dropped.append(name)
+
+    async def create_index(self, keys, name: str, **options):
+        self.indexes[name] = {"key": list(keys), **options}
+        self.created.append(name)
+
+    def find(self, query: Dict[str, Any]) -> FakeCursor:
+        return FakeCursor(self, query)
+
+class FakeDatabase(dict):
+    def __missing__(self, name: str) -> FakeCollection:
+        self[name] = FakeCollection()
+        return self[name]
+
+class EnsureIndexesTest(unittest.IsolatedAsyncioTestCase):
+    async def test_creates_every_declared_index(self):
+        db = FakeDatabase()
+        await ensure_indexes(db)
+        for collection_name, specs in INDEX_SPECS.items():
+            self.assertEqual(db[collection_name].created, [spec["name"] for spec in specs])
+            self.assertEqual(db[collection_name].dropped, [])
+
+        # A second run changes nothing
+        for collection in db.values():
+            collection.created.clear()
+        await ensure_indexes(db)
+        self.assertTrue(all(not collection.created and not collection.dropped for collection in db.values()))
+
+    async def test_drops_legacy_indexes(self):
+        legacy = {name: {"key": [(name.rsplit("_", 1)[0], ASCENDING)]} for name in LEGACY_INDEXES["matches"]}
+        db = FakeDatabase(matches=FakeCollection(legacy))
+        await ensure_indexes(db)
+        self.assertEqual(db["matches"].dropped, LEGACY_INDEXES["matches"])
+        self.assertEqual(set(db["matches"].indexes), {"_id_"} | {spec["name"] for spec in INDEX_SPECS["matches"]})
+
+    async def test_replaces_indexes_whose_definition_changed(self):
+        db = FakeDatabase(
+            # Same name, no longer unique
+            resumes=FakeCollection({"resumes_id_unique": {"key": [("id", ASCENDING)]}}),
+            # Same keys under another name
+            jobs=FakeCollection({"id_1": {"key": [("id", ASCENDING)], "unique": True}}),
+            # Same name, different keys
+            screening_runs=FakeCollection({"screening_runs_created": {"key": [("created_at", ASCENDING)]}}),
+            # Unchanged, so kept
+            skills_dictionary=FakeCollection({
+                "skills_dictionary_skill_unique": {"key": [("skill", ASCENDING)], "unique": True}
+            }),
+        )
+        await ensure_indexes(db)
+        self.assertEqual(db["resumes"].dropped, ["resumes_id_unique"])
+        self.assertTrue(db["resumes"].indexes["resumes_id_unique"]["unique"])
+        self.assertEqual(db["jobs"].dropped, ["id_1"])
+        self.assertEqual(db["screening_runs"].indexes["screening_runs_created"]["key"], [("created_at", DESCENDING)])
+        self.assertEqual((db["skills_dictionary"].dropped, db["skills_dictionary"].created), ([], []))
+
+class CheckQueryPlansTest(unittest.IsolatedAsyncioTestCase):
+    async def test_index_plans_pass(self):
+        db = FakeDatabase()
+        self.assertEqual(await check_query_plans(db), [])
+        explained = [query for collection in db.values() for query in collection.explained]
+        self.assertEqual(len(explained), len(QUERY_SHAPES))
+
+    async def test_collscan_anywhere_in_the_plan_fails(self):
+        db = FakeDatabase()
+        db["resumes"].plan = {"stage": "COLLSCAN"}
+        # Nested under a sort and one branch of an $or
+        db["matches"].plan = {"stage": "SORT", "inputStage": {"stage": "OR", "inputStages": [
+            {"stage": "IXSCAN"}, {"stage": "COLLSCAN"}
+        ]}}
+        failures = await check_query_plans(db)
+        expected = [f"{collection}: {description}" for collection, description, _, _ in QUERY_SHAPES if collection in ("resumes", "matches")]
+        self.assertEqual([failure.split(" (")[0] for failure in failures], expected)
+        self.assertTrue(all(failure.endswith("uses COLLSCAN") for failure in failures))
+
+    async def test_sorts_are_explained(self):
+        db = FakeDatabase()
+        await check_query_plans(db)
+        for collection_name, collection in db.items():
+            shapes = [(query, sort) for name, _, query, sort in QUERY_SHAPES if name == collection_name]
+            self.assertEqual(collection.explained, shapes)
+
+class LiveQueryPlanTest(unittest.IsolatedAsyncioTestCase):
+    """Explains every query shape against a real server, in a scratch database"""
+
+    async def asyncSetUp(self):
+        self.client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+        try:
+            await self.client.admin.command("ping")
+        except PyMongoError:
+            self.client.close()
+            self.skipTest(f"No MongoDB server at {MONGO_URL}")
+        self.db = self.client[f"{self.client.get_default_database('resume_matcher').name}_plan_test"]
+        await self.client.drop_database(self.db.name)
+
+    async def asyncTearDown(self):
+        await self.client.drop_database(self.db.name)
+        self.client.close()
+
+    async def test_every_query_shape_uses_an_index(self):
+        await self.db.matches.create_index([("resume_id", ASCENDING)])
+        await ensure_indexes(self.db)
+        names = set(await self.db.matches.index_information())
+        self.assertFalse(names & set(LEGACY_INDEXES["matches"]))
+
+        # A document per collection, so the planner has something to plan against
+        for collection_name in INDEX_SPECS:
+            await self.db[collection_name].insert_one({"id": "seed", "skill": "seed", "created_at": 0})
+
+        self.assertEqual(await check_query_plans(self.db), [])
+        for collection_name, description, query, sort in QUERY_SHAPES:
+            cursor = self.db[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+            with self.subTest(query=description):
+                # Newer servers report single-key lookups as EXPRESS_IXSCAN
+                self.assertIn("IXSCAN", str(plan))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Unit tests for request deadlines, disconnect cancellation and the abandoned request counter
+Runs without the backend services: python -m pytest deadlines_test.py
+"""
+
+import os
+import io
+import sys
+import time
+import asyncio
+import unittest
+from unittest import mock
+
+from docx import Document
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import deadlines
+from deadlines import DeadlineExceeded, abandoned_requests, check, current_deadline, remaining, run_with_deadline
+from file_processor import FileProcessor
+
+class FakeRequest:
+    """Stands in for a Starlette request: headers and a disconnect flag"""
+
+    def __init__(self, timeout: float = None, disconnected: bool = False):
+        self.headers = {deadlines.TIMEOUT_HEADER: str(timeout)} if timeout is not None else {}
+        self.disconnected = disconnected
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+def abandoned(endpoint: str, reason: str) -> float:
+    return abandoned_requests.value(endpoint=endpoint, reason=reason)
+
+class CheckTest(unittest.TestCase):
+    def test_no_deadline_never_expires(self):
+        self.assertIsNone(remaining())
+        check()
+
+    def test_explicit_deadline(self):
+        self.assertGreater(remaining(time.monotonic() + 10), 9)
+        check(time.monotonic() + 10)
+        with self.assertRaises(DeadlineExceeded):
+            check(time.monotonic() - 1)
+
+    def test_request_timeout_is_clamped(self):
+        self.assertEqual(deadlines.request_timeout(FakeRequest()), deadlines.REQUEST_TIMEOUT_SECONDS)
+        self.assertEqual(deadlines.request_timeout(FakeRequest(0)), 0.1)
+        self.assertEqual(deadlines.request_timeout(FakeRequest(10 ** 6)), deadlines.MAX_REQUEST_TIMEOUT_SECONDS)
+        request = FakeRequest()
+        request.headers[deadlines.TIMEOUT_HEADER] = "soon"
+        self.assertEqual(deadlines.request_timeout(request), deadlines.REQUEST_TIMEOUT_SECONDS)
+
+class RunWithDeadlineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_result_within_the_deadline(self):
+        async def work():
+            self.assertLessEqual(remaining(), 5)
+            return "done"
+
+        self.assertEqual(await run_with_deadline(FakeRequest(5), "fast", work), "done")
+        self.assertIsNone(current_deadline())
+
+    async def test_expired_deadline_is_a_504_and_cancels_the_work(self):
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        before = abandoned("slow", "deadline")
+        with self.assertRaises(HTTPException) as raised:
+            await run_with_deadline(FakeRequest(0.1), "slow", work)
+        self.assertEqual(raised.exception.status_code, 504)
+        self.assertEqual(raised.exception.headers, {"X-Deadline-Exceeded": "true"})
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(abandoned("slow", "deadline"), before + 1)
+
+    async def test_check_between_steps_is_a_504(self):
+        steps = []
+
+        async def work():
+            for step in range(100):
+                check()
+                steps.append(step)
+                # Blocking work that cancellation couldn't interrupt
+                time.sleep(0.01)
+                await asyncio.sleep(0)
+
+        before = abandoned("steps", "deadline")
+        with self.assertRaises(HTTPException) as raised:
+            await run_with_deadline(FakeRequest(0.1), "steps", work)
+        self.assertEqual(raised.exception.status_code, 504)
+        self.assertLess(len(steps), 100)
+        self.assertEqual(abandoned("steps", "deadline"), before + 1)
+
+    async def test_disconnect_is_a_499_and_cancels_the_work(self):
+        request = FakeRequest(5)
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.Event().wait()
+
+        async def disconnect():
+            await started.wait()
+            request.disconnected = True
+
+        before = abandoned("gone", "client_disconnected")
+        with mock.patch.object(deadlines, "DISCONNECT_POLL_SECONDS", 0.01):
+            disconnecting = asyncio.create_task(disconnect())
+            with self.assertRaises(HTTPException) as raised:
+                await run_with_deadline(request, "gone", work)
+            await disconnecting
+        self.assertEqual(raised.exception.status_code, deadlines.CLIENT_CLOSED_REQUEST)
+        self.assertEqual(abandoned("gone", "client_disconnected"), before + 1)
+
+    async def test_disconnect_can_be_ignored(self):
+        async def work():
+            await asyncio.sleep(0.05)
+            return "kept"
+
+        with mock.patch.object(deadlines, "DISCONNECT_POLL_SECONDS", 0.01):
+            result = await run_with_deadline(FakeRequest(5, disconnected=True), "kept", work, cancel_on_disconnect=False)
+        self.assertEqual(result, "kept")
+
+class EndpointTest(unittest.TestCase):
+    def test_expired_deadline_returns_504(self):
+        app = FastAPI()
+
+        @app.get("/slow")
+        async def slow(request: Request):
+            return await run_with_deadline(request, "endpoint_slow", lambda: asyncio.sleep(5))
+
+        before = abandoned("endpoint_slow", "deadline")
+        response = TestClient(app).get("/slow", headers={deadlines.TIMEOUT_HEADER: "0.1"})
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response.headers["X-Deadline-Exceeded"], "true")
+        self.assertIn("0.1s exceeded", response.json()["detail"])
+        self.assertEqual(abandoned("endpoint_slow", "deadline"), before + 1)
+
+class DocxDeadlineTest(unittest.TestCase):
+    def setUp(self):
+        document = Document()
+        document.add_paragraph("Python developer")
+        output = io.BytesIO()
+        document.save(output)
+        self.data = output.getvalue()
+
+    def test_docx_extraction_stops_at_the_deadline(self):
+        self.assertEqual(FileProcessor.extract_text_from_bytes(self.data, "docx", time.monotonic() + 10), "Python developer")
+        with self.assertRaises(DeadlineExceeded):
+            FileProcessor.extract_text_from_bytes(self.data, "docx", time.monotonic() - 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -102,7 +102,7 @@ const MatchHistory = () => {
 
   const handleViewDetails = async (matchId) => {
     try {
-      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/match/${matchId}`);
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/match/${matchId}?narrative=true`);
       
       if (!response.ok) {
         throw new Error('Failed to fetch match details');
@@ -21,6 +21,8 @@ const MatchingResults = ({ currentResume, currentJob, matchResult, onMatchComple
   const [isMatching, setIsMatching] = useState(false);
   const [matchingError, setMatchingError] = useState(null);
   const [detailedMatch, setDetailedMatch] = useState(null);
+  const [isLoadingNarrative, setIsLoadingNarrative] = useState(false);
+  const [narrativeError, setNarrativeError] = useState(null);
 
   useEffect(() => {
     if (matchResult) {
@@ -28,6 +30,37 @@ const MatchingResults = ({ currentResume, currentJob, matchResult, onMatchComple
     }
   }, [matchResult]);
 
+  const loadNarrative = async () => {
+    // Scores come back immediately; suggestions and analysis cost an LLM call,
+    // so they are only generated when the user asks for them
+    setIsLoadingNarrative(true);
+    setNarrativeError(null);
+
+    try {
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/match/${detailedMatch.match_id}?narrative=true`);
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || 'Failed to generate suggestions');
+      }
+
+      const data = await response.json();
+      const withNarrative = {
+        ...detailedMatch,
+        suggestions: data.match.suggestions,
+        detailed_analysis: data.match.detailed_analysis,
+        narrative_generated: true
+      };
+
+      setDetailedMatch(withNarrative);
+      onMatchCompleted(withNarrative);
+    } catch (error) {
+      console.error('Narrative error:', error);
+      setNarrativeError(error.message);
+    } finally {
+      setIsLoadingNarrative(false);
+    }
+  };
+
   const handleMatch = async () => {
     if (!currentResume || !currentJob) {
       setMatchingError('Both resume and job description are required');
@@ -36,6 +69,7 @@ const MatchingResults = ({ currentResume, currentJob, matchResult, onMatchComple
 
     setIsMatching(true);
     setMatchingError(null);
+    setNarrativeError(null);
 
     try {
       const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/match`, {
@@ -65,7 +99,8 @@ const MatchingResults = ({ currentResume, currentJob, matchResult, onMatchComple
         matched_keywords: data.matched_keywords,
         missing_skills: data.missing_skills,
         suggestions: data.suggestions,
-        detailed_analysis: data.detailed_analysis
+        detailed_analysis: data.detailed_analysis,
+        narrative_generated: data.narrative_generated
       };
 
       setDetailedMatch(matchData);
@@ -378,33 +413,73 @@ const MatchingResults = ({ currentResume, currentJob, matchResult, onMatchComple
             </div>
           </div>
 
-          {/* Suggestions */}
-          <div className="bg-white rounded-xl shadow-lg border border-gray-200">
-            <div className="p-6">
-              <h3 className="text-lg font-bold text-gray-800 mb-4 flex items-center">
-                <Lightbulb className="w-5 h-5 text-yellow-600 mr-2" />
-                Improvement Suggestions
-              </h3>
-              <div className="space-y-3">
-                {detailedMatch.suggestions?.map((suggestion, index) => (
-                  <div key={index} className="flex items-start space-x-3 p-3 bg-yellow-50 rounded-lg">
-                    <ArrowRight className="w-5 h-5 text-yellow-600 mt-0.5 flex-shrink-0" />
-                    <p className="text-sm text-yellow-800">{suggestion}</p>
+          {!detailedMatch.narrative_generated && !detailedMatch.detailed_analysis ? (
+            /* Suggestions and analysis, generated on request */
+            <div className="bg-white rounded-xl shadow-lg border border-gray-200">
+              <div className="p-6">
+                <h3 className="text-lg font-bold text-gray-800 mb-4 flex items-center">
+                  <Lightbulb className="w-5 h-5 text-yellow-600 mr-2" />
+                  Improvement Suggestions
+                </h3>
+                <p className="text-sm text-gray-600 mb-4">
+                  Get personalized suggestions and a detailed analysis of this match.
+                </p>
+                {narrativeError && (
+                  <div className="mb-4 p-3 bg-red-50 border border-red-200 rounded-lg flex items-center">
+                    <AlertCircle className="w-5 h-5 text-red-500 mr-2 flex-shrink-0" />
+                    <p className="text-sm text-red-700">{narrativeError}</p>
                   </div>
-                )) || <p className="text-gray-500 text-sm">No specific suggestions available</p>}
+                )}
+                <button
+                  onClick={loadNarrative}
+                  disabled={isLoadingNarrative}
+                  className="flex items-center space-x-2 px-4 py-2 bg-yellow-500 text-white rounded-lg hover:bg-yellow-600 transition-colors disabled:opacity-50"
+                >
+                  {isLoadingNarrative ? (
+                    <>
+                      <Loader2 className="w-4 h-4 animate-spin" />
+                      <span>Generating...</span>
+                    </>
+                  ) : (
+                    <>
+                      <Lightbulb className="w-4 h-4" />
+                      <span>Explain This Match</span>
+                    </>
+                  )}
+                </button>
               </div>
             </div>
-          </div>
+          ) : (
+            <>
+              {/* Suggestions */}
+              <div className="bg-white rounded-xl shadow-lg border border-gray-200">
+                <div className="p-6">
+                  <h3 className="text-lg font-bold text-gray-800 mb-4 flex items-center">
+                    <Lightbulb className="w-5 h-5 text-yellow-600 mr-2" />
+                    Improvement Suggestions
+                  </h3>
+                  <div className="space-y-3">
+                    {detailedMatch.suggestions?.map((suggestion, index) => (
+                      <div key={index} className="flex items-start space-x-3 p-3 bg-yellow-50 rounded-lg">
+                        <ArrowRight className="w-5 h-5 text-yellow-600 mt-0.5 flex-shrink-0" />
+                        <p className="text-sm text-yellow-800">{suggestion}</p>
+                      </div>
+                    )) || <p className="text-gray-500 text-sm">No specific suggestions available</p>}
+                  </div>
+                </div>
+              </div>
 
-          {/* Detailed Analysis */}
-          <div className="bg-white rounded-xl shadow-lg border border-gray-200">
-            <div className="p-6">
-              <h3 className="text-lg font-bold text-gray-800 mb-4">Detailed Analysis</h3>
-              <div className="prose prose-sm max-w-none">
-                <p className="text-gray-700 leading-relaxed">{detailedMatch.detailed_analysis}</p>
+              {/* Detailed Analysis */}
+              <div className="bg-white rounded-xl shadow-lg border border-gray-200">
+                <div className="p-6">
+                  <h3 className="text-lg font-bold text-gray-800 mb-4">Detailed Analysis</h3>
+                  <div className="prose prose-sm max-w-none">
+                    <p className="text-gray-700 leading-relaxed">{detailedMatch.detailed_analysis}</p>
+                  </div>
+                </div>
               </div>
-            </div>
-          </div>
+            </>
+          )}
 
           {/* Actions */}
           <div className="bg-white rounded-xl shadow-lg border border-gray-200">
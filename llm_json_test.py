@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the tolerant LLM JSON parser and its follow-up calls
+Runs without the backend services: python -m pytest llm_json_test.py
+"""
+
+import os
+import sys
+import json
+import unittest
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from llm_json import parse_partial, parse_llm_json, ResumeExtraction, LLMOutputError, JSONRepairError
+
+RESUME = {
+    "skills": ["Python", "React"],
+    "experience": ["5 years of web development"],
+    "qualifications": ["BSc Computer Science"],
+    "keywords": ["full-stack"]
+}
+
+class FakeFollowup:
+    """Stands in for the follow-up LLM call, recording the prompts it was sent"""
+
+    def __init__(self, *responses: str):
+        self.responses = list(responses)
+        self.prompts: List[str] = []
+
+    async def __call__(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return self.responses.pop(0)
+
+class ParsePartialTest(unittest.TestCase):
+    def test_fenced_output(self):
+        partial = parse_partial("```json\n" + json.dumps(RESUME) + "\n```")
+        self.assertEqual(partial.value, RESUME)
+        self.assertFalse(partial.truncated)
+
+    def test_prose_around_object(self):
+        partial = parse_partial("Here is the analysis:\n" + json.dumps(RESUME) + "\nLet me know!")
+        self.assertEqual(partial.value, RESUME)
+        self.assertEqual(partial.repairs, {"leading_text", "trailing_text"})
+
+    def test_trailing_commas(self):
+        partial = parse_partial('{"skills": ["Python", "React",], "keywords": [],}')
+        self.assertEqual(partial.value, {"skills": ["Python", "React"], "keywords": []})
+        self.assertIn("trailing_comma", partial.repairs)
+
+    def test_missing_commas(self):
+        partial = parse_partial('{"skills": ["Python" "React"]\n"keywords": ["full-stack"]}')
+        self.assertEqual(partial.value, {"skills": ["Python", "React"], "keywords": ["full-stack"]})
+        self.assertIn("missing_comma", partial.repairs)
+
+    def test_unquoted_keys_and_python_literals(self):
+        partial = parse_partial("{skills: ['Python'], remote: True, salary: None}")
+        self.assertEqual(partial.value, {"skills": ["Python"], "remote": True, "salary": None})
+        self.assertTrue({"unquoted_key", "single_quotes", "python_literal"} <= partial.repairs)
+
+    def test_truncated_list_keeps_complete_items(self):
+        partial = parse_partial('{"experience": ["5 years"], "skills": ["Python", "React", "Dja')
+        self.assertTrue(partial.truncated)
+        self.assertEqual(partial.cut_field, "skills")
+        self.assertEqual(partial.value, {"experience": ["5 years"], "skills": ["Python", "React"]})
+
+    def test_truncated_before_value(self):
+        partial = parse_partial('{"skills": ["Python"], "keywords":')
+        self.assertTrue(partial.truncated)
+        self.assertEqual(partial.cut_field, "keywords")
+        self.assertEqual(partial.value, {"skills": ["Python"]})
+
+    def test_no_object(self):
+        with self.assertRaises(JSONRepairError):
+            parse_partial("I could not analyze this resume.")
+
+class ParseLLMJSONTest(unittest.IsolatedAsyncioTestCase):
+    async def test_clean_response_needs_no_followup(self):
+        followup = FakeFollowup()
+        result = await parse_llm_json("resume_extraction", ResumeExtraction, json.dumps(RESUME), followup)
+        self.assertEqual(result.model_dump(), RESUME)
+        self.assertEqual(followup.prompts, [])
+
+    async def test_null_lists_are_empty_without_followup(self):
+        followup = FakeFollowup()
+        response = json.dumps({**RESUME, "skills": None, "qualifications": None})
+        result = await parse_llm_json("resume_extraction", ResumeExtraction, response, followup)
+        self.assertEqual(result.skills, [])
+        self.assertEqual(result.qualifications, [])
+        self.assertEqual(followup.prompts, [])
+
+    async def test_truncated_response_is_continued(self):
+        followup = FakeFollowup('{"skills": ["Django", "Python"], "qualifications": ["BSc"], "keywords": ["web"]}')
+        response = '{"experience": ["5 years"], "skills": ["Python", "React", "Dja'
+        result = await parse_llm_json("resume_extraction", ResumeExtraction, response, followup)
+
+        # Only the cut field and the missing fields are asked for
+        self.assertEqual(len(followup.prompts), 1)
+        self.assertIn("skills, qualifications, keywords", followup.prompts[0])
+        self.assertIn('"skills" was cut off', followup.prompts[0])
+        # Items already received aren't repeated
+        self.assertEqual(result.skills, ["Python", "React", "Django"])
+        self.assertEqual(result.experience, ["5 years"])
+        self.assertEqual(result.keywords, ["web"])
+
+    async def test_invalid_response_is_sent_back_to_be_fixed(self):
+        followup = FakeFollowup(json.dumps(RESUME))
+        response = json.dumps({**RESUME, "skills": 42})
+        result = await parse_llm_json("resume_extraction", ResumeExtraction, response, followup)
+
+        self.assertEqual(len(followup.prompts), 1)
+        self.assertIn("could not be used: skills", followup.prompts[0])
+        self.assertEqual(result.model_dump(), RESUME)
+
+    async def test_unparseable_response_is_sent_back_to_be_fixed(self):
+        followup = FakeFollowup("```json\n" + json.dumps(RESUME) + "\n```")
+        result = await parse_llm_json("resume_extraction", ResumeExtraction, "Sorry, here it is: skills are Python", followup)
+        self.assertEqual(len(followup.prompts), 1)
+        self.assertIn("Sorry, here it is", followup.prompts[0])
+        self.assertEqual(result.model_dump(), RESUME)
+
+    async def test_still_invalid_after_followup_raises(self):
+        followup = FakeFollowup(json.dumps({**RESUME, "skills": 42}))
+        with self.assertRaises(LLMOutputError) as raised:
+            await parse_llm_json("resume_extraction", ResumeExtraction, json.dumps({**RESUME, "skills": 42}), followup)
+        self.assertEqual(raised.exception.task, "resume_extraction")
+        self.assertEqual(len(followup.prompts), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the LLM circuit breaker and hedged requests
+Runs without the backend services: python -m pytest llm_resilience_test.py
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+from typing import List
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import llm_resilience
+from llm_resilience import (
+    CircuitBreaker, CircuitOpenError, LatencyTracker, LLMUnavailableError, ResilientCaller,
+    CLOSED, OPEN, HALF_OPEN
+)
+
+class FakeClock:
+    """Stands in for the time module inside llm_resilience"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+class FakeCaller:
+    """Stands in for the model: every call starts a request the test answers by hand"""
+
+    def __init__(self):
+        self.requests: List[asyncio.Future] = []
+        self.sent_at: List[float] = []
+
+    async def __call__(self) -> str:
+        loop = asyncio.get_running_loop()
+        request = loop.create_future()
+        self.requests.append(request)
+        self.sent_at.append(loop.time())
+        return await request
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patchers = [
+            mock.patch.object(llm_resilience, "time", self.clock),
+            mock.patch.object(llm_resilience, "BREAKER_MIN_CALLS", 4),
+            mock.patch.object(llm_resilience, "BREAKER_ERROR_THRESHOLD", 0.5),
+            mock.patch.object(llm_resilience, "BREAKER_WINDOW_SECONDS", 60),
+            mock.patch.object(llm_resilience, "BREAKER_OPEN_SECONDS", 30),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("test-model")
+
+    def trip(self):
+        for success in (True, True, False, False):
+            self.breaker.record(success)
+
+    def test_stays_closed_below_min_calls_or_threshold(self):
+        for _ in range(3):
+            self.breaker.record(False)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        self.breaker = CircuitBreaker("test-model")
+        for success in (True, True, True, True, False, False, False):
+            self.breaker.record(success)
+        # 3 failures in 7 calls is under the threshold
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_opens_at_the_error_threshold(self):
+        self.trip()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 29
+        self.assertFalse(self.breaker.allow())
+
+    def test_old_results_leave_the_window(self):
+        for _ in range(3):
+            self.breaker.record(False)
+        self.clock.now += 61
+        self.breaker.record(False)
+        # Only one result is left in the window, under BREAKER_MIN_CALLS
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_lets_one_probe_through(self):
+        self.trip()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_successful_probe_closes(self):
+        self.trip()
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, CLOSED)
+        # The failures from before the open are forgotten
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens_for_a_full_period(self):
+        self.trip()
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.clock.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 1
+        self.assertTrue(self.breaker.allow())
+
+    def test_abandoned_probe_is_released(self):
+        self.trip()
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.release_probe()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+class LatencyTrackerTest(unittest.TestCase):
+    def test_needs_enough_samples(self):
+        tracker = LatencyTracker()
+        for seconds in range(llm_resilience.LLM_HEDGE_MIN_SAMPLES - 1):
+            tracker.add(seconds)
+        self.assertIsNone(tracker.percentile(0.95))
+        tracker.add(100)
+        self.assertIsNotNone(tracker.percentile(0.95))
+
+    def test_percentile_of_the_rolling_window(self):
+        tracker = LatencyTracker(size=100)
+        for seconds in range(1, 201):
+            tracker.add(seconds)
+        # Only 101..200 are kept
+        self.assertEqual(tracker.percentile(0.95), 196)
+        self.assertEqual(tracker.percentile(1.0), 200)
+
+class ResilientCallerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        patchers = [
+            mock.patch.object(llm_resilience, "LLM_HEDGE_ENABLED", True),
+            mock.patch.object(llm_resilience, "LLM_HEDGE_PERCENTILE", 0.95),
+            mock.patch.object(llm_resilience, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.01),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.caller = ResilientCaller("test-model")
+        self.fake = FakeCaller()
+
+    def observe(self, seconds: float, count: int = llm_resilience.LLM_HEDGE_MIN_SAMPLES):
+        for _ in range(count):
+            self.caller.latency.add(seconds)
+
+    async def wait_for_requests(self, count: int):
+        while len(self.fake.requests) < count:
+            await asyncio.sleep(0.001)
+
+    async def test_no_hedge_until_latencies_are_known(self):
+        self.observe(0.01, count=llm_resilience.LLM_HEDGE_MIN_SAMPLES - 1)
+        call = asyncio.create_task(self.caller.call(self.fake, timeout=5))
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(self.fake.requests), 1)
+        self.fake.requests[0].set_result("answer")
+        self.assertEqual(await call, "answer")
+
+    async def test_fast_answer_is_not_hedged(self):
+        self.observe(0.2)
+        call = asyncio.create_task(self.caller.call(self.fake, timeout=5))
+        await self.wait_for_requests(1)
+        self.fake.requests[0].set_result("answer")
+        self.assertEqual(await call, "answer")
+        await asyncio.sleep(0.3)
+        self.assertEqual(len(self.fake.requests), 1)
+
+    async def test_hedge_is_sent_at_p95_and_the_first_answer_wins(self):
+        self.observe(0.01, count=19)
+        self.observe(0.1, count=1)
+        # p95 of 20 samples is the slowest one
+        self.assertEqual(self.caller.latency.percentile(0.95), 0.1)
+        call = asyncio.create_task(self.caller.call(self.fake, timeout=5))
+        await self.wait_for_requests(2)
+        self.assertGreaterEqual(self.fake.sent_at[1] - self.fake.sent_at[0], 0.09)
+
+        self.fake.requests[1].set_result("hedge")
+        self.assertEqual(await call, "hedge")
+        # The slower original is cancelled
+        await asyncio.sleep(0)
+        self.assertTrue(self.fake.requests[0].cancelled())
+
+    async def test_hedge_waits_at_least_the_minimum_delay(self):
+        self.observe(0.001)
+        with mock.patch.object(llm_resilience, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.1):
+            call = asyncio.create_task(self.caller.call(self.fake, timeout=5))
+            await self.wait_for_requests(2)
+        self.assertGreaterEqual(self.fake.sent_at[1] - self.fake.sent_at[0], 0.09)
+        self.fake.requests[0].set_result("original")
+        self.assertEqual(await call, "original")
+
+    async def test_failed_attempt_falls_back_to_the_other(self):
+        self.observe(0.01)
+        call = asyncio.create_task(self.caller.call(self.fake, timeout=5))
+        await self.wait_for_requests(2)
+        self.fake.requests[0].set_exception(RuntimeError("boom"))
+        await asyncio.sleep(0)
+        self.fake.requests[1].set_result("hedge")
+        self.assertEqual(await call, "hedge")
+        self.assertEqual(self.caller.breaker.state, CLOSED)
+
+    async def test_every_attempt_failing_is_unavailable(self):
+        self.observe(0.01)
+        call = asyncio.create_task(self.caller.call(self.fake, timeout=5))
+        await self.wait_for_requests(2)
+        for request in self.fake.requests:
+            request.set_exception(RuntimeError("boom"))
+        with self.assertRaises(LLMUnavailableError):
+            await call
+
+    async def test_timeout_is_unavailable(self):
+        with self.assertRaises(LLMUnavailableError) as raised:
+            await self.caller.call(self.fake, timeout=0.05)
+        self.assertIn("timed out", str(raised.exception))
+        self.assertTrue(all(request.cancelled() for request in self.fake.requests))
+
+    async def test_open_breaker_rejects_without_calling(self):
+        self.caller.breaker._set_state(OPEN)
+        self.caller.breaker._opened_at = llm_resilience.time.monotonic()
+        with self.assertRaises(CircuitOpenError):
+            await self.caller.call(self.fake)
+        self.assertEqual(self.fake.requests, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the non-blocking log queue, request ids in log records and log sampling
+Runs without the backend services: python -m pytest logging_setup_test.py
+"""
+
+import os
+import sys
+import json
+import queue
+import logging
+import contextvars
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import logging_setup
+from logging_setup import (
+    JSONFormatter, NonBlockingQueueHandler, RequestContextFilter, RequestIdMiddleware, SamplingFilter, TextFormatter,
+    current_request_id, log_records_dropped, log_records_sampled_out
+)
+
+class CollectingHandler(logging.Handler):
+    """Keeps the records that reach it"""
+
+    def __init__(self):
+        super().__init__()
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+def make_logger(name: str, *handlers: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"logging_setup_test.{name}")
+    logger.handlers = list(handlers)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+def with_request_id(request_id: str, function, *args, **kwargs):
+    """Run function with request_id set, as RequestIdMiddleware does for a request"""
+    def run():
+        token = logging_setup._request_id.set(request_id)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            logging_setup._request_id.reset(token)
+    return contextvars.copy_context().run(run)
+
+class NonBlockingQueueHandlerTest(unittest.TestCase):
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = NonBlockingQueueHandler(queue.Queue(2))
+        logger = make_logger("full", handler)
+        before = log_records_dropped.value()
+        for i in range(5):
+            logger.info("record %d", i)
+        self.assertEqual(log_records_dropped.value(), before + 3)
+        self.assertEqual([handler.queue.get_nowait().getMessage() for _ in range(2)], ["record 0", "record 1"])
+
+    def test_records_are_rendered_before_queueing(self):
+        handler = NonBlockingQueueHandler(queue.Queue())
+        logger = make_logger("prepare", handler)
+        values = ["before"]
+        logger.info("value is %s", values)
+        values[0] = "after"
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed")
+
+        first, second = handler.queue.get_nowait(), handler.queue.get_nowait()
+        self.assertEqual((first.msg, first.args), ("value is ['before']", None))
+        self.assertIsNone(second.exc_info)
+        self.assertIn("ValueError: boom", second.exc_text)
+
+class RequestIdTest(unittest.TestCase):
+    def setUp(self):
+        self.collected = CollectingHandler()
+        self.collected.addFilter(RequestContextFilter())
+        self.logger = make_logger("request_id", self.collected)
+
+    def test_request_id_in_formatted_records(self):
+        with_request_id("req-123", self.logger.info, "working", extra={"event": "test.event", "step": 2})
+        self.logger.info("outside a request")
+        inside, outside = self.collected.records
+
+        entry = json.loads(JSONFormatter().format(inside))
+        self.assertEqual((entry["request_id"], entry["message"], entry["event"], entry["step"]), ("req-123", "working", "test.event", 2))
+        self.assertNotIn("request_id", json.loads(JSONFormatter().format(outside)))
+        self.assertIn("[req-123] working", TextFormatter().format(inside))
+        self.assertIn("[None] outside a request", TextFormatter().format(outside))
+
+    def test_request_id_follows_a_copied_context_into_threads(self):
+        def work():
+            with ThreadPoolExecutor(1) as pool:
+                pool.submit(contextvars.copy_context().run, self.logger.info, "in a thread").result()
+
+        with_request_id("req-456", work)
+        self.assertEqual(self.collected.records[0].request_id, "req-456")
+
+    def test_long_fields_are_truncated(self):
+        limit = logging_setup.LOG_MAX_FIELD_CHARS
+        self.logger.info("x" * (limit + 5), extra={"detail": "y" * (limit + 2)})
+        entry = json.loads(JSONFormatter().format(self.collected.records[0]))
+        self.assertEqual(entry["message"], "x" * limit + "…(+5 chars)")
+        self.assertEqual(entry["detail"], "y" * limit + "…(+2 chars)")
+
+class RequestIdMiddlewareTest(unittest.IsolatedAsyncioTestCase):
+    async def call(self, headers):
+        seen = {}
+        messages = []
+
+        async def app(scope, receive, send):
+            seen["request_id"] = current_request_id()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/api/jobs", "headers": headers}
+        with mock.patch.object(logging.getLogger("http"), "log") as log:
+            await RequestIdMiddleware(app)(scope, None, send)
+        return seen["request_id"], dict(messages[0]["headers"])[b"x-request-id"].decode("latin-1"), log
+
+    async def test_client_request_id_is_kept(self):
+        request_id, returned, log = await self.call([(b"x-request-id", b"client-id")])
+        self.assertEqual((request_id, returned), ("client-id", "client-id"))
+        self.assertEqual(log.call_args.kwargs["extra"]["event"], "http.request")
+        self.assertIsNone(current_request_id())
+
+    async def test_request_id_is_generated_and_capped(self):
+        request_id, returned, _ = await self.call([])
+        self.assertEqual(request_id, returned)
+        self.assertEqual(len(request_id), 32)
+        request_id, _, _ = await self.call([(b"x-request-id", b"a" * 500)])
+        self.assertEqual(len(request_id), logging_setup.MAX_REQUEST_ID_LENGTH)
+
+class SamplingFilterTest(unittest.TestCase):
+    def record(self, level: int, event: str = None) -> logging.LogRecord:
+        record = logging.LogRecord("test", level, __file__, 0, "message", None, None)
+        if event:
+            record.event = event
+        return record
+
+    def test_sampled_events_keep_their_rate(self):
+        sampling = SamplingFilter({"http.request": 0.25})
+        before = log_records_sampled_out.value(event="http.request")
+        with mock.patch.object(logging_setup.random, "random", side_effect=[0.1, 0.3, 0.24, 0.9]):
+            kept = [sampling.filter(self.record(logging.INFO, "http.request")) for _ in range(4)]
+        self.assertEqual(kept, [True, False, True, False])
+        self.assertEqual(log_records_sampled_out.value(event="http.request"), before + 2)
+
+    def test_warnings_and_unsampled_events_are_always_kept(self):
+        sampling = SamplingFilter({"http.request": 0.0})
+        with mock.patch.object(logging_setup.random, "random", return_value=0.99) as random:
+            self.assertTrue(sampling.filter(self.record(logging.WARNING, "http.request")))
+            self.assertTrue(sampling.filter(self.record(logging.ERROR, "http.request")))
+            self.assertTrue(sampling.filter(self.record(logging.INFO, "llm.call")))
+            self.assertTrue(sampling.filter(self.record(logging.INFO)))
+        random.assert_not_called()
+        self.assertFalse(sampling.filter(self.record(logging.INFO, "http.request")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Unit tests for local match scoring: category weights, exact skill ids and fuzzy thresholds
+Runs without the backend services: python -m pytest match_scoring_test.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from skill_embeddings import SkillEmbedder, SIMILARITY_THRESHOLD
+from match_scoring import CATEGORY_WEIGHTS, TEXT_SIMILARITY_THRESHOLD, compute_local_match
+
+def resume(skills=(), experience=(), qualifications=(), keywords=(), skill_ids=None):
+    return {
+        "skills": list(skills), "skill_ids": skill_ids, "experience": list(experience),
+        "qualifications": list(qualifications), "keywords": list(keywords)
+    }
+
+def job(skills=(), experience=(), qualifications=(), keywords=(), skill_ids=None):
+    return {
+        "required_skills": list(skills), "required_skill_ids": skill_ids, "required_experience": list(experience),
+        "required_qualifications": list(qualifications), "keywords": list(keywords)
+    }
+
+class ComputeLocalMatchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.embedder = SkillEmbedder(cache_path=None)
+
+    def match(self, resume_info, job_info):
+        return compute_local_match(self.embedder, resume_info, job_info)
+
+    def test_weights(self):
+        self.assertEqual(CATEGORY_WEIGHTS, {"skills_match": 0.5, "experience_match": 0.3, "qualifications_match": 0.2})
+        candidate = resume(["python"], ["5 years of python development"], ["BSc Computer Science"])
+        # (job, skills score, experience score, qualifications score, overall)
+        cases = [
+            # All three categories: 0.5 * 50 + 0.3 * 100 + 0.2 * 100
+            (job(["python", "rust"], ["5 years of python development"], ["BSc Computer Science"]), 50.0, 100.0, 100.0, 75.0),
+            # 0.5 * 50 + 0.3 * 100 + 0.2 * 0
+            (job(["python", "rust"], ["5 years of python development"], ["PhD in Physics"]), 50.0, 100.0, 0.0, 55.0),
+            # No qualification requirements: its weight is left out, (0.5 * 50 + 0.3 * 100) / 0.8
+            (job(["python", "rust"], ["5 years of python development"], []), 50.0, 100.0, 100.0, 68.8),
+            # Only skills count
+            (job(["python", "rust"], [], []), 50.0, 100.0, 100.0, 50.0),
+            # (0.3 * 0 + 0.2 * 100) / 0.5
+            (job([], ["10 years managing hospitals"], ["BSc Computer Science"]), 100.0, 0.0, 100.0, 40.0),
+            # Nothing required: nothing to score against
+            (job(), 100.0, 100.0, 100.0, 0.0),
+        ]
+        for job_info, skills, experience, qualifications, overall in cases:
+            with self.subTest(job=job_info):
+                result = self.match(candidate, job_info)
+                self.assertEqual(result["skills_match"]["score"], skills)
+                self.assertEqual(result["experience_match"]["score"], experience)
+                self.assertEqual(result["qualifications_match"]["score"], qualifications)
+                self.assertEqual(result["overall_score"], overall)
+
+    def test_skill_similarity_threshold(self):
+        # (resume skill, required skill, matched): near-spellings over the threshold match
+        cases = [
+            ("python", "python", True),
+            ("reactjs", "React", True),
+            ("kubernetes", "kubernete", True),
+            ("docker", "dockers", False),
+            ("javascript", "java", False),
+            ("python", "pytorch", False),
+        ]
+        for candidate, required, matched in cases:
+            with self.subTest(candidate=candidate, required=required):
+                similarity = float(self.embedder.similarity([candidate], [required])[0, 0])
+                self.assertEqual(similarity >= SIMILARITY_THRESHOLD, matched)
+                result = self.match(resume([candidate]), job([required]))
+                self.assertEqual(result["skills_match"]["matched"], [required] if matched else [])
+                self.assertEqual(result["missing_skills"], [] if matched else [required])
+
+    def test_text_categories_use_the_looser_threshold(self):
+        similarity = float(self.embedder.similarity(["BSc Computer Science"], ["Bachelor of Computer Science"])[0, 0])
+        self.assertTrue(TEXT_SIMILARITY_THRESHOLD <= similarity < SIMILARITY_THRESHOLD)
+        result = self.match(
+            resume(["bsc computer science"], qualifications=["BSc Computer Science"]),
+            job(["Bachelor of Computer Science"], qualifications=["Bachelor of Computer Science"])
+        )
+        self.assertEqual(result["qualifications_match"]["matched"], ["Bachelor of Computer Science"])
+        self.assertEqual(result["skills_match"]["missing"], ["Bachelor of Computer Science"])
+
+    def test_exact_ids_match_without_embedding(self):
+        # "terraform" and "hashicorp iac" are far apart as text, but the ids say they're the same skill
+        candidate = resume(["terraform", "kubernetes"], skill_ids=[7, 1])
+        cases = [
+            # (job, matched, missing)
+            (job(["hashicorp iac", "rust"], skill_ids=[7, 9]), ["hashicorp iac"], ["rust"]),
+            # Fuzzy matching still covers what the ids miss
+            (job(["hashicorp iac", "kubernete"], skill_ids=[7, 9]), ["hashicorp iac", "kubernete"], []),
+            # Ids out of step with the skills are ignored
+            (job(["hashicorp iac", "rust"], skill_ids=[7]), [], ["hashicorp iac", "rust"]),
+            (job(["hashicorp iac"]), [], ["hashicorp iac"]),
+        ]
+        for job_info, matched, missing in cases:
+            with self.subTest(job=job_info):
+                result = self.match(candidate, job_info)
+                self.assertEqual(result["skills_match"]["matched"], matched)
+                self.assertEqual(result["skills_match"]["missing"], missing)
+                self.assertEqual(result["missing_skills"], missing)
+
+    def test_keywords_count_as_skills_and_order_is_kept(self):
+        result = self.match(
+            resume(["python"], keywords=["kubernetes"]),
+            job(["rust", "kubernetes", "go", "python"], keywords=["python", "leadership"])
+        )
+        self.assertEqual(result["skills_match"], {"score": 50.0, "matched": ["kubernetes", "python"], "missing": ["rust", "go"]})
+        self.assertEqual(result["matched_keywords"], ["python"])
+
+    def test_empty_resume(self):
+        result = self.match(resume(), job(["python"], ["3 years"], ["BSc"]))
+        self.assertEqual(result["overall_score"], 0.0)
+        self.assertEqual(result["missing_skills"], ["python"])
+        self.assertEqual(result["experience_match"]["missing"], ["3 years"])
+        self.assertEqual((result["suggestions"], result["detailed_analysis"]), ([], ""))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Unit tests for LLM routing by input size and latency, and deadline-bounded fallback
+Runs without the backend services: python -m pytest model_router_test.py
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import unittest
+from typing import List
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import deadlines
+from deadlines import DeadlineExceeded
+from llm_resilience import LatencyTracker, LLMUnavailableError, LLM_HEDGE_MIN_SAMPLES, OPEN
+from model_router import ModelRouter, LocalStandInModel, RESUME_EXTRACTION, JOB_EXTRACTION, NARRATIVE
+
+ROUTES = [
+    {"task": NARRATIVE, "models": ["local/narrative"]},
+    {"task": "*", "max_input_chars": 100, "models": ["local/small", "local/medium"], "slo_seconds": 1},
+    {"task": "*", "models": ["local/large", "local/medium", "local/fallback"]},
+]
+
+class ScriptedModel(LocalStandInModel):
+    """The local stand-in model, except the first calls fail or hang as scripted"""
+
+    def __init__(self, *script: str):
+        super().__init__()
+        self.script = list(script)
+        self.calls = 0
+
+    async def send(self, task: str, input_text: str) -> str:
+        self.calls += 1
+        step = self.script.pop(0) if self.script else "answer"
+        if step == "fail":
+            raise RuntimeError("provider error")
+        if step == "hang":
+            await asyncio.Event().wait()
+        return await super().send(task, input_text)
+
+class ChooseModelsTest(unittest.TestCase):
+    def setUp(self):
+        self.router = ModelRouter("unused", ROUTES)
+
+    def observe(self, model: str, seconds: float):
+        for _ in range(LLM_HEDGE_MIN_SAMPLES):
+            self.router._caller(model).latency.add(seconds)
+
+    def test_routes_by_task_and_input_size(self):
+        self.assertEqual(self.router.choose_models(RESUME_EXTRACTION, 100), ["local/small", "local/medium"])
+        self.assertEqual(self.router.choose_models(JOB_EXTRACTION, 101), ["local/large", "local/medium", "local/fallback"])
+        self.assertEqual(self.router.choose_models(NARRATIVE, 10_000), ["local/narrative"])
+
+    def test_no_matching_route(self):
+        router = ModelRouter("unused", [{"task": NARRATIVE, "max_input_chars": 10, "models": ["local/a"]}])
+        with self.assertRaises(LLMUnavailableError):
+            router.choose_models(NARRATIVE, 11)
+        with self.assertRaises(LLMUnavailableError):
+            router.choose_models(RESUME_EXTRACTION, 1)
+
+    def test_measured_models_are_ordered_by_p95(self):
+        self.observe("local/large", 5.0)
+        self.observe("local/fallback", 2.0)
+        # local/medium is unmeasured and keeps its slot
+        self.assertEqual(self.router.choose_models(RESUME_EXTRACTION, 500), ["local/fallback", "local/medium", "local/large"])
+
+    def test_models_over_the_slo_go_behind(self):
+        self.observe("local/small", 0.5)
+        self.assertEqual(self.router.choose_models(RESUME_EXTRACTION, 10), ["local/small", "local/medium"])
+        # Over the route's 1s SLO: behind the unmeasured local/medium
+        self.router._caller("local/small").latency = LatencyTracker()
+        self.observe("local/small", 1.5)
+        self.assertEqual(self.router.choose_models(RESUME_EXTRACTION, 10), ["local/medium", "local/small"])
+
+    def test_open_breaker_goes_last(self):
+        self.router._caller("local/large").breaker.state = OPEN
+        self.observe("local/medium", 50.0)
+        self.assertEqual(self.router.choose_models(RESUME_EXTRACTION, 500), ["local/medium", "local/fallback", "local/large"])
+
+class SendTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.router = ModelRouter("unused", ROUTES)
+
+    def set_deadline(self, seconds: float):
+        token = deadlines._deadline.set(time.monotonic() + seconds)
+        self.addCleanup(deadlines._deadline.reset, token)
+
+    async def test_local_model_extracts_from_the_input(self):
+        text = "Senior engineer with 5 years of Python and JavaScript\nBSc Computer Science"
+        resume = json.loads(await self.router.send(RESUME_EXTRACTION, "system", "prompt", text))
+        self.assertTrue({"python", "javascript"} <= set(resume["skills"]))
+        self.assertEqual(resume["experience"], ["Senior engineer with 5 years of Python and JavaScript"])
+        self.assertEqual(resume["qualifications"], ["BSc Computer Science"])
+        job = json.loads(await self.router.send(JOB_EXTRACTION, "system", "prompt", text))
+        self.assertEqual(job["required_skills"], resume["skills"])
+
+    async def test_falls_through_to_the_next_model(self):
+        self.router.local_model = ScriptedModel("fail")
+        response = await self.router.send(RESUME_EXTRACTION, "system", "prompt", "Python")
+        self.assertIn("python", json.loads(response)["skills"])
+        self.assertEqual(self.router.local_model.calls, 2)
+
+    async def test_every_model_unavailable(self):
+        self.router.local_model = ScriptedModel("fail", "fail")
+        with self.assertRaises(LLMUnavailableError):
+            await self.router.send(RESUME_EXTRACTION, "system", "prompt", "Python")
+
+    async def test_fallback_gets_only_the_time_left(self):
+        self.router.local_model = ScriptedModel("fail")
+        self.set_deadline(2.0)
+        fallback = self.router._caller("local/medium")
+        timeouts: List[float] = []
+        call = fallback.call
+
+        async def recording_call(send, timeout):
+            timeouts.append(timeout)
+            return await call(send, timeout)
+
+        with mock.patch.object(fallback, "call", recording_call):
+            await self.router.send(RESUME_EXTRACTION, "system", "prompt", "Python", timeout=30)
+        self.assertEqual(len(timeouts), 1)
+        self.assertLessEqual(timeouts[0], 2.0)
+        self.assertGreater(timeouts[0], 1.0)
+
+    async def test_deadline_is_rechecked_before_each_model(self):
+        # The first model hangs until the deadline; the second is never tried
+        self.router.local_model = ScriptedModel("hang")
+        self.set_deadline(0.1)
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            await self.router.send(RESUME_EXTRACTION, "system", "prompt", "Python", timeout=30)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(self.router.local_model.calls, 1)
+
+    async def test_expired_deadline_sends_nothing(self):
+        self.router.local_model = ScriptedModel()
+        self.set_deadline(-1)
+        with self.assertRaises(DeadlineExceeded):
+            await self.router.send(RESUME_EXTRACTION, "system", "prompt", "Python")
+        self.assertEqual(self.router.local_model.calls, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the admin token check, the sampling profiler and the slow request log
+Runs without the backend services: python -m pytest profiling_test.py
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import profiling
+from profiling import ProfilingMiddleware, SamplingProfiler, SlowRequestLog, require_admin, stage
+
+def make_request(headers=None) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": "/api/admin/profiles",
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()]
+    })
+
+class RequireAdminTest(unittest.TestCase):
+    def test_disabled_without_admin_token(self):
+        with mock.patch.object(profiling, "ADMIN_TOKEN", None):
+            with self.assertRaises(HTTPException) as raised:
+                require_admin(make_request({"X-Admin-Token": "anything"}))
+        self.assertEqual(raised.exception.status_code, 403)
+        self.assertIn("disabled", raised.exception.detail)
+
+    def test_wrong_or_missing_token(self):
+        with mock.patch.object(profiling, "ADMIN_TOKEN", "secret"):
+            for headers in ({}, {"X-Admin-Token": "guess"}, {"X-Admin-Token": ""}):
+                with self.assertRaises(HTTPException) as raised:
+                    require_admin(make_request(headers))
+                self.assertEqual(raised.exception.detail, "Invalid admin token")
+
+    def test_valid_token(self):
+        with mock.patch.object(profiling, "ADMIN_TOKEN", "secret"):
+            self.assertIsNone(require_admin(make_request({"X-Admin-Token": "secret"})))
+
+class SlowRequestLogTest(unittest.TestCase):
+    def test_keeps_the_newest_entries_first(self):
+        log = SlowRequestLog(size=3)
+        for i in range(5):
+            log.add({"request_id": i})
+        self.assertEqual([entry["request_id"] for entry in log.entries()], [4, 3, 2])
+        self.assertEqual([entry["request_id"] for entry in log.entries(limit=2)], [4, 3])
+        self.assertEqual(SlowRequestLog(size=3).entries(), [])
+
+def _parked_in_test_frame(started: threading.Event, release: threading.Event):
+    started.set()
+    release.wait()
+
+class SamplingProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.profiler = SamplingProfiler(interval_ms=1, output_dir=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sample_folds_each_thread_root_first(self):
+        started, release = threading.Event(), threading.Event()
+        worker = threading.Thread(target=_parked_in_test_frame, args=(started, release), name="parked-worker")
+        worker.start()
+        started.wait()
+        try:
+            stacks = self.profiler._sample()
+        finally:
+            release.set()
+            worker.join()
+
+        parked = [stack for stack in stacks if stack.startswith("parked-worker;")]
+        self.assertEqual(len(parked), 1)
+        frames = parked[0].split(";")
+        self.assertEqual(frames[1], "threading.py:_bootstrap")
+        self.assertIn("profiling_test.py:_parked_in_test_frame", frames)
+        self.assertLess(frames.index("profiling_test.py:_parked_in_test_frame"), len(frames) - 1)
+        self.assertEqual(stacks[parked[0]], 1)
+        # The thread that samples never appears in its own samples
+        self.assertFalse(any(stack.startswith(threading.current_thread().name + ";") for stack in stacks))
+
+    def test_stop_session_writes_folded_counts(self):
+        session_id = self.profiler.start_session("test")
+        with self.profiler._lock:
+            self.profiler._sessions[session_id].update({"main;a.py:f;b.py:g": 3, "main;a.py:f": 7})
+        filename = self.profiler.stop_session(session_id)
+
+        self.assertEqual(filename, f"{session_id}.folded")
+        with open(os.path.join(self.directory, filename)) as folded:
+            lines = folded.read().splitlines()
+        # Counts from the sampler thread are added on top, so only check the shape and order
+        ours = [line for line in lines if line.startswith("main;")]
+        self.assertEqual(ours, ["main;a.py:f 7", "main;a.py:f;b.py:g 3"])
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(stack and int(count) > 0)
+        self.assertIsNone(self.profiler.stop_session(session_id))
+        self.assertEqual([profile["name"] for profile in self.profiler.list_profiles()], [filename])
+
+class ProfilingMiddlewareTest(unittest.IsolatedAsyncioTestCase):
+    async def run_request(self, app, headers=None):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http", "method": "GET", "path": "/api/resumes",
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()]
+        }
+        await ProfilingMiddleware(app)(scope, receive, send)
+        return messages
+
+    async def test_slow_requests_are_recorded_with_stages(self):
+        async def app(scope, receive, send):
+            with stage("mongo"):
+                pass
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        log = SlowRequestLog(size=5)
+        with mock.patch.object(profiling, "slow_requests", log), mock.patch.object(profiling, "SLOW_REQUEST_THRESHOLD_MS", 0):
+            await self.run_request(app)
+        entry, = log.entries()
+        self.assertEqual((entry["path"], entry["status"]), ("/api/resumes", 201))
+        self.assertEqual([timing["stage"] for timing in entry["stages"]], ["mongo"])
+
+    async def test_profiled_request_writes_its_profile_off_the_event_loop(self):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        loop_thread = threading.get_ident()
+        writer_threads = []
+        profiler = SamplingProfiler(interval_ms=1, output_dir=directory)
+        stop_session = profiler.stop_session
+
+        def recording_stop(session_id):
+            writer_threads.append(threading.get_ident())
+            return stop_session(session_id)
+
+        headers = {"X-Profile-Request": "1", "X-Admin-Token": "secret"}
+        with mock.patch.object(profiling, "ADMIN_TOKEN", "secret"), mock.patch.object(profiling, "profiler", profiler), \
+                mock.patch.object(profiler, "stop_session", recording_stop):
+            messages = await self.run_request(app, headers)
+
+        profile_id = dict(messages[0]["headers"])[b"x-profile-id"].decode("latin-1")
+        self.assertTrue(os.path.isfile(os.path.join(directory, profile_id)))
+        self.assertEqual(len(writer_threads), 1)
+        self.assertNotEqual(writer_threads[0], loop_thread)
+
+if __name__ == "__main__":
+    unittest.main()
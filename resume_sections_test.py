@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Unit tests for resume section splitting, diffing and field merging
+Runs without the backend services: python -m pytest resume_sections_test.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from resume_sections import split_sections, diff_sections, merge_section_fields
+
+RESUME = """Jane Doe
+jane@example.com
+
+SKILLS
+Go, Python, PostgreSQL
+
+EXPERIENCE
+Good communicator; led a team of five
+"""
+
+class SectionsTest(unittest.TestCase):
+    def test_split_at_headings(self):
+        sections = split_sections(RESUME)
+        self.assertEqual([section["heading"] for section in sections], ["header", "SKILLS", "EXPERIENCE"])
+
+    def test_diff_ignores_whitespace_and_case(self):
+        old = split_sections(RESUME)
+        new = split_sections(RESUME.replace("Go, Python", "go,   python"))
+        unchanged, changed, removed = diff_sections(old, new)
+        self.assertEqual(len(unchanged), 3)
+        self.assertEqual((changed, removed), ([], []))
+
+    def test_removed_section_drops_its_items(self):
+        old = split_sections(RESUME)
+        new = split_sections(RESUME.replace("Go, Python, PostgreSQL", "Python"))
+        unchanged, changed, removed = diff_sections(old, new)
+        changed[0]["fields"] = {"skills": ["python"], "experience": [], "qualifications": [], "keywords": []}
+        current = {"skills": ["go", "python", "postgresql"], "experience": [], "qualifications": [], "keywords": []}
+        merged = merge_section_fields(current, removed, unchanged, changed)
+        self.assertEqual(merged["skills"], ["python"])
+
+    def test_attribution_matches_whole_words(self):
+        # "go" was removed with SKILLS; "Good" in EXPERIENCE must not keep it
+        old = split_sections(RESUME)
+        new = split_sections(RESUME.replace("Go, Python, PostgreSQL", "Rust"))
+        unchanged, changed, removed = diff_sections(old, new)
+        changed[0]["fields"] = {"skills": ["rust"], "experience": [], "qualifications": [], "keywords": []}
+        current = {"skills": ["go", "python"], "experience": [], "qualifications": [], "keywords": ["communicator"]}
+        merged = merge_section_fields(current, removed, unchanged, changed)
+        self.assertEqual(merged["skills"], ["rust"])
+        self.assertEqual(merged["keywords"], ["communicator"])
+
+if __name__ == "__main__":
+    unittest.main()
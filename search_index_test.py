@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Unit tests for full-text search query translation, ranking and snippets
+Runs without the backend services: python -m pytest search_index_test.py
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from search_index import SearchIndex, SearchQueryError, build_fts_query
+
+class BuildFTSQueryTest(unittest.TestCase):
+    def test_bare_terms_are_quoted_and_stopwords_dropped(self):
+        self.assertEqual(build_fts_query("python in Berlin"), '"python" "Berlin"')
+
+    def test_phrases(self):
+        self.assertEqual(build_fts_query('"machine learning" OR rust'), '"machine learning" OR "rust"')
+
+    def test_field_scoped_terms_and_phrases(self):
+        self.assertEqual(build_fts_query("skills:go*"), 'skills:"go"*')
+        self.assertEqual(build_fts_query('title:"data eng" python'), 'title:"data eng" "python"')
+
+    def test_unknown_fields_are_plain_terms(self):
+        self.assertEqual(build_fts_query("salary:100k"), '"salary:100k"')
+        self.assertEqual(build_fts_query('salary:"100k usd"'), '"salary" "100k usd"')
+
+    def test_operators_need_terms_on_both_sides(self):
+        self.assertEqual(build_fts_query("OR python AND AND rust NOT"), '"python" AND "rust"')
+
+    def test_fts_syntax_is_quoted(self):
+        self.assertEqual(build_fts_query('NEAR(python rust) ^title "a""b'), '"NEAR(python" "rust" "title" "a" "b"')
+        self.assertEqual(build_fts_query('title:"x" OR body:"y""'), 'title:"x" OR body:"y"')
+
+    def test_no_searchable_terms(self):
+        for query in ("", "the and of", "AND OR", '""', "***"):
+            with self.assertRaises(SearchQueryError):
+                build_fts_query(query)
+
+class SearchIndexTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index = SearchIndex(os.path.join(self.directory, "search.sqlite3"), workers=1)
+
+    async def asyncTearDown(self):
+        self.index.close()
+        shutil.rmtree(self.directory)
+
+    async def test_user_input_never_breaks_fts(self):
+        await self.index.index("resume", {"id": "r1", "filename": "cv.pdf", "original_text": "python developer"})
+        for query in ('python"', "python NOT", 'title:"', "(python", "python) OR (", "python*:*", "-python", "col:python"):
+            try:
+                await self.index.search(query)
+            except SearchQueryError:
+                pass
+
+    async def test_field_boosts_rank_within_a_kind(self):
+        await self.index.index("job", {"id": "body", "title": "Backend Engineer", "description": "We use python daily"})
+        await self.index.index("job", {"id": "skills", "title": "Backend Engineer", "required_skills": ["python"], "description": "daily"})
+        result = await self.index.search("python", "job")
+        self.assertEqual([hit["id"] for hit in result["results"]], ["skills", "body"])
+
+    async def test_kinds_are_interleaved_by_rank(self):
+        # Every resume mentions python, so its BM25 scores are near zero;
+        # resumes must not all sort below every job because of that
+        for i in range(3):
+            await self.index.index("resume", {"id": f"r{i}", "filename": f"cv{i}", "original_text": "python " * (3 - i)})
+        await self.index.index("job", {"id": "j0", "title": "Python Developer", "description": "python"})
+        await self.index.index("job", {"id": "j1", "title": "Accountant", "description": "ledgers"})
+        result = await self.index.search("python", page_size=3)
+        self.assertEqual(result["total"], 4)
+        self.assertEqual({hit["id"] for hit in result["results"][:2]}, {"j0", "r0"})
+        self.assertEqual(result["results"][2]["type"], "resume")
+
+        second_page = await self.index.search("python", page=2, page_size=3)
+        ids = [hit["id"] for hit in result["results"] + second_page["results"]]
+        self.assertEqual(sorted(ids), ["j0", "r0", "r1", "r2"])
+
+    async def test_snippets_escape_document_html(self):
+        await self.index.index("resume", {
+            "id": "r1", "filename": "cv.html",
+            "original_text": "<script>alert(1)</script> python \x02<b>developer</b>\x03"
+        })
+        snippet = (await self.index.search("python"))["results"][0]["snippet"]
+        self.assertIn("&lt;script&gt;", snippet)
+        self.assertIn("<mark>python</mark>", snippet)
+        self.assertNotIn("<script>", snippet)
+        self.assertNotIn("<b>", snippet)
+        self.assertEqual(snippet.count("<mark>"), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Unit tests for hashed skill vectors and the in-memory job ranking index
+Runs without the backend services: python -m pytest skill_vectors_test.py
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from skill_vectors import JobVectorIndex, build_skill_vector, to_dense
+
+def cosine(left, right) -> float:
+    return float(to_dense(left) @ to_dense(right))
+
+class BuildSkillVectorTest(unittest.TestCase):
+    def test_unit_length_and_normalized_terms(self):
+        vector = build_skill_vector(["Python", " python ", "React"], ["web"])
+        self.assertAlmostEqual(float(np.linalg.norm(to_dense(vector))), 1.0, places=5)
+        self.assertEqual(vector, build_skill_vector(["python", "react"], ["web"]))
+
+    def test_empty(self):
+        self.assertEqual(build_skill_vector([], []), {})
+
+    def test_multi_word_terms_share_tokens(self):
+        self.assertGreater(cosine(build_skill_vector(["python programming"], []), build_skill_vector(["python"], [])), 0)
+
+class JobVectorIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = JobVectorIndex()
+        self.jobs = {
+            "backend": build_skill_vector(["python", "postgresql", "docker"], ["api"]),
+            "frontend": build_skill_vector(["javascript", "react", "css"], ["ui"]),
+            "fullstack": build_skill_vector(["python", "react", "postgresql"], ["api"]),
+            "data": build_skill_vector(["python", "pandas", "sql"], []),
+        }
+        for job_id, vector in self.jobs.items():
+            self.index.add(job_id, vector, job_id.title())
+
+    def test_top_k_orders_by_cosine(self):
+        query = build_skill_vector(["python", "postgresql", "react"], ["api"])
+        ranked = self.index.top_k(query, k=len(self.jobs))
+        expected = sorted(self.jobs, key=lambda job_id: -cosine(query, self.jobs[job_id]))
+        self.assertEqual([job_id for job_id, _, _ in ranked], expected)
+        for job_id, title, score in ranked:
+            self.assertEqual(title, job_id.title())
+            self.assertAlmostEqual(score, cosine(query, self.jobs[job_id]), places=5)
+
+    def test_top_k_truncates(self):
+        query = build_skill_vector(["python"], [])
+        self.assertEqual(len(self.index.top_k(query, k=2)), 2)
+        self.assertEqual(len(self.index.top_k(query, k=100)), len(self.jobs))
+        self.assertEqual(self.index.top_k(query, k=0), [])
+        self.assertEqual(self.index.top_k({}, k=3), [])
+        self.assertEqual(JobVectorIndex().top_k(query, k=3), [])
+
+    def test_add_replaces_an_existing_job(self):
+        self.index.add("frontend", build_skill_vector(["python", "postgresql", "docker"], ["api"]), "Platform")
+        self.assertEqual(len(self.index), len(self.jobs))
+        ranked = self.index.top_k(build_skill_vector(["javascript", "react", "css"], ["ui"]), k=len(self.jobs))
+        scores = {job_id: score for job_id, _, score in ranked}
+        # Nothing of the old vector is left behind
+        self.assertAlmostEqual(scores["frontend"], scores["backend"], places=5)
+        top = self.index.top_k(self.jobs["backend"], k=2)
+        self.assertEqual({job_id for job_id, _, _ in top}, {"backend", "frontend"})
+        self.assertIn(("frontend", "Platform"), [(job_id, title) for job_id, title, _ in top])
+
+    def test_many_jobs_match_dense_scores(self):
+        rng = np.random.default_rng(0)
+        vocabulary = [f"skill {i}" for i in range(300)]
+        index, vectors = JobVectorIndex(), {}
+        for i in range(500):
+            vectors[f"job{i}"] = build_skill_vector(list(rng.choice(vocabulary, 8, replace=False)), [])
+            index.add(f"job{i}", vectors[f"job{i}"])
+        # Replace some so postings are moved around
+        for i in range(0, 500, 7):
+            vectors[f"job{i}"] = build_skill_vector(list(rng.choice(vocabulary, 5, replace=False)), [])
+            index.add(f"job{i}", vectors[f"job{i}"])
+        query = build_skill_vector(list(rng.choice(vocabulary, 10, replace=False)), [])
+        ranked = index.top_k(query, k=20)
+        dense = sorted((cosine(query, vector) for vector in vectors.values()), reverse=True)[:20]
+        np.testing.assert_allclose([score for _, _, score in ranked], dense, rtol=1e-5, atol=1e-6)
+
+if __name__ == "__main__":
+    unittest.main()